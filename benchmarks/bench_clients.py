@@ -0,0 +1,144 @@
+"""
+Throughput and latency benchmark of the sync KVK client against AsyncKVK.
+
+Both clients are run against a local StubServer at several concurrency
+levels; requests/sec and p50/p95/p99 latency are printed and written as
+JSON so results can be compared between releases:
+
+    python benchmarks/bench_clients.py --requests 2000 --latency 0.02 \
+        --output bench_results.json
+
+With ``--record`` the stub traffic is also written to a file, which
+``--replay`` serves without a server to measure the clients' own overhead:
+
+    python benchmarks/bench_clients.py --record traffic.jsonl
+    python benchmarks/bench_clients.py --replay traffic.jsonl
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import time
+
+from kvk_api_client import AsyncKVK, KVK
+from kvk_api_client.batch import abounded_map
+from kvk_api_client.replay import Recorder, Replay
+from kvk_api_client.stub_server import StubServer
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(client, concurrency, latencies, elapsed, errors):
+    return {
+        'client': client,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+    }
+
+
+def bench_sync(numbers, concurrency, **options):
+    latencies = []
+
+    def call(number):
+        started = time.perf_counter()
+        response = kvk.get_basis_profiel(number)
+        response.content
+        latencies.append(time.perf_counter() - started)
+        return response.status_code
+
+    with KVK(test=True, pool_maxsize=concurrency, **options) as kvk:
+        started = time.perf_counter()
+        results = list(kvk.map(call, numbers, workers=concurrency))
+        elapsed = time.perf_counter() - started
+
+    errors = sum(1 for r in results if not r.ok or r.result != 200)
+    return summarize('sync', concurrency, latencies, elapsed, errors)
+
+
+async def bench_async(numbers, concurrency, **options):
+    latencies = []
+
+    async with AsyncKVK(test=True, **options) as kvk:
+        async def call(number):
+            started = time.perf_counter()
+            response = await kvk.get_basis_profiel(number)
+            await response.read()
+            latencies.append(time.perf_counter() - started)
+            return response.status
+
+        started = time.perf_counter()
+        results = [r async for r in abounded_map(call, numbers, concurrency)]
+        elapsed = time.perf_counter() - started
+
+    errors = sum(1 for r in results if not r.ok or r.result != 200)
+    return summarize('async', concurrency, latencies, elapsed, errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', default='1,8,32,64',
+                        help='comma separated concurrency levels')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='stub server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--record', metavar='FILE',
+                        help='also record the stub traffic to FILE')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='serve a recording instead of starting the stub')
+    parser.add_argument('--replay-latency', type=float, default=0.0,
+                        help='fraction of the recorded latency to simulate')
+    args = parser.parse_args(argv)
+
+    numbers = [f'{10000000 + i}' for i in range(args.requests)]
+    levels = [int(level) for level in args.concurrency.split(',')]
+    results = []
+
+    options = {}
+    with contextlib.ExitStack() as stack:
+        if args.replay:
+            host = 'http://replay.invalid'
+            replay = options['replay'] = Replay(args.replay, args.replay_latency)
+            stack.callback(replay.close)
+        else:
+            server = stack.enter_context(StubServer(
+                latency=args.latency, jitter=args.jitter).run_in_thread())
+            host = server.url
+            if args.record:
+                options['recorder'] = stack.enter_context(Recorder(args.record))
+        os.environ.update({'KVK_HOST': host,
+                           'KVK_API_VERSION': os.getenv('KVK_API_VERSION', 'api/v1'),
+                           'KVK_APIKEY_PROD': os.getenv('KVK_APIKEY_PROD', 'bench'),
+                           'KVK_APIKEY_TEST': os.getenv('KVK_APIKEY_TEST', 'bench')})
+        for concurrency in levels:
+            for result in (bench_sync(numbers, concurrency, **options),
+                           asyncio.run(bench_async(numbers, concurrency, **options))):
+                results.append(result)
+                print('{client:>5} c={concurrency:<4} {requests_per_second:8.1f} req/s '
+                      'p50={p50_ms:7.2f}ms p95={p95_ms:7.2f}ms p99={p99_ms:7.2f}ms '
+                      'errors={errors}'.format(**result))
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': platform.python_version(),
+                   'stub_latency': args.latency,
+                   'replay': args.replay,
+                   'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
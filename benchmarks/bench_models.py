@@ -0,0 +1,51 @@
+"""
+Decoding cost of the typed models against a plain JSON decode.
+
+A basisprofiel as served by the StubServer is decoded with ``loads`` and
+with ``BasisProfiel.from_json``, once without touching any section and
+once reading a nested field, and the seconds per run are printed:
+
+    python benchmarks/bench_models.py --runs 20000
+"""
+
+import argparse
+import json
+import timeit
+
+from kvk_api_client.models import BasisProfiel, loads
+
+PROFIEL = json.dumps({
+    'kvkNummer': '68750110', 'naam': 'Stub 68750110 B.V.',
+    'formeleRegistratiedatum': '20000101',
+    'materieleRegistratie': {'datumAanvang': '20000101'},
+    'totaalWerkzamePersonen': 3,
+    'handelsnamen': [{'naam': 'Stub 68750110 B.V.', 'volgorde': 0}],
+    'sbiActiviteiten': [{'sbiCode': '6201', 'indHoofdactiviteit': 'Ja',
+                         'sbiOmschrijving': 'Ontwikkelen van software'}],
+    'links': [{'rel': 'self', 'href': 'basisprofielen/68750110'}],
+    '_embedded': {'hoofdvestiging': {
+        'vestigingsnummer': '000037178598', 'kvkNummer': '68750110',
+        'adressen': [{'type': 'bezoekadres', 'straatnaam': 'Straat',
+                      'huisnummer': 1, 'postcode': '1234AB', 'plaats': 'Utrecht'}],
+        'links': [{'rel': 'self', 'href': 'vestigingsprofielen/000037178598'}]}},
+}).encode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    cases = {
+        'loads': lambda: loads(PROFIEL),
+        'from_json': lambda: BasisProfiel.from_json(PROFIEL),
+        'from_json + nested field': lambda: BasisProfiel.from_json(
+            PROFIEL).embedded.hoofdvestiging.adressen[0].plaats,
+    }
+    for name, case in cases.items():
+        elapsed = min(timeit.repeat(case, number=args.runs, repeat=3))
+        print(f'{name:<26} {elapsed:.3f}s for {args.runs} runs')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,27 @@
-import warnings
-from dotenv import load_dotenv
+"""Python client for the KVK API.
 
-warnings.filterwarnings('ignore', message='Unverified HTTPS request')
-load_dotenv()
+The clients are imported on first attribute access, so importing the package
+does not load requests or aiohttp until one of them is used.
+"""
 
-from .sync_client import KVK
-from .async_client import KVK as AsyncKVK
+__all__ = ['KVK', 'AsyncKVK', 'BackgroundKVK', 'KVKConfig']
+
+
+def __getattr__(name):
+    if name == 'KVK':
+        from .sync_client import KVK
+        return KVK
+    if name == 'AsyncKVK':
+        from .async_client import KVK as AsyncKVK
+        return AsyncKVK
+    if name == 'BackgroundKVK':
+        from .background import BackgroundKVK
+        return BackgroundKVK
+    if name == 'KVKConfig':
+        from .config import KVKConfig
+        return KVKConfig
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
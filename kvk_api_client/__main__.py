@@ -0,0 +1,115 @@
+"""Command line interface, see ``python -m kvk_api_client --help``."""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.enrich import (DEFAULT_ENDPOINTS, ENDPOINTS, QuotaExhausted,
+                                   enrich, read_rows)
+from kvk_api_client.rate_limit import RateLimiter
+from kvk_api_client.resync import SnapshotStore, resync
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m kvk_api_client')
+    parser.add_argument('--test', action='store_true',
+                        help='use the KVK API test environment')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    parser_enrich = commands.add_parser(
+        'enrich', help='enrich a CSV, JSONL or text file of KVK numbers')
+    parser_enrich.add_argument('input', help='.csv, .jsonl or one number per line')
+    parser_enrich.add_argument('output', help='JSONL file to append to')
+    parser_enrich.add_argument('--column', default='kvkNummer',
+                               help='CSV column or JSON field holding the KVK number')
+    parser_enrich.add_argument('--endpoints', default=','.join(DEFAULT_ENDPOINTS),
+                               help=f'comma separated, any of {", ".join(ENDPOINTS)}')
+    parser_enrich.add_argument('--concurrency', type=int, default=10,
+                               help='number of rows in flight')
+    parser_enrich.add_argument('--rate', type=float,
+                               help='maximum requests per second')
+    parser_enrich.add_argument('--checkpoint',
+                               help='checkpoint file, defaults to OUTPUT.checkpoint')
+    parser_enrich.add_argument('--checkpoint-every', type=int, default=100,
+                               help='rows between checkpoints')
+    parser_enrich.add_argument('--progress-every', type=float, default=10.0,
+                               help='seconds between progress reports')
+
+    parser_resync = commands.add_parser(
+        'resync', help='refetch a portfolio of companies and write what changed')
+    parser_resync.add_argument('store', help='sqlite snapshot store of the portfolio')
+    parser_resync.add_argument('output', help='JSONL file to append the changes to')
+    parser_resync.add_argument('--add', metavar='INPUT',
+                               help='add the KVK numbers of a .csv, .jsonl or text '
+                                    'file to the portfolio first')
+    parser_resync.add_argument('--column', default='kvkNummer',
+                               help='CSV column or JSON field holding the KVK number')
+    parser_resync.add_argument('--max-age', type=float, default=0,
+                               help='only refetch companies not checked for this '
+                                    'many seconds')
+    parser_resync.add_argument('--limit', type=int,
+                               help='maximum number of companies to refetch')
+    parser_resync.add_argument('--concurrency', type=int, default=10,
+                               help='number of requests in flight')
+    parser_resync.add_argument('--rate', type=float,
+                               help='maximum requests per second')
+    return parser.parse_args(argv)
+
+
+async def run_enrich(args: argparse.Namespace) -> int:
+    limiter = RateLimiter(args.rate, burst=max(1, int(args.rate))) if args.rate else None
+    async with KVK(test=args.test, rate_limiter=limiter) as kvk:
+        await enrich(kvk,
+                     read_rows(args.input, args.column),
+                     args.output,
+                     endpoints=args.endpoints.split(','),
+                     concurrency=args.concurrency,
+                     checkpoint_path=args.checkpoint or args.output + '.checkpoint',
+                     checkpoint_every=args.checkpoint_every,
+                     progress_every=args.progress_every)
+    return 0
+
+
+async def run_resync(args: argparse.Namespace) -> int:
+    store = SnapshotStore(args.store)
+    if args.add:
+        store.add(number for number, _ in read_rows(args.add, args.column))
+
+    limiter = RateLimiter(args.rate, burst=max(1, int(args.rate))) if args.rate else None
+    changes = failed = 0
+    try:
+        async with KVK(test=args.test, rate_limiter=limiter) as kvk:
+            with open(args.output, 'a', encoding='utf-8') as out:
+                async for change in resync(kvk, store, max_age=args.max_age,
+                                           limit=args.limit,
+                                           concurrency=args.concurrency):
+                    line = json.dumps(change.to_json(), ensure_ascii=False)
+                    if change.kind == 'failed':
+                        print(line, file=sys.stderr)
+                        failed += 1
+                    else:
+                        out.write(line + '\n')
+                        changes += 1
+    finally:
+        store.close()
+        print(f'{changes} changes written to {args.output}, '
+              f'{failed} companies failed', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    commands = {'enrich': run_enrich, 'resync': run_resync}
+    try:
+        return asyncio.run(commands[args.command](args))
+    except QuotaExhausted as exc:
+        print(f'Stopped: {exc}. Run the same command again to resume.',
+              file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
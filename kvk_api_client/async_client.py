@@ -1,14 +1,33 @@
 """A very simple wrapper around KVK api."""
 
-import warnings
-import os
+import asyncio
+import math
+import time
 import aiohttp
-from dotenv import load_dotenv
-from typing import Optional
-from kvk_api_client.paths import APIpaths
-
-warnings.filterwarnings('ignore', message='Unverified HTTPS request')
-load_dotenv()
+from collections import deque
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Union
+from kvk_api_client.batch import BatchResult, abounded_map
+from kvk_api_client.cache import ResponseCache
+from kvk_api_client.config import KVKConfig
+from kvk_api_client.hedging import HedgePolicy
+from kvk_api_client.index import CompanyIndex
+from kvk_api_client.keys import KeyPool
+from kvk_api_client.models import (BASIS_PROFIEL_MODELS, BasisProfiel,
+                                   Naamgeving, Vestiging, Vestigingsprofiel,
+                                   ZoekResultaat, Zoekresultaten, loads)
+from kvk_api_client.metrics import RequestEvent, phases, trace_config
+from kvk_api_client.paths import (APIpaths, BasisProfielPaths, MAX_AANTAL,
+                                  MAX_PAGINA, endpoint_for)
+from kvk_api_client.rate_limit import RateLimiter
+from kvk_api_client.replay import Recorder, Replay
+from kvk_api_client.resilience import CircuitBreaker, RetryPolicy
+from kvk_api_client.responses import BufferedResponse
+from kvk_api_client.streaming import ArrayItemDecoder
+
+# What the get_* methods return: the unread response, the read body, the
+# decoded JSON body or a model from kvk_api_client.models.
+RESULT_MODES = ('response', 'bytes', 'json', 'model')
 
 class KVK:
     """
@@ -18,9 +37,76 @@ class KVK:
     -----------
     test (bool): If True, uses the KVK API test environment.
 
+    config (KVKConfig, optional): Host, API version and keys to use. Read
+    from the environment and a .env file by default.
+
+    rate_limiter (RateLimiter, optional): Limits the request rate and adapts
+    it to 429 responses. Can be shared between clients.
+
+    cache (ResponseCache, optional): Serves repeated GET requests from a
+    local cache instead of the API. Cache hits are returned as
+    BufferedResponse objects.
+
+    key_pool (KeyPool, optional): Picks the API key of every request from a
+    pool of keys with quotas, instead of using the configured key. Raises
+    KeysExhausted when all quotas are used up.
+
+    retry (RetryPolicy, optional): Retries GET requests that failed with a
+    connection error, a timeout or a 5xx, within a shared retry budget.
+
+    breaker (CircuitBreaker, optional): Fails fast with CircuitOpen while
+    an endpoint keeps failing. Can be shared between clients.
+
+    index (CompanyIndex, optional): Records every zoeken and basisprofiel
+    response and answers get_companies calls it covers while fresh, as
+    BufferedResponse objects.
+
+    recorder (Recorder, optional): Appends every response received from the
+    API to a file that a Replay can serve later.
+
+    replay (Replay, optional): Serves recorded responses as BufferedResponse
+    objects instead of sending requests. Raises ReplayMiss for requests that
+    were not recorded.
+
+    coalesce (bool): If True, concurrent identical GET requests share a
+    single upstream call and all receive the same, already read response.
+
+    hedge (HedgePolicy, optional): Sends a second, identical GET request
+    when the first one is slower than the policy's latency quantile, and
+    returns whichever answers first.
+
+    result (str): One of RESULT_MODES. With 'bytes', 'json' or 'model' the
+    get_* methods read the body, release the connection to the pool right
+    away, raise aiohttp.ClientResponseError for error statuses and return
+    the body, its decoded JSON or a compact model from
+    kvk_api_client.models. With 'response' (the default) the unread
+    response is returned and must be read or released by the caller.
+
+    typed (bool): Shorthand for ``result='model'``.
+
+    limit (int): Maximum number of open connections, 0 for no limit.
+
+    limit_per_host (int): Maximum number of open connections per host, 0
+    for no limit.
+
+    ttl_dns_cache (int, optional): Seconds resolved addresses are cached,
+    None to cache them forever.
+
+    keepalive_timeout (float): Seconds an idle connection is kept open.
+
+    timeout (float or aiohttp.ClientTimeout, optional): Total time allowed
+    per request in seconds, or a ClientTimeout with per-phase limits.
+    Defaults to aiohttp's.
+
+    on_request (callable, optional): Called with a RequestEvent after every
+    request, e.g. a MetricsAggregator. DNS, connect and time-to-first-byte
+    are measured with an aiohttp TraceConfig.
+
     Raises:
     -----------
-    ValueError: If the required environment variables are not set.
+    ValueError: If the required settings are not configured.
+
+    CircuitOpen: From any request while the circuit of its endpoint is open.
 
     Attributes:
     -----------
@@ -32,65 +118,464 @@ class KVK:
 
     headers (dict): HTTP headers for API requests.
 
+    deduplicated (int): Number of requests answered by another in-flight
+    request when ``coalesce`` is enabled.
+
     Example usage:
     -----------
         >>> kvk = KVK(test=True)
         >>> response = await kvk.get_basis_profiel('12345678')
     """
 
-    def __init__(self, test: bool) -> None:
-        self.host = os.getenv('KVK_HOST')
-        self.api_version = os.getenv('KVK_API_VERSION')
-        self.api_key = os.getenv('KVK_APIKEY_PROD')
-
-        if not self.host:
-            raise ValueError('KVK_HOST is not set')
-
-        if not self.api_version:
-            raise ValueError('KVK_API_VERSION is not set')
-
-        if not self.api_key:
-            raise ValueError('KVK_APIKEY is not set')
-
-        if test:
-            self.api_key = os.getenv('KVK_APIKEY_TEST')
-            self.api_version = 'test/' + self.api_version
-
-        if not self.api_key:
-            raise ValueError('KVK_APIKEY is not set')
-
-        self.headers = {'apikey': self.api_key}
+    def __init__(self, test: bool,
+                 config: Optional[KVKConfig] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 key_pool: Optional[KeyPool] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 index: Optional[CompanyIndex] = None,
+                 recorder: Optional[Recorder] = None,
+                 replay: Optional[Replay] = None,
+                 coalesce: bool = False,
+                 hedge: Optional[HedgePolicy] = None,
+                 result: str = 'response',
+                 typed: bool = False,
+                 limit: int = 100,
+                 limit_per_host: int = 0,
+                 ttl_dns_cache: Optional[int] = 10,
+                 keepalive_timeout: float = 15.0,
+                 timeout: Union[float, aiohttp.ClientTimeout, None] = None,
+                 on_request: Optional[Callable[[RequestEvent], None]] = None) -> None:
+        if typed:
+            if result not in ('response', 'model'):
+                raise ValueError('typed can only be combined with result=\'model\'')
+            result = 'model'
+        if result not in RESULT_MODES:
+            raise ValueError(f'result must be one of {", ".join(RESULT_MODES)}')
+
+        config = config or KVKConfig.from_env()
+        self.host, self.api_version, self.api_key = config.resolve(
+            test, require_key=key_pool is None)
+
+        self.headers = {'apikey': self.api_key} if self.api_key else {}
+        self.key_pool = key_pool
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.retry = retry
+        self.breaker = breaker
+        self.index = index
+        self.recorder = recorder
+        self.replay = replay
+        self.coalesce = coalesce
+        self.hedge = hedge
+        self.result = result
+        self.typed = result == 'model'
+        self.on_request = on_request
+        self.connector_settings = {'limit': limit,
+                                   'limit_per_host': limit_per_host,
+                                   'ttl_dns_cache': ttl_dns_cache,
+                                   'keepalive_timeout': keepalive_timeout}
+        if isinstance(timeout, (int, float)):
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        self.timeout = timeout
+        self.deduplicated = 0
         self.session = None
+        self._in_flight = {}
 
 
     async def __aenter__(self):
+        kwargs = {'timeout': self.timeout} if self.timeout is not None else {}
         self.session = aiohttp.ClientSession(headers=self.headers,
-                                         connector=aiohttp.TCPConnector(
-                                             ssl=False))
+                                             connector=aiohttp.TCPConnector(
+                                                 ssl=False,
+                                                 **self.connector_settings),
+                                             trace_configs=[trace_config()]
+                                             if self.on_request else None,
+                                             **kwargs)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.session.close()
 
+    def pool_stats(self) -> Dict[str, int]:
+        """
+        Returns the occupancy of the connection pool: the limits, the
+        connections checked out by unreleased responses, the idle kept-alive
+        connections and the requests waiting for a connection.
 
-    async def __send_request(self, method: str, path: str, **kwargs) -> aiohttp.ClientResponse:
-        """Send an HTTP request to the KVK API."""
+        aiohttp has no public API for this, so the counts are read from
+        private TCPConnector attributes (checked against aiohttp 3.8 to
+        3.14). Counts an aiohttp version does not expose are reported as 0.
+        """
+        stats = {'limit': self.connector_settings['limit'],
+                 'limit_per_host': self.connector_settings['limit_per_host'],
+                 'in_use': 0, 'idle': 0, 'waiting': 0}
+        connector = self.session.connector if self.session else None
+        if connector is not None and not connector.closed:
+            stats['in_use'] = len(getattr(connector, '_acquired', ()))
+            stats['idle'] = sum(
+                len(conns) for conns in getattr(connector, '_conns', {}).values())
+            stats['waiting'] = sum(
+                len(waiters) for waiters in getattr(connector, '_waiters', {}).values())
+        return stats
+
+
+    async def __send_request(self, method: str, path: str, *, stream: bool = False,
+                             headers: Optional[dict] = None,
+                             **kwargs) -> aiohttp.ClientResponse:
+        """
+        Send an HTTP request to the KVK API. With ``stream`` the body is left
+        unread, bypassing the cache and request coalescing. Requests with
+        extra ``headers``, such as conditional ones, bypass them as well.
+        """
         url = f"{self.host}/{self.api_version}/{path}"
         kwargs = {k: v for k, v in kwargs.items() if v is not None}
 
-        if method == "GET":
-            response = await self.session.get(url, params=kwargs)
-        elif method == "POST":
-            response = await self.session.post(url, data=kwargs)
-        else:
+        if method not in ("GET", "POST"):
             raise ValueError('Only GET and POST methods are supported.')
 
+        if stream or headers:
+            return await self.__fetch(method, path, url, kwargs, None,
+                                      stream=stream, headers=headers)
+
+        cache_key = None
+        if self.cache and method == "GET":
+            cache_key = self.cache.key(method, url, kwargs)
+            # A memory-only cache is cheap enough to use on the loop.
+            if self.cache.persistent:
+                entry = await asyncio.get_running_loop().run_in_executor(
+                    None, self.cache.get, cache_key)
+            else:
+                entry = self.cache.get(cache_key)
+            if entry:
+                self.__emit(method, path, entry.status, len(entry.body),
+                            time.perf_counter(), cache_hit=True)
+                return BufferedResponse(entry.status, entry.headers,
+                                        entry.body, url)
+
+        if self.index and path == APIpaths.zoeken:
+            # sqlite calls block, so they run in the default executor.
+            body = await asyncio.get_running_loop().run_in_executor(
+                None, self.index.answer, kwargs)
+            if body is not None:
+                self.__emit(method, path, 200, len(body), time.perf_counter(),
+                            cache_hit=True)
+                return BufferedResponse(200, {'Content-Type': 'application/json'},
+                                        body, url)
+
+        if self.coalesce and method == "GET":
+            return await self.__coalesced(
+                cache_key or ResponseCache.key(method, url, kwargs),
+                partial(self.__fetch, method, path, url, kwargs, cache_key))
+
+        return await self.__fetch(method, path, url, kwargs, cache_key)
+
+    async def __coalesced(self, key: str, fetch) -> aiohttp.ClientResponse:
+        """
+        Share one in-flight call between all concurrent callers of ``key``.
+        The call runs in its own task, so cancelling one caller does not
+        affect the others. It is only cancelled when no callers remain.
+        """
+        shared = self._in_flight.get(key)
+        if shared is None:
+            async def fetch_and_read():
+                response = await fetch()
+                await response.read()
+                return response
+
+            task = asyncio.ensure_future(fetch_and_read())
+            # Retrieve the exception so a failure without callers is not logged.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            shared = self._in_flight[key] = [task, 0]
+            task.add_done_callback(
+                lambda t: self._in_flight.get(key) is shared
+                and self._in_flight.pop(key))
+        else:
+            self.deduplicated += 1
+
+        task = shared[0]
+        shared[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            shared[1] -= 1
+            if not shared[1] and not task.done():
+                if self._in_flight.get(key) is shared:
+                    del self._in_flight[key]
+                task.cancel()
+
+    async def __fetch(self, method: str, path: str, url: str, params: dict,
+                      cache_key: Optional[str], stream: bool = False,
+                      headers: Optional[dict] = None) -> aiohttp.ClientResponse:
+        if self.retry:
+            self.retry.deposit()
+
+        retries = 0
+        while True:
+            if self.breaker:
+                self.breaker.before(path)
+            admitted = bool(self.breaker)
+
+            try:
+                request_headers = dict(headers or {})
+                if self.key_pool and self.replay is None:
+                    request_headers['apikey'] = await self.__acquire_key()
+
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire_async()
+
+                timings = {} if self.on_request else None
+                started = time.perf_counter()
+                try:
+                    if self.replay is not None:
+                        response = await self.__replayed(method, path, url, params)
+                    elif method == "GET" and self.hedge:
+                        response = await self.__hedged_get(path, url, params,
+                                                           request_headers, timings)
+                    elif method == "GET":
+                        response = await self.session.get(url, params=params,
+                                                          headers=request_headers,
+                                                          trace_request_ctx=timings)
+                    else:
+                        response = await self.session.post(url, data=params,
+                                                           headers=request_headers,
+                                                           trace_request_ctx=timings)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    self.__emit(method, path, None, 0, started,
+                                retries=retries, error=repr(exc))
+                    if self.breaker:
+                        admitted = False
+                        self.breaker.record(path, False)
+                    delay = self.retry.retry_delay(method, retries) \
+                        if self.retry else None
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    retries += 1
+                    continue
+
+                if self.recorder and not stream:
+                    self.recorder.record(method, path, params, response.status,
+                                         response.headers, await response.read(),
+                                         time.perf_counter() - started)
+
+                if self.rate_limiter:
+                    self.rate_limiter.feedback(response.status, response.headers)
+
+                if self.breaker:
+                    admitted = False
+                    self.breaker.record(path, response.status < 500)
+            except BaseException as exc:
+                # Whatever went wrong, free the slot before() handed out.
+                if admitted:
+                    if isinstance(exc, Exception):
+                        self.breaker.record(path, False)
+                    else:
+                        self.breaker.release(path)
+                raise
+
+            delay = self.retry.retry_delay(
+                method, retries, response.status) if self.retry else None
+            if delay is None:
+                break
+            if self.on_request:
+                self.__emit(method, path, response.status,
+                            response.content_length or 0, started,
+                            retries=retries, **phases(timings))
+            response.release()
+            await asyncio.sleep(delay)
+            retries += 1
+
+        body = None
+        if not stream and (self.on_request or cache_key or self.index):
+            # Read here, so the event covers the download and its size.
+            body = await response.read()
+
+        if cache_key and response.status == 200:
+            if self.cache.persistent:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.cache.set, cache_key, path, response.status,
+                    response.headers, body)
+            else:
+                self.cache.set(cache_key, path, response.status,
+                               response.headers, body)
+
+        if self.index and response.status == 200 and not stream:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.index.record, path, params, body)
+
+        if self.on_request:
+            download = None
+            if body is not None and 'request_end' in timings:
+                download = time.perf_counter() - timings['request_end']
+            self.__emit(method, path, response.status,
+                        response.content_length or 0 if body is None else len(body),
+                        started, retries=retries, download=download,
+                        **phases(timings))
+
         return response
 
+    async def __acquire_key(self) -> str:
+        """Take a key from the pool off the loop, it may wait on sqlite locks."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.key_pool.acquire)
+
+    async def __hedged_get(self, path: str, url: str, params: dict,
+                           headers: dict,
+                           timings: Optional[dict]) -> aiohttp.ClientResponse:
+        """
+        Send a GET and, if it is slower than the hedge policy allows, an
+        identical second one. The first response wins and the other request
+        is cancelled or, if it answered too, released.
+        """
+        endpoint = endpoint_for(path)
+        started = time.perf_counter()
+
+        async def get(headers, ctx):
+            return await self.session.get(url, params=params, headers=headers,
+                                          trace_request_ctx=ctx)
+
+        async def backup(ctx):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async()
+            if self.key_pool:
+                return await get(dict(headers, apikey=await self.__acquire_key()), ctx)
+            return await get(headers, ctx)
+
+        primary = asyncio.ensure_future(get(headers, timings))
+        delay = self.hedge.delay(endpoint)
+        if delay is not None:
+            try:
+                await asyncio.wait({primary}, timeout=delay)
+            except asyncio.CancelledError:
+                primary.cancel()
+                raise
+        if delay is None or primary.done() or not self.hedge.try_hedge():
+            response = await primary
+            self.hedge.observe(endpoint, time.perf_counter() - started)
+            return response
+
+        backup_timings = {} if timings is not None else None
+        hedged = asyncio.ensure_future(backup(backup_timings))
+        pending = {primary, hedged}
+        winner = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                else:
+                    if not pending:
+                        # Both failed, raise the original request's error.
+                        return primary.result()
+                    continue
+                break
+        finally:
+            for task in (primary, hedged):
+                if task is not winner:
+                    task.cancel()
+                    task.add_done_callback(self.__release_loser)
+
+        if winner is hedged and timings is not None:
+            timings.update(backup_timings)
+        self.hedge.observe(endpoint, time.perf_counter() - started,
+                           hedge_won=winner is hedged)
+        return winner.result()
+
+    async def __replayed(self, method: str, path: str, url: str,
+                         params: dict) -> BufferedResponse:
+        recording = self.replay.get(method, path, params)
+        delay = self.replay.delay(recording)
+        if delay:
+            await asyncio.sleep(delay)
+        return BufferedResponse(recording.status, recording.headers,
+                                recording.body, url)
+
+    @staticmethod
+    def __release_loser(task: asyncio.Future) -> None:
+        if task.cancelled() or task.exception() is not None:
+            return
+        task.result().release()
+
+    def __emit(self, method: str, path: str, status: Optional[int], size: int,
+               started: float, **fields) -> None:
+        if self.on_request:
+            self.on_request(RequestEvent(
+                method, endpoint_for(path), path, status, size,
+                time.perf_counter() - started, **fields))
+
+    @staticmethod
+    async def __read(response):
+        """Read the body so the connection is released back to the pool."""
+        if isinstance(response, (aiohttp.ClientResponse, BufferedResponse)):
+            await response.read()
+            response.raise_for_status()
+        return response
+
+    async def __result(self, response: aiohttp.ClientResponse, model: type):
+        """
+        Return the response, or read it, release its connection and return
+        the body as the client's result mode asks.
+        """
+        if self.result == 'response':
+            return response
+        try:
+            body = await response.read()
+        finally:
+            response.release()
+        response.raise_for_status()
+        if response.status == 304:
+            return None
+        if self.result == 'bytes':
+            return body
+        if self.result == 'json':
+            return loads(body)
+        return model.from_json(body)
+
+    async def __stream(self, send: Callable[[], Any], key: str, model: type,
+                       chunk_size: int,
+                       empty_on_404: bool = False) -> AsyncIterator[Any]:
+        """
+        Send the request on first iteration and decode the items of the
+        ``key`` array while the body downloads. The connection is released
+        when the generator finishes or is closed.
+        """
+        response = await send()
+        try:
+            if empty_on_404 and response.status == 404:
+                return
+            response.raise_for_status()
+            decoder = ArrayItemDecoder(key)
+            async for chunk in response.content.iter_chunked(chunk_size):
+                for item in decoder.feed(chunk):
+                    yield model(item) if self.typed else item
+                if decoder.done:
+                    return
+        finally:
+            response.release()
+
+    async def __search(self, kvk_number: Optional[str] = None,
+                       **params) -> aiohttp.ClientResponse:
+        """Validate the search parameters and send a zoeken request."""
+        if (params.get('huisnummer') or params.get('postcode')) and \
+                (not params.get('huisnummer') or not params.get('postcode')):
+            raise ValueError('Huisnummer and postcode must be set together')
+
+        if params.get('huisnummerToevoeging') and not params.get('huisnummer'):
+            raise ValueError('HuisnummerToevoeging must be set together with huisnummer')
+
+        return await self.__send_request("GET", APIpaths.zoeken,
+                                         kvkNummer=kvk_number, **params)
+
 
     async def get_basis_profiel(self, kvk_number: str,
                                 basis_profile_type: Optional[str] = None,
-                                geo_data: str = "False") -> aiohttp.ClientResponse:
+                                geo_data: str = "False",
+                                etag: Optional[str] = None) -> aiohttp.ClientResponse:
         """
         Sends a GET request to the KVK basisprofiel API and returns the response.
 
@@ -98,14 +583,20 @@ class KVK:
         -----------
         kvk_number (str): The KVK number of the company.
         geo_data (str): If True, returns geo data for the company.
+        etag (str, optional): ETag of a previous response, sent as
+        If-None-Match so the API can answer 304 Not Modified. With a result
+        mode other than 'response', None is returned for a 304.
         """
         if basis_profile_type:
             path = f"{APIpaths.basisprofielen}/{kvk_number}/{basis_profile_type}"
         else:
             path = f"{APIpaths.basisprofielen}/{kvk_number}"
 
-        response = await self.__send_request("GET", path, geoData=geo_data)
-        return response
+        response = await self.__send_request(
+            "GET", path, geoData=geo_data,
+            headers={'If-None-Match': etag} if etag else None)
+        return await self.__result(
+            response, BASIS_PROFIEL_MODELS.get(basis_profile_type, BasisProfiel))
 
 
     async def get_vestigingsprofiel(self, vestigingsnummer: str) -> aiohttp.ClientResponse:
@@ -119,7 +610,7 @@ class KVK:
 
         path = f"{APIpaths.vestigingsprofielen}/{vestigingsnummer}"
         response = await self.__send_request("GET", path)
-        return response
+        return await self.__result(response, Vestigingsprofiel)
 
 
 
@@ -134,7 +625,7 @@ class KVK:
 
         path = f"{APIpaths.naamgevingen}/{kvk_number}"
         response = await self.__send_request("GET", path)
-        return response
+        return await self.__result(response, Naamgeving)
 
     async def get_companies(self,
                             kvk_number: Optional[str] = None,
@@ -187,25 +678,189 @@ class KVK:
         """
 
 
-        if (huisnummer or postcode) and (not huisnummer or not postcode):
-            raise ValueError('Huisnummer and postcode must be set together')
+        response = await self.__search(kvk_number=kvk_number,
+                                       rsin=rsin,
+                                       vestigingsnummer=vestigingsnummer,
+                                       handelsnaam=handelsnaam,
+                                       straatnaam=straatnaam,
+                                       plaats=plaats,
+                                       postcode=postcode,
+                                       huisnummer=huisnummer,
+                                       huisnummerToevoeging=huisnummerToevoeging,
+                                       type=type,
+                                       InclusiefInactieveRegistraties=InclusiefInactieveRegistraties,
+                                       pagina=pagina,
+                                       aantal=aantal)
+        return await self.__result(response, Zoekresultaten)
+
+    def stream_companies(self, chunk_size: int = 16384,
+                         **filters) -> AsyncIterator[Any]:
+        """
+        Yields the results of one page of the KVK companies search API while
+        the response is still downloading.
 
-        if huisnummerToevoeging and not huisnummer:
-            raise ValueError('HuisnummerToevoeging must be set together with huisnummer')
+        Accepts the same search arguments as get_companies. Items are decoded
+        one by one from the body, so only the item being received is held in
+        memory. Results are dicts, or ZoekResultaat models if the client is
+        typed. The request is sent when iteration starts, and a page without
+        results (404) yields nothing, like aiter_companies.
 
-        response = await self.__send_request("GET",
-                                             APIpaths.zoeken,
-                                             kvkNummer=kvk_number,
-                                             rsin=rsin,
-                                             vestigingsnummer=vestigingsnummer,
-                                             handelsnaam=handelsnaam,
-                                             straatnaam=straatnaam,
-                                             plaats=plaats,
-                                             postcode=postcode,
-                                             huisnummer=huisnummer,
-                                             huisnummerToevoeging=huisnummerToevoeging,
-                                             type=type,
-                                             InclusiefInactieveRegistraties=InclusiefInactieveRegistraties,
-                                             pagina=pagina,
-                                             antal=aantal)
-        return response
+        Raises:
+        -----------
+        aiohttp.ClientResponseError: If the request fails.
+        """
+        return self.__stream(partial(self.__search, stream=True, **filters),
+                             'resultaten', ZoekResultaat, chunk_size,
+                             empty_on_404=True)
+
+    def stream_vestigingen(self, kvk_number: str,
+                           chunk_size: int = 16384) -> AsyncIterator[Any]:
+        """
+        Yields the vestigingen of a company while the response is still
+        downloading. Results are dicts, or Vestiging models if the client
+        is typed. The request is sent when iteration starts.
+
+        Args:
+        -----------
+        kvk_number (str): The KVK number of the company.
+
+        Raises:
+        -----------
+        aiohttp.ClientResponseError: If the request fails.
+        """
+        path = f"{APIpaths.basisprofielen}/{kvk_number}/{BasisProfielPaths.vestigingen}"
+        return self.__stream(partial(self.__send_request, "GET", path,
+                                     stream=True),
+                             'vestigingen', Vestiging, chunk_size)
+
+    def get_basis_profielen_many(self, kvk_numbers: Iterable[str],
+                                 basis_profile_type: Optional[str] = None,
+                                 geo_data: str = "False",
+                                 concurrency: int = 10) -> AsyncIterator[BatchResult]:
+        """
+        Fetches the basisprofiel of many companies with at most
+        ``concurrency`` requests in flight.
+
+        Results are yielded as they complete. Every BatchResult holds the KVK
+        number as ``item`` and either the fully read response or the error
+        raised for that number, including HTTP error statuses.
+
+        Args:
+        -----------
+        kvk_numbers (iterable): The KVK numbers to fetch, consumed lazily.
+        basis_profile_type (str, optional): One of BasisProfielPaths.
+        geo_data (str): If True, returns geo data for the companies.
+        concurrency (int): Maximum number of requests in flight.
+
+        Example usage:
+        -----------
+            >>> async with KVK(test=True) as kvk:
+            ...     async for result in kvk.get_basis_profielen_many(numbers, concurrency=20):
+            ...         if result.ok:
+            ...             profiel = await result.result.json()
+        """
+        async def fetch(kvk_number):
+            return await self.__read(await self.get_basis_profiel(
+                kvk_number, basis_profile_type, geo_data))
+
+        return abounded_map(fetch, kvk_numbers, concurrency)
+
+    def get_vestigingsprofielen_many(self, vestigingsnummers: Iterable[str],
+                                     concurrency: int = 10) -> AsyncIterator[BatchResult]:
+        """
+        Fetches many vestigingsprofielen with at most ``concurrency`` requests
+        in flight, yielding a BatchResult per vestigingsnummer as it completes.
+
+        Args:
+        -----------
+        vestigingsnummers (iterable): The branch numbers to fetch, consumed lazily.
+        concurrency (int): Maximum number of requests in flight.
+        """
+        async def fetch(vestigingsnummer):
+            return await self.__read(
+                await self.get_vestigingsprofiel(vestigingsnummer))
+
+        return abounded_map(fetch, vestigingsnummers, concurrency)
+
+    def get_naamgevingen_many(self, kvk_numbers: Iterable[str],
+                              concurrency: int = 10) -> AsyncIterator[BatchResult]:
+        """
+        Fetches the naamgevingen of many companies with at most
+        ``concurrency`` requests in flight, yielding a BatchResult per KVK
+        number as it completes.
+
+        Args:
+        -----------
+        kvk_numbers (iterable): The KVK numbers to fetch, consumed lazily.
+        concurrency (int): Maximum number of requests in flight.
+        """
+        async def fetch(kvk_number):
+            return await self.__read(await self.get_naamgevingen(kvk_number))
+
+        return abounded_map(fetch, kvk_numbers, concurrency)
+
+    async def aiter_companies(self, aantal: int = MAX_AANTAL, prefetch: int = 2,
+                              **filters) -> AsyncIterator[dict]:
+        """
+        Yields every search result of the KVK companies search API while the
+        next ``prefetch`` pages are fetched concurrently in the background.
+
+        Accepts the same search arguments as get_companies except pagina.
+        Results are dicts, or ZoekResultaat models if the client is typed. At
+        most ``prefetch`` pages are held in memory besides the current one.
+        Iteration stops at the last page or at the API limit of MAX_PAGINA
+        pages.
+
+        Args:
+        -----------
+        aantal (int): Number of results per page, at most MAX_AANTAL.
+        prefetch (int): Number of pages to fetch ahead of the consumer.
+
+        Raises:
+        -----------
+        aiohttp.ClientResponseError: If a page request fails.
+
+        Example usage:
+        -----------
+            >>> async with KVK(test=True) as kvk:
+            ...     async for company in kvk.aiter_companies(plaats='Amsterdam'):
+            ...         print(company['kvkNummer'])
+        """
+        if prefetch < 1:
+            raise ValueError('prefetch must be at least 1')
+
+        async def fetch(pagina):
+            response = await self.__search(pagina=pagina, aantal=aantal, **filters)
+            await response.read()
+            if response.status == 404:
+                return {}
+            response.raise_for_status()
+            return await response.json()
+
+        page = await fetch(1)
+        items = page.get('resultaten', [])
+        for item in items:
+            yield ZoekResultaat(item) if self.typed else item
+        if len(items) < aantal:
+            return
+
+        last = MAX_PAGINA
+        if 'totaal' in page:
+            last = min(last, math.ceil(page['totaal'] / aantal))
+
+        pending = deque()
+        pagina = 2
+        try:
+            while pending or pagina <= last:
+                while pagina <= last and len(pending) < prefetch:
+                    pending.append(asyncio.ensure_future(fetch(pagina)))
+                    pagina += 1
+
+                items = (await pending.popleft()).get('resultaten', [])
+                for item in items:
+                    yield ZoekResultaat(item) if self.typed else item
+                if len(items) < aantal:
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
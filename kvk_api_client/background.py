@@ -0,0 +1,188 @@
+"""A blocking facade over an async client running on a background thread."""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+
+import requests
+
+from kvk_api_client.async_client import KVK as AsyncKVK
+from kvk_api_client.batch import BatchResult, abounded_map
+from kvk_api_client.config import KVKConfig
+from kvk_api_client.paths import MAX_AANTAL
+from kvk_api_client.responses import requests_response
+
+
+class BackgroundKVK:
+    """
+    A thread-safe client with the blocking methods of sync_client.KVK that
+    runs one async client on its own event loop thread.
+
+    Any number of threads can share an instance, and with it the aiohttp
+    connection pool, rate limiter, cache and other options of the async
+    client. Calls block only the calling thread. ``submit`` returns a
+    concurrent.futures.Future instead, so one thread can have many requests
+    in flight.
+
+    Responses are read on the loop and returned as requests.Response
+    objects, or as the async client's result, e.g. models if ``typed``.
+
+    Args:
+    -----------
+    test (bool): If True, uses the KVK API test environment.
+
+    config (KVKConfig, optional): Host, API version and keys to use.
+
+    **options: Any other argument of async_client.KVK, such as
+    rate_limiter, cache, typed or limit.
+
+    Example usage:
+    -----------
+        >>> kvk = BackgroundKVK(test=True, rate_limiter=RateLimiter(rate=50))
+        >>> response = kvk.get_basis_profiel('12345678')
+        >>> futures = [kvk.submit('get_naamgevingen', n) for n in numbers]
+        >>> kvk.close()
+    """
+
+    def __init__(self, test: bool, config: Optional[KVKConfig] = None,
+                 **options) -> None:
+        self.kvk = AsyncKVK(test, config=config, **options)
+        self._raw = self.kvk.result == 'response'
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name='kvk-background-loop', daemon=True)
+        self._thread.start()
+        self._run(self.kvk.__aenter__())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Closes the async client and stops the loop thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            self._run(self.kvk.__aexit__(None, None, None))
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def _run(self, coroutine) -> Any:
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError('BackgroundKVK cannot be called from its own loop')
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        result = await getattr(self.kvk, method)(*args, **kwargs)
+        if not self._raw:
+            return result
+        try:
+            body = await result.read()
+        finally:
+            result.release()
+        return requests_response(result.status, result.headers, body, str(result.url))
+
+    def _iterate(self, iterator: AsyncIterator[Any]) -> Iterator[Any]:
+        """Drives an async iterator on the loop, one item per round trip."""
+        try:
+            while True:
+                try:
+                    item = self._run(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            if not self._loop.is_closed():
+                self._run(iterator.aclose())
+
+    def submit(self, method: str, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Schedules a call of an async client method, e.g. 'get_basis_profiel',
+        and returns a Future of what the blocking method would return.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._call(method, *args, **kwargs), self._loop)
+
+    def get_basis_profiel(self, kvk_number: str,
+                          basis_profile_type: Optional[str] = None,
+                          geo_data: str = "False",
+                          etag: Optional[str] = None) -> requests.Response:
+        """Blocking counterpart of async_client.KVK.get_basis_profiel."""
+        return self.submit('get_basis_profiel', kvk_number, basis_profile_type,
+                           geo_data, etag).result()
+
+    def get_vestigingsprofiel(self, vestigingsnummer: str) -> requests.Response:
+        """Blocking counterpart of async_client.KVK.get_vestigingsprofiel."""
+        return self.submit('get_vestigingsprofiel', vestigingsnummer).result()
+
+    def get_naamgevingen(self, kvk_number: str) -> requests.Response:
+        """Blocking counterpart of async_client.KVK.get_naamgevingen."""
+        return self.submit('get_naamgevingen', kvk_number).result()
+
+    def get_companies(self,
+                      kvk_number: Optional[str] = None,
+                      rsin: Optional[str] = None,
+                      vestigingsnummer: Optional[str] = None,
+                      handelsnaam: Optional[str] = None,
+                      straatnaam: Optional[str] = None,
+                      plaats: Optional[str] = None,
+                      postcode: Optional[str] = None,
+                      huisnummer: Optional[str] = None,
+                      huisnummerToevoeging: Optional[str] = None,
+                      type: Optional[str] = None,
+                      InclusiefInactieveRegistraties: Optional[bool] = None,
+                      pagina: Optional[int] = None,
+                      aantal: Optional[int] = None,
+                      ) -> requests.Response:
+        """Blocking counterpart of async_client.KVK.get_companies."""
+        return self.submit(
+            'get_companies', kvk_number=kvk_number, rsin=rsin,
+            vestigingsnummer=vestigingsnummer, handelsnaam=handelsnaam,
+            straatnaam=straatnaam, plaats=plaats, postcode=postcode,
+            huisnummer=huisnummer, huisnummerToevoeging=huisnummerToevoeging,
+            type=type, InclusiefInactieveRegistraties=InclusiefInactieveRegistraties,
+            pagina=pagina, aantal=aantal).result()
+
+    def iter_companies(self, aantal: int = MAX_AANTAL, **filters) -> Iterator[Any]:
+        """
+        Yields every search result while the next pages are fetched on the
+        loop, see async_client.KVK.aiter_companies.
+        """
+        return self._iterate(self.kvk.aiter_companies(aantal, **filters))
+
+    def stream_companies(self, chunk_size: int = 16384, **filters) -> Iterator[Any]:
+        """Yields the results of one search page while it downloads."""
+        return self._iterate(self.kvk.stream_companies(chunk_size, **filters))
+
+    def stream_vestigingen(self, kvk_number: str,
+                           chunk_size: int = 16384) -> Iterator[Any]:
+        """Yields the vestigingen of a company while they download."""
+        return self._iterate(self.kvk.stream_vestigingen(kvk_number, chunk_size))
+
+    def map(self, method: Union[str, Callable[..., Any]],
+            args_iterable: Iterable[Any],
+            workers: int = 10,
+            ordered: bool = True) -> Iterator[BatchResult]:
+        """
+        Calls a client method for many inputs, like sync_client.KVK.map.
+        The calls run on the loop rather than on threads, with at most
+        ``workers`` of them in flight.
+
+        Every input is either a single argument or a tuple of positional
+        arguments for ``method``, a method name such as 'get_basis_profiel'
+        or a coroutine function taking the async client first.
+        """
+        async def call(args):
+            args = args if isinstance(args, tuple) else (args,)
+            if isinstance(method, str):
+                return await self._call(method, *args)
+            return await method(self.kvk, *args)
+
+        return self._iterate(abounded_map(call, args_iterable, workers, ordered))
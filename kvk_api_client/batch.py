@@ -0,0 +1,159 @@
+"""Helpers for running many KVK API calls with bounded concurrency."""
+
+import asyncio
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import (Any, AsyncIterator, Awaitable, Callable, Iterable,
+                    Iterator, NamedTuple, Optional)
+
+
+class BatchResult(NamedTuple):
+    """
+    The outcome of a single call in a batch.
+
+    Attributes:
+    -----------
+    item: The input the call was made for, e.g. a KVK number.
+
+    result: The value returned by the call, or None if it failed.
+
+    error (Exception, optional): The exception raised by the call, if any.
+    """
+
+    item: Any
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def abounded_map(func: Callable[[Any], Awaitable[Any]],
+                       items: Iterable[Any],
+                       concurrency: int = 10,
+                       ordered: bool = False) -> AsyncIterator[BatchResult]:
+    """
+    Calls ``func`` for every item with at most ``concurrency`` calls in
+    flight and yields a BatchResult for each call.
+
+    Items are pulled from ``items`` lazily, so arbitrarily long iterables
+    can be processed in bounded memory. A failing call is reported in its
+    BatchResult and does not abort the rest of the batch.
+
+    Args:
+    -----------
+    func (callable): Coroutine function taking a single item.
+    items (iterable): The inputs to call ``func`` with.
+    concurrency (int): Maximum number of calls in flight.
+    ordered (bool): If True, yield results in input order, otherwise as
+    they complete.
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+
+    iterator = iter(items)
+    pending = {}
+    queue = deque()
+
+    def start(item):
+        task = asyncio.ensure_future(func(item))
+        pending[task] = item
+        if ordered:
+            queue.append(task)
+
+    def result(item, task):
+        if task.cancelled():
+            return BatchResult(item, error=asyncio.CancelledError())
+        if task.exception() is not None:
+            return BatchResult(item, error=task.exception())
+        return BatchResult(item, task.result())
+
+    try:
+        for item in islice(iterator, concurrency):
+            start(item)
+
+        while pending:
+            if ordered:
+                task = queue.popleft()
+                await asyncio.wait([task])
+                done = [task]
+            else:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+
+            finished = [(pending.pop(task), task) for task in done]
+            for item in islice(iterator, len(finished)):
+                start(item)
+
+            for item, task in finished:
+                yield result(item, task)
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def thread_map(func: Callable[[Any], Any],
+               items: Iterable[Any],
+               workers: int = 10,
+               ordered: bool = True) -> Iterator[BatchResult]:
+    """
+    Calls ``func`` for every item on a pool of ``workers`` threads and
+    yields a BatchResult for each call.
+
+    At most ``workers`` calls are queued or running at any time, so items
+    are pulled from ``items`` only as fast as they are processed. Closing
+    the generator early cancels the calls that have not started yet.
+
+    Args:
+    -----------
+    func (callable): Function taking a single item.
+    items (iterable): The inputs to call ``func`` with.
+    workers (int): Number of threads.
+    ordered (bool): If True, yield results in input order, otherwise as
+    they complete.
+    """
+    if workers < 1:
+        raise ValueError('workers must be at least 1')
+
+    iterator = iter(items)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque() if ordered else {}
+
+    def start(item):
+        future = executor.submit(func, item)
+        if ordered:
+            pending.append((item, future))
+        else:
+            pending[future] = item
+
+    def result(item, future):
+        if future.exception() is not None:
+            return BatchResult(item, error=future.exception())
+        return BatchResult(item, future.result())
+
+    try:
+        for item in islice(iterator, workers):
+            start(item)
+
+        while pending:
+            if ordered:
+                item, future = pending.popleft()
+                finished = [(item, future)]
+                wait([future])
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                finished = [(pending.pop(future), future) for future in done]
+
+            for item in islice(iterator, len(finished)):
+                start(item)
+
+            for item, future in finished:
+                yield result(item, future)
+    finally:
+        for future in (f for _, f in pending) if ordered else pending:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,224 @@
+"""Opt-in response cache for KVK API lookups."""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from kvk_api_client.paths import APIpaths, endpoint_for
+
+# Seconds a response stays fresh, per endpoint.
+DEFAULT_TTLS = {
+    APIpaths.zoeken: 300,
+    APIpaths.basisprofielen: 24 * 3600,
+    APIpaths.vestigingsprofielen: 24 * 3600,
+    APIpaths.naamgevingen: 24 * 3600,
+}
+
+
+class CacheEntry(NamedTuple):
+    """A cached response and the time at which it expires."""
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    expires: float
+
+
+class ResponseCache:
+    """
+    A two-tier cache for successful GET responses: an in-memory LRU tier
+    bounded by ``maxsize`` and, if ``path`` is given, an sqlite tier that
+    survives process restarts. Entries expire after the TTL of their
+    endpoint.
+
+    The sqlite tier runs in WAL mode and commits writes in batches, so a
+    busy client does not wait on a disk sync for every response. Writes
+    that are not yet committed are lost if the process dies; flush() and
+    close() commit them.
+
+    Args:
+    -----------
+    maxsize (int): Maximum number of responses kept in memory.
+
+    ttls (dict, optional): Seconds to keep responses per APIpaths endpoint,
+    merged over DEFAULT_TTLS.
+
+    default_ttl (float): Seconds to keep responses of other endpoints.
+
+    path (str, optional): Location of the sqlite database for the on-disk tier.
+
+    commit_every (int): Number of on-disk writes committed together.
+
+    commit_interval (float): Seconds after which a write commits the
+    pending ones, even if fewer than ``commit_every``.
+
+    Attributes:
+    -----------
+    hits (int): Lookups answered from either tier.
+
+    disk_hits (int): Lookups answered from the on-disk tier.
+
+    misses (int): Lookups that were not cached or had expired.
+
+    evictions (int): Entries dropped for size or age.
+
+    Example usage:
+    -----------
+        >>> cache = ResponseCache(maxsize=10000, path='kvk-cache.sqlite3',
+        ...                       ttls={APIpaths.zoeken: 60})
+        >>> kvk = KVK(test=True, cache=cache)
+    """
+
+    def __init__(self, maxsize: int = 1024,
+                 ttls: Optional[Mapping[str, float]] = None,
+                 default_ttl: float = 300,
+                 path: Optional[str] = None,
+                 commit_every: int = 100,
+                 commit_interval: float = 1.0) -> None:
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        if commit_every < 1:
+            raise ValueError('commit_every must be at least 1')
+
+        self.maxsize = maxsize
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._db = None
+        self._pending = 0
+        self._committed = time.monotonic()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                             'key TEXT PRIMARY KEY, status INTEGER, '
+                             'headers TEXT, body BLOB, expires REAL)')
+            self._db.commit()
+
+    @staticmethod
+    def key(method: str, url: str, params: Mapping[str, Any]) -> str:
+        """
+        Builds the canonical cache key of a request. The clients pass the
+        full URL, so responses of the test and production environments or
+        of different API versions never share an entry.
+        """
+        query = urlencode(sorted((k, str(v)) for k, v in params.items()
+                                 if v is not None))
+        return f'{method} {url}?{query}'
+
+    @property
+    def persistent(self) -> bool:
+        """Whether lookups and stores may touch the sqlite tier."""
+        return self._db is not None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._memory)}
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Returns the fresh entry for ``key``, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry.expires > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._memory[key]
+                self.evictions += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT status, headers, body, expires FROM responses '
+                    'WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    if row[3] > now:
+                        entry = CacheEntry(row[0], json.loads(row[1]),
+                                           row[2], row[3])
+                        self._store(key, entry)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return entry
+                    self._db.execute('DELETE FROM responses WHERE key = ?',
+                                     (key,))
+                    self._written()
+                    self.evictions += 1
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, path: str, status: int,
+            headers: Mapping[str, str], body: bytes) -> None:
+        """Stores a response for the TTL of the endpoint of ``path``."""
+        ttl = self.ttls.get(endpoint_for(path), self.default_ttl)
+        if ttl <= 0:
+            return
+
+        entry = CacheEntry(status, {'Content-Type': headers.get('Content-Type', '')},
+                           bytes(body), time.time() + ttl)
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                    (key, entry.status, json.dumps(entry.headers),
+                     entry.body, entry.expires))
+                self._written()
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _written(self) -> None:
+        """Commits the pending writes if there are enough or they are old."""
+        self._pending += 1
+        now = time.monotonic()
+        if self._pending >= self.commit_every or \
+                now - self._committed >= self.commit_interval:
+            self._commit(now)
+
+    def _commit(self, now: float) -> None:
+        self._db.commit()
+        self._pending = 0
+        self._committed = now
+
+    def flush(self) -> None:
+        """Commits the pending writes of the on-disk tier."""
+        with self._lock:
+            if self._db is not None and self._pending:
+                self._commit(time.monotonic())
+
+    def clear(self) -> None:
+        """Removes all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+                self._commit(time.monotonic())
+
+    def close(self) -> None:
+        """Closes the on-disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
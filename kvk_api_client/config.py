@@ -0,0 +1,88 @@
+"""Configuration of the KVK clients."""
+
+import os
+from typing import Optional, Tuple
+
+_dotenv_loaded = False
+
+
+def _load_dotenv() -> None:
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
+
+class KVKConfig:
+    """
+    Connection settings of a KVK client.
+
+    Pass an instance to a client to configure it explicitly, or let the
+    client build one with ``KVKConfig.from_env()`` on construction.
+
+    Args:
+    -----------
+    host (str): The KVK API host URL, e.g. 'https://api.kvk.nl'.
+
+    api_version (str): The KVK API version, e.g. 'api/v1'.
+
+    api_key_prod (str, optional): The API key for the production environment.
+
+    api_key_test (str, optional): The API key for the test environment.
+
+    Example usage:
+    -----------
+        >>> config = KVKConfig('https://api.kvk.nl', 'api/v1', api_key_test='...')
+        >>> kvk = KVK(test=True, config=config)
+    """
+
+    __slots__ = ('host', 'api_version', 'api_key_prod', 'api_key_test')
+
+    def __init__(self, host: Optional[str], api_version: Optional[str],
+                 api_key_prod: Optional[str] = None,
+                 api_key_test: Optional[str] = None) -> None:
+        self.host = host
+        self.api_version = api_version
+        self.api_key_prod = api_key_prod
+        self.api_key_test = api_key_test
+
+    @classmethod
+    def from_env(cls, dotenv: bool = True) -> 'KVKConfig':
+        """
+        Reads KVK_HOST, KVK_API_VERSION, KVK_APIKEY_PROD and KVK_APIKEY_TEST
+        from the environment, after loading a .env file once per process if
+        ``dotenv`` is True.
+        """
+        if dotenv:
+            _load_dotenv()
+        return cls(os.getenv('KVK_HOST'), os.getenv('KVK_API_VERSION'),
+                   os.getenv('KVK_APIKEY_PROD'), os.getenv('KVK_APIKEY_TEST'))
+
+    def resolve(self, test: bool,
+                require_key: bool = True) -> Tuple[str, str, Optional[str]]:
+        """
+        Returns the host, API version and API key to use. The key may be
+        missing if ``require_key`` is False.
+
+        Raises:
+        -----------
+        ValueError: If a required setting is missing.
+        """
+        if not self.host:
+            raise ValueError('KVK_HOST is not set')
+
+        if not self.api_version:
+            raise ValueError('KVK_API_VERSION is not set')
+
+        if test:
+            api_key = self.api_key_test
+            api_version = 'test/' + self.api_version
+        else:
+            api_key = self.api_key_prod
+            api_version = self.api_version
+
+        if not api_key and require_key:
+            raise ValueError('KVK_APIKEY is not set')
+
+        return self.host, api_version, api_key
@@ -0,0 +1,120 @@
+"""Concurrent expansion of KVK numbers into complete company trees."""
+
+import asyncio
+import json
+from typing import AsyncIterator, Iterable, Optional
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.batch import BatchResult, abounded_map
+from kvk_api_client.paths import BasisProfielPaths
+
+
+class BudgetExceeded(Exception):
+    """Raised when a crawl has used up its request budget."""
+
+
+class CompanyCrawler:
+    """
+    Expands KVK numbers into company trees by fanning out over
+    basisprofielen, their vestigingen and every vestigingsprofiel
+    concurrently.
+
+    All companies crawled by one instance share a single limit of
+    ``concurrency`` requests in flight and an optional total budget of
+    ``max_requests``. Vestigingsnummers that were already fetched, or are
+    being fetched, are not fetched again; they are listed under
+    ``duplicates`` in the tree instead. Failed fetches are listed under
+    ``errors`` and retried by later crawls.
+
+    Args:
+    -----------
+    kvk (KVK): An open async client with the default 'response' result mode.
+
+    concurrency (int): Maximum number of requests in flight.
+
+    max_requests (int, optional): Total number of requests this crawler may
+    send. Fetches beyond it fail with BudgetExceeded.
+
+    Attributes:
+    -----------
+    requests (int): Number of requests sent so far.
+
+    deduplicated (int): Number of vestigingsprofielen skipped as already seen.
+
+    Example usage:
+    -----------
+        >>> async with KVK(test=True) as kvk:
+        ...     crawler = CompanyCrawler(kvk, concurrency=20)
+        ...     async for result in crawler.crawl(['68750110']):
+        ...         print(len(result.result['vestigingen']))
+    """
+
+    def __init__(self, kvk: KVK, concurrency: int = 10,
+                 max_requests: Optional[int] = None) -> None:
+        if kvk.result != 'response':
+            raise ValueError('CompanyCrawler needs a client returning responses')
+
+        self.kvk = kvk
+        self.max_requests = max_requests
+        self.requests = 0
+        self.deduplicated = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._seen = set()
+
+    async def _fetch(self, call, *args) -> dict:
+        async with self._semaphore:
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                raise BudgetExceeded(f'request budget of {self.max_requests} used up')
+            self.requests += 1
+            response = await call(*args)
+            body = await response.read()
+            response.raise_for_status()
+            return json.loads(body)
+
+    async def crawl_company(self, kvk_number: str) -> dict:
+        """
+        Builds the tree of one company: its basisprofiel and the
+        vestigingsprofiel of every vestiging not seen before.
+        """
+        basisprofiel, vestigingen = await asyncio.gather(
+            self._fetch(self.kvk.get_basis_profiel, kvk_number),
+            self._fetch(self.kvk.get_basis_profiel, kvk_number,
+                        BasisProfielPaths.vestigingen))
+
+        numbers = []
+        duplicates = []
+        for vestiging in vestigingen.get('vestigingen', []):
+            number = vestiging['vestigingsnummer']
+            if number in self._seen:
+                self.deduplicated += 1
+                duplicates.append(number)
+            else:
+                self._seen.add(number)
+                numbers.append(number)
+
+        try:
+            profielen = await asyncio.gather(
+                *(self._fetch(self.kvk.get_vestigingsprofiel, n) for n in numbers),
+                return_exceptions=True)
+        except BaseException:
+            self._seen.difference_update(numbers)
+            raise
+
+        tree = {'kvkNummer': kvk_number, 'basisprofiel': basisprofiel,
+                'vestigingen': [], 'duplicates': duplicates, 'errors': {}}
+        for number, profiel in zip(numbers, profielen):
+            if isinstance(profiel, Exception):
+                # Let a later crawl retry it instead of skipping it as seen.
+                self._seen.discard(number)
+                tree['errors'][number] = repr(profiel)
+            else:
+                tree['vestigingen'].append(profiel)
+        return tree
+
+    def crawl(self, kvk_numbers: Iterable[str],
+              companies: int = 4) -> AsyncIterator[BatchResult]:
+        """
+        Crawls many companies, at most ``companies`` at a time, and yields a
+        BatchResult with the tree of every company as it completes.
+        """
+        return abounded_map(self.crawl_company, kvk_numbers, companies)
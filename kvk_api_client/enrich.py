@@ -0,0 +1,188 @@
+"""Resumable enrichment of large files of KVK numbers.
+
+Rows are streamed from a CSV, JSONL or plain text file, enriched with the
+configured endpoints on the async client and appended to a JSONL output
+file in input order. A checkpoint file records how many rows (and output
+bytes) are complete, so an interrupted run resumes where it stopped.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import aiohttp
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.batch import abounded_map
+from kvk_api_client.paths import BasisProfielPaths
+
+# Coroutine factories for every endpoint that can be added to a row.
+ENDPOINTS = {
+    'basisprofiel': lambda kvk, number: kvk.get_basis_profiel(number),
+    'eigenaar': lambda kvk, number: kvk.get_basis_profiel(
+        number, BasisProfielPaths.eigenaar),
+    'hoofdvestiging': lambda kvk, number: kvk.get_basis_profiel(
+        number, BasisProfielPaths.hoodfvestiging),
+    'vestigingen': lambda kvk, number: kvk.get_basis_profiel(
+        number, BasisProfielPaths.vestigingen),
+    'naamgeving': lambda kvk, number: kvk.get_naamgevingen(number),
+}
+
+DEFAULT_ENDPOINTS = ('basisprofiel', 'hoofdvestiging', 'vestigingen',
+                     'naamgeving')
+
+
+class QuotaExhausted(Exception):
+    """Raised when the API keeps answering 429 and the run has to stop."""
+
+
+def read_rows(path: str, column: str = 'kvkNummer') -> Iterator[Tuple[str, dict]]:
+    """
+    Streams (kvk number, row) pairs from a CSV, JSONL or plain text file.
+
+    CSV files need a header containing ``column``, JSONL rows need a
+    ``column`` field and any other file is read as one KVK number per line.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                yield row[column].strip(), row
+        elif path.endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield str(row[column]).strip(), row
+        else:
+            for line in f:
+                if line.strip():
+                    yield line.strip(), {column: line.strip()}
+
+
+async def enrich_row(kvk: KVK, number: str, endpoints: Sequence[str]) -> dict:
+    """Fetches all endpoints for one KVK number concurrently."""
+    async def fetch(endpoint):
+        response = await ENDPOINTS[endpoint](kvk, number)
+        body = await response.read()
+        if response.status == 429:
+            raise QuotaExhausted(f'429 from {endpoint} for {number}')
+        response.raise_for_status()
+        return json.loads(body)
+
+    results = await asyncio.gather(*(fetch(e) for e in endpoints),
+                                   return_exceptions=True)
+    record = {}
+    errors = {}
+    for endpoint, result in zip(endpoints, results):
+        if isinstance(result, QuotaExhausted):
+            raise result
+        if isinstance(result, aiohttp.ClientResponseError):
+            errors[endpoint] = {'status': result.status, 'message': result.message}
+        elif isinstance(result, Exception):
+            errors[endpoint] = {'message': repr(result)}
+        else:
+            record[endpoint] = result
+    if errors:
+        record['errors'] = errors
+    return record
+
+
+def load_checkpoint(path: Optional[str]) -> Optional[Dict[str, int]]:
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+
+def save_checkpoint(path: Optional[str], rows: int, output_bytes: int) -> None:
+    if not path:
+        return
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'rows': rows, 'output_bytes': output_bytes}, f)
+    os.replace(tmp, path)
+
+
+async def enrich(kvk: KVK,
+                 rows: Iterable[Tuple[str, dict]],
+                 output_path: str,
+                 endpoints: Sequence[str] = DEFAULT_ENDPOINTS,
+                 concurrency: int = 10,
+                 checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 100,
+                 progress_every: float = 10.0,
+                 progress=sys.stderr) -> int:
+    """
+    Enriches ``rows`` and appends them to ``output_path`` as JSON lines.
+    When resuming from a checkpoint, output written after it is dropped
+    first. Without a checkpoint, existing output is kept.
+
+    At most ``concurrency`` rows are in flight, each fetching its endpoints
+    concurrently. Rows are written in input order and the checkpoint is
+    updated every ``checkpoint_every`` rows, so memory stays constant and a
+    rerun with the same checkpoint skips the completed rows.
+
+    Returns:
+    -----------
+    int: The total number of completed rows, including resumed ones.
+
+    Raises:
+    -----------
+    ValueError: If ``kvk`` does not use the default 'response' result mode,
+    or an endpoint is unknown.
+
+    QuotaExhausted: If the API answered 429. The checkpoint is saved first.
+    """
+    if kvk.result != 'response':
+        raise ValueError('enrich needs a client returning responses')
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    done = checkpoint['rows'] if checkpoint else 0
+    started = time.monotonic()
+    reported = started
+    processed = 0
+
+    async def process(item):
+        number, row = item
+        record = await enrich_row(kvk, number, endpoints)
+        return dict(record, kvkNummer=number, input=row)
+
+    with open(output_path, 'a+b') as out:
+        if checkpoint:
+            # Drop rows written after the last checkpoint, they are redone.
+            out.truncate(checkpoint['output_bytes'])
+        out.seek(0, os.SEEK_END)
+        try:
+            async for result in abounded_map(process, islice(rows, done, None),
+                                             concurrency, ordered=True):
+                if not result.ok:
+                    raise result.error
+                out.write(json.dumps(result.result, ensure_ascii=False).encode() + b'\n')
+                done += 1
+                processed += 1
+
+                if done % checkpoint_every == 0:
+                    out.flush()
+                    save_checkpoint(checkpoint_path, done, out.tell())
+
+                now = time.monotonic()
+                if progress and now - reported >= progress_every:
+                    reported = now
+                    print(f'{done} rows done, {processed / (now - started):.1f} rows/s',
+                          file=progress)
+        finally:
+            out.flush()
+            save_checkpoint(checkpoint_path, done, out.tell())
+
+    if progress:
+        elapsed = time.monotonic() - started
+        print(f'{done} rows done, {processed} in this run '
+              f'({processed / elapsed if elapsed else 0:.1f} rows/s)', file=progress)
+    return done
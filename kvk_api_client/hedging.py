@@ -0,0 +1,96 @@
+"""Hedged requests for the async KVK client."""
+
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+
+class HedgePolicy:
+    """
+    Decides when the async client sends a second, identical GET request
+    because the first one is slower than usual.
+
+    The delay before hedging is the ``quantile`` of the latencies recently
+    observed for the endpoint, so only the slowest requests are hedged. A
+    hedge is only sent while hedges stay below ``max_rate`` of all requests,
+    which bounds the extra quota used.
+
+    Args:
+    -----------
+    quantile (float): Latency quantile used as the hedging delay.
+
+    max_rate (float): Maximum fraction of requests that may be hedged.
+
+    min_delay (float): Lower bound of the hedging delay in seconds.
+
+    window (int): Number of recent latencies kept per endpoint.
+
+    min_samples (int): Latencies needed before an endpoint is hedged.
+
+    Attributes:
+    -----------
+    requests (int): Requests sent under this policy.
+
+    fired (int): Hedges sent.
+
+    won (int): Hedges that answered before the original request.
+
+    Example usage:
+    -----------
+        >>> policy = HedgePolicy(quantile=0.95, max_rate=0.05)
+        >>> async with KVK(test=True, hedge=policy) as kvk:
+        ...     ...
+        >>> policy.stats
+    """
+
+    def __init__(self, quantile: float = 0.95, max_rate: float = 0.05,
+                 min_delay: float = 0.01, window: int = 200,
+                 min_samples: int = 20) -> None:
+        if not 0 < quantile < 1:
+            raise ValueError('quantile must be between 0 and 1')
+        if not 0 <= max_rate <= 1:
+            raise ValueError('max_rate must be between 0 and 1')
+
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {'requests': self.requests, 'fired': self.fired, 'won': self.won}
+
+    def delay(self, endpoint: str) -> Optional[float]:
+        """
+        Counts a new request and returns the seconds to wait before hedging
+        it, or None if the endpoint has too few samples to hedge.
+        """
+        with self._lock:
+            self.requests += 1
+            latencies = self._latencies[endpoint]
+            if len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+            rank = min(len(ordered) - 1, math.ceil(self.quantile * len(ordered)) - 1)
+            return max(self.min_delay, ordered[rank])
+
+    def try_hedge(self) -> bool:
+        """Claims a hedge if that keeps the hedge rate below ``max_rate``."""
+        with self._lock:
+            if self.fired + 1 > self.max_rate * self.requests:
+                return False
+            self.fired += 1
+            return True
+
+    def observe(self, endpoint: str, latency: float, hedge_won: bool = False) -> None:
+        """Records the latency of an answered request."""
+        with self._lock:
+            self._latencies[endpoint].append(latency)
+            self.won += hedge_won
@@ -0,0 +1,391 @@
+"""A local, searchable index of the companies a client has seen."""
+
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from kvk_api_client.cache import ResponseCache
+from kvk_api_client.paths import APIpaths, MAX_PAGINA, endpoint_for
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Defaults the zoeken API applies to omitted paging parameters.
+_PAGING_DEFAULTS = {'pagina': 1, 'aantal': 10}
+
+# Filters that narrow a search and can be applied to indexed results.
+REFINABLE = ('kvkNummer', 'vestigingsnummer', 'rsin', 'postcode', 'huisnummer',
+             'plaats', 'type', 'handelsnaam')
+
+_Key = Tuple[str, str]
+
+
+def _address(item: Mapping[str, Any]) -> Dict[str, Any]:
+    adres = item.get('adres') or {}
+    return adres.get('binnenlandsAdres') or adres.get('buitenlandsAdres') or item
+
+
+def _normalize(name: str, value: Any) -> str:
+    value = str(value)
+    if name == 'postcode':
+        return value.replace(' ', '').upper()
+    if name == 'plaats':
+        return value.casefold()
+    return value
+
+
+class CompanyIndex:
+    """
+    An sqlite index of every zoeken result and basisprofiel a client
+    receives, with full-text search on the name and B-tree indexes on
+    postcode + huisnummer, kvkNummer, rsin and vestigingsnummer.
+    Basisprofielen are kept apart from the zoeken results.
+
+    A client with an index answers a zoeken request locally when it is
+    covered by answers of the API from less than ``max_age`` seconds ago:
+
+    - the same page of the same query was answered, or
+    - every page of a search was answered, and the request has the same
+      filters plus any of REFINABLE. It is then answered for any pagina
+      and aantal by applying those filters to the indexed results, with
+      handelsnaam matched on the full-text index as word prefixes.
+
+    Any other request falls back to the API.
+
+    Args:
+    -----------
+    path (str): Location of the sqlite database, in memory by default.
+
+    max_age (float): Seconds a recorded zoeken answer stays usable.
+
+    Attributes:
+    -----------
+    answered (int): zoeken requests answered from the index.
+
+    fallbacks (int): zoeken requests that had to go to the API.
+
+    Example usage:
+    -----------
+        >>> index = CompanyIndex('companies.sqlite3')
+        >>> kvk = KVK(test=True, index=index)
+        >>> index.search('donald')
+    """
+
+    def __init__(self, path: str = ':memory:', max_age: float = 24 * 3600) -> None:
+        self.max_age = max_age
+        self.answered = 0
+        self.fallbacks = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS companies (
+                kvkNummer TEXT NOT NULL,
+                vestigingsnummer TEXT NOT NULL,
+                rsin TEXT,
+                naam TEXT,
+                postcode TEXT,
+                huisnummer TEXT,
+                plaats TEXT,
+                type TEXT,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (kvkNummer, vestigingsnummer));
+            CREATE INDEX IF NOT EXISTS companies_postcode
+                ON companies (postcode, huisnummer);
+            CREATE INDEX IF NOT EXISTS companies_rsin ON companies (rsin);
+            CREATE INDEX IF NOT EXISTS companies_vestigingsnummer
+                ON companies (vestigingsnummer);
+            CREATE TABLE IF NOT EXISTS profielen (
+                kvkNummer TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS searches (
+                filters TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                fetched REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS pages (
+                filters TEXT NOT NULL,
+                aantal INTEGER NOT NULL,
+                pagina INTEGER NOT NULL,
+                totaal INTEGER,
+                results TEXT NOT NULL,
+                fetched REAL NOT NULL,
+                PRIMARY KEY (filters, aantal, pagina));
+        ''')
+        try:
+            self._db.executescript('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(
+                    naam, content='companies', content_rowid='rowid');
+                CREATE TRIGGER IF NOT EXISTS companies_ai AFTER INSERT ON companies BEGIN
+                    INSERT INTO names (rowid, naam) VALUES (new.rowid, new.naam);
+                END;
+                CREATE TRIGGER IF NOT EXISTS companies_au AFTER UPDATE ON companies BEGIN
+                    INSERT INTO names (names, rowid, naam) VALUES ('delete', old.rowid, old.naam);
+                    INSERT INTO names (rowid, naam) VALUES (new.rowid, new.naam);
+                END;
+            ''')
+            self.fts = True
+        except sqlite3.OperationalError:  # sqlite built without FTS5
+            self.fts = False
+        self._db.commit()
+
+    @staticmethod
+    def _query(params: Mapping[str, Any]) -> Tuple[Dict[str, Any], int, int]:
+        """Splits zoeken params into the filters, pagina and aantal."""
+        query = dict(_PAGING_DEFAULTS, **{k: v for k, v in params.items()
+                                          if v is not None})
+        return query, int(query.pop('pagina')), int(query.pop('aantal'))
+
+    @staticmethod
+    def _filters_key(filters: Mapping[str, Any]) -> str:
+        return ResponseCache.key('GET', APIpaths.zoeken, filters)
+
+    def _upsert(self, item: Mapping[str, Any], now: float) -> None:
+        adres = _address(item)
+        self._db.execute(
+            'INSERT INTO companies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (kvkNummer, vestigingsnummer) DO UPDATE SET '
+            'rsin = coalesce(excluded.rsin, rsin), naam = excluded.naam, '
+            'postcode = excluded.postcode, huisnummer = excluded.huisnummer, '
+            'plaats = excluded.plaats, type = excluded.type, '
+            'data = excluded.data, updated = excluded.updated',
+            (item['kvkNummer'], item.get('vestigingsnummer') or '',
+             item.get('rsin'), item.get('naam') or item.get('handelsnaam'),
+             _normalize('postcode', adres['postcode'])
+             if adres.get('postcode') else None,
+             str(adres['huisnummer']) if adres.get('huisnummer') is not None else None,
+             adres.get('plaats'), item.get('type'), json.dumps(item), now))
+
+    def add_zoeken(self, params: Mapping[str, Any], body: bytes) -> None:
+        """Indexes a zoeken page and records it as the answer to ``params``."""
+        page = json.loads(body)
+        items = page.get('resultaten', [])
+        filters, pagina, aantal = self._query(params)
+        key = self._filters_key(filters)
+        now = time.time()
+        with self._lock:
+            for item in items:
+                self._upsert(item, now)
+            self._db.execute('INSERT OR REPLACE INTO searches VALUES (?, ?, ?)',
+                             (key, json.dumps(filters), now))
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)',
+                (key, aantal, pagina, page.get('totaal'),
+                 json.dumps([[i['kvkNummer'], i.get('vestigingsnummer') or '']
+                             for i in items]), now))
+            self._db.commit()
+
+    def add_basisprofiel(self, body: bytes) -> None:
+        """Stores a basisprofiel, see ``profiel``."""
+        profiel = json.loads(body)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO profielen VALUES (?, ?, ?)',
+                             (profiel['kvkNummer'], json.dumps(profiel),
+                              time.time()))
+            self._db.commit()
+
+    def record(self, path: str, params: Mapping[str, Any], body: bytes) -> None:
+        """Indexes a successful response of a zoeken or basisprofiel request."""
+        endpoint = endpoint_for(path)
+        if endpoint == APIpaths.zoeken:
+            self.add_zoeken(params, body)
+        elif endpoint == APIpaths.basisprofielen and path.count('/') == 1:
+            self.add_basisprofiel(body)
+
+    def _page(self, key: str, pagina: int, aantal: int,
+              since: float) -> Optional[Tuple[int, List[_Key]]]:
+        row = self._db.execute(
+            'SELECT totaal, results FROM pages WHERE filters = ? AND aantal = ? '
+            'AND pagina = ? AND fetched >= ?', (key, aantal, pagina, since)).fetchone()
+        if row is None:
+            return None
+        return row[0], [tuple(k) for k in json.loads(row[1])]
+
+    def _complete(self, key: str, since: float) -> Optional[List[_Key]]:
+        """Returns all results of a search in API order if every page is fresh."""
+        rows = self._db.execute(
+            'SELECT aantal, pagina, totaal, results FROM pages '
+            'WHERE filters = ? AND fetched >= ? ORDER BY aantal, pagina',
+            (key, since)).fetchall()
+        by_size = {}
+        for aantal, pagina, totaal, results in rows:
+            by_size.setdefault(aantal, []).append((pagina, totaal, results))
+        for aantal, pages in by_size.items():
+            totaal = pages[0][1]
+            if totaal is None or math.ceil(totaal / aantal) > MAX_PAGINA:
+                continue
+            if [(p, t) for p, t, _ in pages] != \
+                    [(p, totaal) for p in range(1, math.ceil(totaal / aantal) + 1)]:
+                continue
+            keys = [tuple(k) for _, _, results in pages for k in json.loads(results)]
+            if len(keys) == totaal:
+                return keys
+        return None
+
+    def _name_matches(self, naam: str) -> Set[_Key]:
+        words = _WORD.findall(naam)
+        if not words:
+            return set()
+        if self.fts:
+            match = ' '.join('"{}"*'.format(w.replace('"', '')) for w in words)
+            rows = self._db.execute(
+                'SELECT c.kvkNummer, c.vestigingsnummer FROM names '
+                'JOIN companies c ON c.rowid = names.rowid WHERE names MATCH ?',
+                (match,))
+        else:
+            rows = self._db.execute(
+                'SELECT kvkNummer, vestigingsnummer FROM companies WHERE ' +
+                ' AND '.join(['naam LIKE ?'] * len(words)),
+                [f'%{w}%' for w in words])
+        return set(rows.fetchall())
+
+    def _refine(self, keys: List[_Key],
+                refinements: Mapping[str, Any]) -> Optional[List[_Key]]:
+        """
+        Applies REFINABLE filters to indexed results, keeping their order.
+        Returns None if a result lacks a value needed to filter it.
+        """
+        if not refinements:
+            return keys
+        columns = [name for name in refinements
+                   if name not in ('kvkNummer', 'vestigingsnummer', 'handelsnaam')]
+        rows = {}
+        for kvk_number, vestigingsnummer in keys:
+            row = self._db.execute(
+                'SELECT ' + ', '.join(['1'] + columns) + ' FROM companies '
+                'WHERE kvkNummer = ? AND vestigingsnummer = ?',
+                (kvk_number, vestigingsnummer)).fetchone()
+            rows[kvk_number, vestigingsnummer] = dict(zip(columns, row[1:])) \
+                if row else None
+
+        names = self._name_matches(refinements['handelsnaam']) \
+            if 'handelsnaam' in refinements else None
+        wanted = {name: _normalize(name, value)
+                  for name, value in refinements.items()}
+        refined = []
+        for key in keys:
+            row = rows[key]
+            if row is None or any(row[name] is None for name in columns):
+                return None
+            if names is not None and key not in names:
+                continue
+            if 'kvkNummer' in wanted and key[0] != wanted['kvkNummer']:
+                continue
+            if 'vestigingsnummer' in wanted and key[1] != wanted['vestigingsnummer']:
+                continue
+            if all(_normalize(name, row[name]) == wanted[name] for name in columns):
+                refined.append(key)
+        return refined
+
+    def _covering(self, filters: Mapping[str, Any], since: float) -> Optional[List[_Key]]:
+        """Returns the results of ``filters`` from a complete, wider search."""
+        wanted = {name: str(value) for name, value in filters.items()}
+        candidates = []
+        for key, params in self._db.execute(
+                'SELECT filters, params FROM searches WHERE fetched >= ?', (since,)):
+            params = {name: str(value) for name, value in json.loads(params).items()}
+            extra = set(wanted) - set(params)
+            if all(wanted.get(name) == value for name, value in params.items()) \
+                    and extra <= set(REFINABLE):
+                candidates.append((len(extra), key, extra))
+
+        for _, key, extra in sorted(candidates):
+            keys = self._complete(key, since)
+            if keys is not None:
+                keys = self._refine(keys, {name: filters[name] for name in extra})
+                if keys is not None:
+                    return keys
+        return None
+
+    def _items(self, keys: Iterable[_Key]) -> Optional[List[dict]]:
+        items = []
+        for kvk_number, vestigingsnummer in keys:
+            data = self._db.execute(
+                'SELECT data FROM companies WHERE kvkNummer = ? AND '
+                'vestigingsnummer = ?', (kvk_number, vestigingsnummer)).fetchone()
+            if data is None:
+                return None
+            items.append(json.loads(data[0]))
+        return items
+
+    def answer(self, params: Mapping[str, Any]) -> Optional[bytes]:
+        """
+        Returns a zoeken page body for ``params`` if the index covers the
+        query, otherwise None.
+        """
+        filters, pagina, aantal = self._query(params)
+        since = time.time() - self.max_age
+        with self._lock:
+            key = self._filters_key(filters)
+            page = self._page(key, pagina, aantal, since)
+            if page is not None:
+                totaal, keys = page
+            else:
+                keys = self._covering(filters, since)
+                if keys is not None:
+                    totaal = len(keys)
+                    keys = keys[(pagina - 1) * aantal:pagina * aantal]
+
+            resultaten = self._items(keys) if keys else None
+            if not resultaten:
+                # The API answers 404 for pages without results.
+                self.fallbacks += 1
+                return None
+            self.answered += 1
+
+        return json.dumps({'pagina': pagina, 'resultatenPerPagina': aantal,
+                           'totaal': totaal, 'resultaten': resultaten}).encode()
+
+    def search(self, naam: str, limit: int = 10) -> List[dict]:
+        """Returns the indexed companies whose name matches all words of ``naam``."""
+        words = _WORD.findall(naam)
+        if not words:
+            return []
+        with self._lock:
+            if self.fts:
+                match = ' '.join('"{}"*'.format(w.replace('"', '')) for w in words)
+                rows = self._db.execute(
+                    'SELECT c.data FROM names JOIN companies c ON c.rowid = names.rowid '
+                    'WHERE names MATCH ? ORDER BY rank LIMIT ?', (match, limit))
+            else:
+                rows = self._db.execute(
+                    'SELECT data FROM companies WHERE ' +
+                    ' AND '.join(['naam LIKE ?'] * len(words)) + ' LIMIT ?',
+                    [f'%{w}%' for w in words] + [limit])
+            return [json.loads(data) for data, in rows.fetchall()]
+
+    def lookup(self, kvk_number: Optional[str] = None,
+               vestigingsnummer: Optional[str] = None,
+               rsin: Optional[str] = None,
+               postcode: Optional[str] = None,
+               huisnummer: Optional[str] = None) -> List[dict]:
+        """Returns the indexed zoeken results matching all given keys."""
+        conditions = {'kvkNummer': kvk_number, 'vestigingsnummer': vestigingsnummer,
+                      'rsin': rsin,
+                      'postcode': None if postcode is None
+                      else _normalize('postcode', postcode),
+                      'huisnummer': None if huisnummer is None else str(huisnummer)}
+        conditions = {k: v for k, v in conditions.items() if v is not None}
+        if not conditions:
+            raise ValueError('At least one key must be given')
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT data FROM companies WHERE ' +
+                ' AND '.join(f'{column} = ?' for column in conditions),
+                list(conditions.values()))
+            return [json.loads(data) for data, in rows.fetchall()]
+
+    def profiel(self, kvk_number: str) -> Optional[dict]:
+        """Returns the last basisprofiel received for ``kvk_number``, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT data FROM profielen WHERE kvkNummer = ?',
+                                   (kvk_number,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
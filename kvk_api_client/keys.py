@@ -0,0 +1,123 @@
+"""A pool of KVK API keys with quotas shared between processes."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Mapping
+
+
+class KeysExhausted(Exception):
+    """
+    Raised when every key of a KeyPool has used up its quota.
+
+    Attributes:
+    -----------
+    retry_in (float): Seconds until the quotas are reset.
+    """
+
+    def __init__(self, retry_in: float) -> None:
+        super().__init__(f'All API keys used up their quota, '
+                         f'reset in {retry_in:.0f}s')
+        self.retry_in = retry_in
+
+
+class KeyPool:
+    """
+    Spreads requests over several API keys, each allowed ``quota`` requests
+    per ``period`` seconds.
+
+    Every request takes the key with the lowest share of its quota used.
+    Usage is counted in an sqlite database, so all processes on a host that
+    open a KeyPool on the same ``path`` share one set of counters and the
+    fleet as a whole stays under the quotas. Keys are stored as hashes.
+
+    Args:
+    -----------
+    keys (dict): Quota per API key.
+
+    path (str): Location of the sqlite database holding the counters. The
+    default, in memory, only shares them between the threads and clients
+    of this process.
+
+    period (float): Length of a quota period in seconds. Periods are
+    aligned to the epoch, so all processes agree on when they reset.
+
+    Example usage:
+    -----------
+        >>> pool = KeyPool({'key-a': 10000, 'key-b': 5000}, path='/tmp/kvk-keys.sqlite3')
+        >>> kvk = KVK(test=False, key_pool=pool)
+        >>> pool.usage()
+    """
+
+    def __init__(self, keys: Mapping[str, int], path: str = ':memory:',
+                 period: float = 24 * 3600) -> None:
+        if not keys:
+            raise ValueError('At least one API key is required')
+        if any(quota < 1 for quota in keys.values()):
+            raise ValueError('Quotas must be at least 1')
+
+        self.keys = dict(keys)
+        self.period = period
+        self._ids = {hashlib.sha256(key.encode()).hexdigest()[:16]: key
+                     for key in self.keys}
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS usage (key TEXT, period INTEGER, '
+                         'used INTEGER NOT NULL, PRIMARY KEY (key, period))')
+
+    def _period(self, now: float) -> int:
+        return int(now // self.period)
+
+    def acquire(self) -> str:
+        """
+        Claims one request on the least used key and returns that key.
+
+        Raises:
+        -----------
+        KeysExhausted: If every key has used up its quota for this period.
+        """
+        now = time.time()
+        period = self._period(now)
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                used = dict(self._db.execute(
+                    'SELECT key, used FROM usage WHERE period = ?', (period,)))
+                candidates = [(used.get(key_id, 0) / self.keys[key], key_id)
+                              for key_id, key in self._ids.items()
+                              if used.get(key_id, 0) < self.keys[key]]
+                if not candidates:
+                    self._db.execute('ROLLBACK')
+                    raise KeysExhausted((period + 1) * self.period - now)
+
+                key_id = min(candidates)[1]
+                self._db.execute(
+                    'INSERT INTO usage VALUES (?, ?, 1) ON CONFLICT (key, period) '
+                    'DO UPDATE SET used = used + 1', (key_id, period))
+                self._db.execute('DELETE FROM usage WHERE period < ?', (period,))
+                self._db.execute('COMMIT')
+            except sqlite3.Error:
+                self._db.execute('ROLLBACK')
+                raise
+        return self._ids[key_id]
+
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """Returns the used and remaining requests per key, keys abbreviated."""
+        with self._lock:
+            used = dict(self._db.execute(
+                'SELECT key, used FROM usage WHERE period = ?',
+                (self._period(time.time()),)))
+        return {f'{key[:4]}...{key[-4:]}': {
+                    'used': used.get(key_id, 0),
+                    'remaining': self.keys[key] - used.get(key_id, 0)}
+                for key_id, key in self._ids.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
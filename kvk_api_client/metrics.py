@@ -0,0 +1,178 @@
+"""Per-request instrumentation for the KVK clients."""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, NamedTuple, Optional, Sequence
+
+
+class RequestEvent(NamedTuple):
+    """
+    Timing and outcome of a single request, passed to ``on_request``.
+
+    All durations are in seconds. Phases that could not be measured, such as
+    DNS and connect on a reused connection or for the sync client, are None.
+
+    Attributes:
+    -----------
+    method (str): HTTP method.
+
+    endpoint (str): The APIpaths endpoint of the request.
+
+    path (str): Request path below the API version.
+
+    status (int, optional): HTTP status, None if the request failed.
+
+    bytes (int): Response body size, 0 if unknown.
+
+    duration (float): Total time spent in the client.
+
+    dns (float, optional): Time spent resolving the host.
+
+    connect (float, optional): Time spent opening the connection, TLS
+    handshake included.
+
+    ttfb (float, optional): Time from sending the request to receiving the
+    response headers.
+
+    download (float, optional): Time from receiving the response headers
+    to having read the whole body. None for streamed responses, whose body
+    is read by the caller.
+
+    retries (int): Number of retries before this outcome.
+
+    cache_hit (bool): Whether the response came from the client cache.
+
+    error (str, optional): The exception, if the request failed.
+    """
+
+    method: str
+    endpoint: str
+    path: str
+    status: Optional[int]
+    bytes: int
+    duration: float
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    ttfb: Optional[float] = None
+    download: Optional[float] = None
+    retries: int = 0
+    cache_hit: bool = False
+    error: Optional[str] = None
+
+
+def trace_config():
+    """
+    Builds an aiohttp TraceConfig that records phase timings in the dict
+    passed as ``trace_request_ctx`` of a request.
+    """
+    import aiohttp
+
+    def mark(name):
+        async def callback(session, context, params):
+            timings = context.trace_request_ctx
+            if timings is not None:
+                timings[name] = time.perf_counter()
+        return callback
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(mark('request_start'))
+    config.on_dns_resolvehost_start.append(mark('dns_start'))
+    config.on_dns_resolvehost_end.append(mark('dns_end'))
+    config.on_connection_create_start.append(mark('connect_start'))
+    config.on_connection_create_end.append(mark('connect_end'))
+    config.on_request_end.append(mark('request_end'))
+    return config
+
+
+def phases(timings: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """Turns the marks recorded by trace_config into phase durations."""
+    def span(start, end):
+        if start in timings and end in timings:
+            return timings[end] - timings[start]
+        return None
+
+    ttfb = span('request_start', 'request_end')
+    connect = span('connect_start', 'connect_end')
+    if ttfb is not None and connect is not None:
+        ttfb -= connect
+    return {'dns': span('dns_start', 'dns_end'), 'connect': connect, 'ttfb': ttfb}
+
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsAggregator:
+    """
+    A thread-safe in-process aggregator of RequestEvents that can be passed
+    as ``on_request`` to any number of clients.
+
+    Args:
+    -----------
+    buckets (sequence): Upper bounds of the latency histogram buckets.
+
+    forward (callable, optional): Another callback every event is passed on to.
+
+    Example usage:
+    -----------
+        >>> metrics = MetricsAggregator()
+        >>> kvk = KVK(test=True, on_request=metrics)
+        >>> print(metrics.export_prometheus())
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 forward: Optional[Callable[[RequestEvent], None]] = None) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.forward = forward
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._histograms = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._latency_sum = defaultdict(float)
+        self._bytes = defaultdict(int)
+        self._retries = defaultdict(int)
+        self._cache_hits = defaultdict(int)
+
+    def __call__(self, event: RequestEvent) -> None:
+        status = str(event.status) if event.status is not None else 'error'
+        with self._lock:
+            self._requests[(event.endpoint, status)] += 1
+            self._histograms[event.endpoint][
+                bisect.bisect_left(self.buckets, event.duration)] += 1
+            self._latency_sum[event.endpoint] += event.duration
+            self._bytes[event.endpoint] += event.bytes
+            self._retries[event.endpoint] += event.retries
+            self._cache_hits[event.endpoint] += event.cache_hit
+        if self.forward is not None:
+            self.forward(event)
+
+    def export_prometheus(self, prefix: str = 'kvk_client') -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append(f'# TYPE {prefix}_requests_total counter')
+            for (endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",'
+                             f'status="{status}"}} {count}')
+
+            lines.append(f'# TYPE {prefix}_request_duration_seconds histogram')
+            for endpoint, counts in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_request_duration_seconds_bucket'
+                                 f'{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_sum'
+                             f'{{endpoint="{endpoint}"}} {self._latency_sum[endpoint]}')
+                lines.append(f'{prefix}_request_duration_seconds_count'
+                             f'{{endpoint="{endpoint}"}} {cumulative}')
+
+            for name, values in (('response_bytes', self._bytes),
+                                 ('retries', self._retries),
+                                 ('cache_hits', self._cache_hits)):
+                lines.append(f'# TYPE {prefix}_{name}_total counter')
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{prefix}_{name}_total{{endpoint="{endpoint}"}} {value}')
+        return '\n'.join(lines) + '\n'
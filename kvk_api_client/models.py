@@ -0,0 +1,222 @@
+"""Compact typed models for KVK API responses.
+
+The body is decoded once. Scalar fields are stored in slots, and nested
+sections (adressen, sbiActiviteiten, links, _embedded, ...) keep their
+decoded value until first access, when they are wrapped in their own
+model. Sections that are never read are never wrapped. orjson is used for
+(de)serialisation when it is installed.
+"""
+
+import json
+import re
+from typing import Any, Callable, Mapping, Optional
+
+from kvk_api_client.paths import BasisProfielPaths
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+    dumps = orjson.dumps
+else:
+    loads = json.loads
+
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':')).encode()
+
+
+def _snake(key: str) -> str:
+    return re.sub(r'(?<!^)([A-Z])', r'_\1', key.lstrip('_')).lower()
+
+
+class _Section:
+    """A nested section wrapped in its model on first access."""
+
+    def __init__(self, key: str, wrap: Optional[Callable[[Any], Any]] = None) -> None:
+        self.key = key
+        self.wrap = wrap
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.slot = '_' + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if self.wrap is None:
+            return value
+        # Wrapping never leaves dicts behind, so these are still unwrapped.
+        if isinstance(value, dict):
+            value = self.wrap(value)
+            setattr(instance, self.slot, value)
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            value = [self.wrap(item) for item in value]
+            setattr(instance, self.slot, value)
+        return value
+
+
+class _ModelMeta(type):
+
+    def __new__(mcs, name, bases, namespace):
+        fields = tuple((_snake(key), key) for key in namespace.get('_keys', ()))
+        sections = {attr: value for attr, value in namespace.items()
+                    if isinstance(value, _Section)}
+        namespace['_fields'] = fields
+        namespace['_sections'] = tuple(sections.values())
+        namespace['__slots__'] = (tuple(attr for attr, _ in fields) +
+                                  tuple('_' + attr for attr in sections))
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Model(metaclass=_ModelMeta):
+    """
+    Base class of all response models.
+
+    Fields named in ``_keys`` are exposed as snake_case attributes, e.g.
+    ``kvkNummer`` as ``kvk_nummer``. Sections are declared as class
+    attributes and wrapped lazily.
+    """
+
+    _keys = ()
+
+    def __init__(self, data: Mapping[str, Any]) -> None:
+        for attr, key in self._fields:
+            setattr(self, attr, data.get(key))
+        for section in self._sections:
+            setattr(self, section.slot, data.get(section.key))
+
+    @classmethod
+    def from_json(cls, body: bytes) -> 'Model':
+        """Builds the model from a raw JSON response body."""
+        return cls(loads(body))
+
+    def __repr__(self) -> str:
+        attrs = ', '.join(f'{attr}={getattr(self, attr)!r}'
+                          for attr, _ in self._fields[:2])
+        return f'{type(self).__name__}({attrs})'
+
+
+class Link(Model):
+    _keys = ('rel', 'href')
+
+
+class Handelsnaam(Model):
+    _keys = ('naam', 'volgorde')
+
+
+class SbiActiviteit(Model):
+    _keys = ('sbiCode', 'sbiOmschrijving', 'indHoofdactiviteit')
+
+
+class MaterieleRegistratie(Model):
+    _keys = ('datumAanvang', 'datumEinde')
+
+
+class Adres(Model):
+    _keys = ('type', 'volledigAdres', 'straatnaam', 'huisnummer', 'huisletter',
+             'huisnummerToevoeging', 'toevoegingAdres', 'postcode',
+             'postbusnummer', 'plaats', 'regio', 'land', 'indAfgeschermd',
+             'geoData')
+
+
+class Eigenaar(Model):
+    """The owner of a company, see BasisProfielPaths.eigenaar."""
+
+    _keys = ('rsin', 'rechtsvorm', 'uitgebreideRechtsvorm')
+    adressen = _Section('adressen', Adres)
+    websites = _Section('websites')
+    links = _Section('links', Link)
+
+
+class Vestigingsprofiel(Model):
+    """A vestigingsprofiel, also returned for BasisProfielPaths.hoodfvestiging."""
+
+    _keys = ('vestigingsnummer', 'kvkNummer', 'rsin', 'eersteHandelsnaam',
+             'indNonMailing', 'formeleRegistratiedatum', 'indHoofdvestiging',
+             'indCommercieleVestiging', 'voltijdWerkzamePersonen',
+             'deeltijdWerkzamePersonen', 'totaalWerkzamePersonen')
+    materiele_registratie = _Section('materieleRegistratie', MaterieleRegistratie)
+    handelsnamen = _Section('handelsnamen', Handelsnaam)
+    adressen = _Section('adressen', Adres)
+    websites = _Section('websites')
+    sbi_activiteiten = _Section('sbiActiviteiten', SbiActiviteit)
+    links = _Section('links', Link)
+
+
+class Embedded(Model):
+    hoofdvestiging = _Section('hoofdvestiging', Vestigingsprofiel)
+    eigenaar = _Section('eigenaar', Eigenaar)
+
+
+class BasisProfiel(Model):
+    """A basisprofiel of a company."""
+
+    _keys = ('kvkNummer', 'naam', 'statutaireNaam', 'indNonMailing',
+             'formeleRegistratiedatum', 'totaalWerkzamePersonen')
+    materiele_registratie = _Section('materieleRegistratie', MaterieleRegistratie)
+    handelsnamen = _Section('handelsnamen', Handelsnaam)
+    sbi_activiteiten = _Section('sbiActiviteiten', SbiActiviteit)
+    links = _Section('links', Link)
+    embedded = _Section('_embedded', Embedded)
+
+
+class Vestiging(Model):
+    """A vestiging as listed by BasisProfielPaths.vestigingen."""
+
+    _keys = ('vestigingsnummer', 'eersteHandelsnaam', 'indHoofdvestiging',
+             'indAdresAfgeschermd', 'indCommercieleVestiging', 'volledigAdres')
+    links = _Section('links', Link)
+
+
+class Vestigingen(Model):
+    """The vestigingen of a company, see BasisProfielPaths.vestigingen."""
+
+    _keys = ('kvkNummer', 'aantalCommercieleVestigingen',
+             'aantalNietCommercieleVestigingen', 'totaalAantalVestigingen')
+    vestigingen = _Section('vestigingen', Vestiging)
+    links = _Section('links', Link)
+
+
+class NaamgevingVestiging(Model):
+    _keys = ('vestigingsnummer', 'eersteHandelsnaam', 'ookGenoemd')
+    handelsnamen = _Section('handelsnamen', Handelsnaam)
+    links = _Section('links', Link)
+
+
+class Naamgeving(Model):
+    """The naamgevingen of a company."""
+
+    _keys = ('kvkNummer', 'rsin', 'statutaireNaam', 'naam', 'ookGenoemd',
+             'startdatum', 'einddatum')
+    vestigingen = _Section('vestigingen', NaamgevingVestiging)
+    links = _Section('links', Link)
+
+
+class ZoekResultaat(Model):
+    """A single result of the zoeken API."""
+
+    _keys = ('kvkNummer', 'rsin', 'vestigingsnummer', 'naam', 'handelsnaam',
+             'straatnaam', 'huisnummer', 'postcode', 'plaats', 'type', 'actief',
+             'vervallenNaam')
+    adres = _Section('adres')
+    links = _Section('links', Link)
+
+
+class Zoekresultaten(Model):
+    """A page of results of the zoeken API."""
+
+    _keys = ('pagina', 'resultatenPerPagina', 'totaal', 'vorige', 'volgende')
+    resultaten = _Section('resultaten', ZoekResultaat)
+    links = _Section('links', Link)
+
+
+# The model of every basisprofiel sub-resource, keyed on BasisProfielPaths.
+BASIS_PROFIEL_MODELS = {
+    None: BasisProfiel,
+    BasisProfielPaths.eigenaar: Eigenaar,
+    BasisProfielPaths.hoodfvestiging: Vestigingsprofiel,
+    BasisProfielPaths.vestigingen: Vestigingen,
+}
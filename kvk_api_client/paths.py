@@ -10,6 +10,13 @@ class APIpaths():
     # With the Naamgeving API you request name data of companies from the Trade Register.
     naamgevingen = 'naamgevingen/kvknummer'
 
+# The Zoeken API returns at most MAX_AANTAL results per page and MAX_PAGINA pages.
+MAX_AANTAL = 100
+MAX_PAGINA = 1000
+
+# The values of the type filter of the Zoeken API, which partition every search.
+ZOEKEN_TYPES = ('hoofdvestiging', 'nevenvestiging', 'rechtspersoon')
+
 class BasisProfielPaths():
     """Basic profile paths for KVK api."""
 
@@ -20,3 +27,11 @@ class BasisProfielPaths():
     # Retrieve a list of branches for a specific company.
     vestigingen = 'vestigingen'
 
+
+def endpoint_for(path: str) -> str:
+    """Returns the APIpaths endpoint a request path belongs to."""
+    for endpoint in (APIpaths.naamgevingen, APIpaths.basisprofielen,
+                     APIpaths.vestigingsprofielen, APIpaths.zoeken):
+        if path == endpoint or path.startswith(endpoint + '/'):
+            return endpoint
+    return path.split('/', 1)[0]
@@ -0,0 +1,171 @@
+"""Complete, parallel searches beyond the paging limit of the Zoeken API."""
+
+import math
+import warnings
+from typing import AsyncIterator, Dict, List, NamedTuple, Tuple
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.batch import abounded_map
+from kvk_api_client.models import loads
+from kvk_api_client.paths import MAX_AANTAL, MAX_PAGINA, ZOEKEN_TYPES
+
+
+class SearchPlan(NamedTuple):
+    """
+    The sub-queries a search is split into.
+
+    Attributes:
+    -----------
+    queries (list): (filters, totaal) of every sub-query. Together they
+    cover the search without overlap.
+
+    truncated (list): The filters of sub-queries that still have more
+    results than can be paged through. Only their first ``capacity``
+    results are returned.
+    """
+
+    queries: List[Tuple[Dict[str, object], int]]
+    truncated: List[Dict[str, object]]
+
+    @property
+    def complete(self) -> bool:
+        return not self.truncated
+
+
+class SearchTruncated(Exception):
+    """
+    Raised by a strict search whose plan cannot return every result.
+
+    Attributes:
+    -----------
+    plan (SearchPlan): The plan, with the truncated sub-queries.
+    """
+
+    def __init__(self, plan: SearchPlan) -> None:
+        super().__init__(f'{len(plan.truncated)} sub-queries exceed the '
+                         'number of results the API serves')
+        self.plan = plan
+
+
+class QueryPlanner:
+    """
+    Runs searches of the Zoeken API that may exceed the MAX_PAGINA pages
+    of MAX_AANTAL results it serves, by splitting them into disjoint
+    sub-queries and fetching all of their pages concurrently.
+
+    A search whose totaal is over ``capacity`` is split by ``type``, whose
+    values ZOEKEN_TYPES partition every search. Postcode ranges cannot be
+    used because postcode is only accepted together with a huisnummer, and
+    InclusiefInactieveRegistraties only widens a search, so it does not
+    split one. Sub-queries that still exceed the capacity are reported in
+    the plan as truncated; a search over such a plan warns, or raises
+    SearchTruncated when strict.
+
+    Args:
+    -----------
+    kvk (KVK): An open async client with the default 'response' result mode.
+
+    concurrency (int): Maximum number of page requests in flight.
+
+    capacity (int): Number of results the API serves for one query.
+
+    Attributes:
+    -----------
+    last_plan (SearchPlan): The plan of the most recent search, or None.
+
+    Example usage:
+    -----------
+        >>> async with KVK(test=True) as kvk:
+        ...     planner = QueryPlanner(kvk, concurrency=16)
+        ...     async for company in planner.search(plaats='Amsterdam'):
+        ...         print(company['kvkNummer'])
+    """
+
+    def __init__(self, kvk: KVK, concurrency: int = 8,
+                 capacity: int = MAX_PAGINA * MAX_AANTAL) -> None:
+        if kvk.result != 'response':
+            raise ValueError('QueryPlanner needs a client returning responses')
+
+        self.kvk = kvk
+        self.concurrency = concurrency
+        self.capacity = capacity
+        self.last_plan = None
+
+    async def _page(self, filters: dict, pagina: int, aantal: int) -> dict:
+        response = await self.kvk.get_companies(pagina=pagina, aantal=aantal,
+                                                **filters)
+        body = await response.read()
+        if response.status == 404:
+            return {'totaal': 0, 'resultaten': []}
+        response.raise_for_status()
+        return loads(body)
+
+    async def count(self, **filters) -> int:
+        """Returns the number of results of a search, from a one-result page."""
+        return (await self._page(filters, 1, 1)).get('totaal', 0)
+
+    async def plan(self, **filters) -> SearchPlan:
+        """
+        Counts the search and, if needed, its partitions by type, and
+        returns the sub-queries to run.
+        """
+        if 'pagina' in filters or 'aantal' in filters:
+            raise ValueError('pagina and aantal are chosen by the planner')
+
+        totaal = await self.count(**filters)
+        if totaal <= self.capacity:
+            return SearchPlan([(filters, totaal)], [])
+        if filters.get('type'):
+            return SearchPlan([(filters, totaal)], [filters])
+
+        queries = []
+        async for result in abounded_map(
+                lambda t: self.count(**filters, type=t), ZOEKEN_TYPES,
+                self.concurrency, ordered=True):
+            if not result.ok:
+                raise result.error
+            queries.append((dict(filters, type=result.item), result.result))
+        return SearchPlan([(q, n) for q, n in queries if n],
+                          [q for q, n in queries if n > self.capacity])
+
+    async def search(self, strict: bool = False,
+                     **filters) -> AsyncIterator[dict]:
+        """
+        Yields every result of a search once, fetching the pages of all
+        sub-queries concurrently. Results are yielded as pages arrive and
+        deduplicated on kvkNummer and vestigingsnummer.
+
+        Accepts the same search arguments as get_companies except pagina
+        and aantal. The plan is kept as ``last_plan``. If it is truncated,
+        only the first ``capacity`` results of those sub-queries are
+        yielded and a warning is issued, or with ``strict`` nothing is
+        fetched and SearchTruncated is raised.
+
+        Raises:
+        -----------
+        SearchTruncated: If ``strict`` and the plan is not complete.
+
+        aiohttp.ClientResponseError: If a page request fails.
+        """
+        plan = self.last_plan = await self.plan(**filters)
+        if not plan.complete:
+            if strict:
+                raise SearchTruncated(plan)
+            warnings.warn(f'search truncated, {len(plan.truncated)} sub-queries '
+                          f'exceed {self.capacity} results', stacklevel=2)
+        pages = [(query, pagina)
+                 for query, totaal in plan.queries
+                 for pagina in range(
+                     1, math.ceil(min(totaal, self.capacity) / MAX_AANTAL) + 1)]
+
+        seen = set()
+        async for result in abounded_map(
+                lambda page: self._page(page[0], page[1], MAX_AANTAL), pages,
+                self.concurrency):
+            if not result.ok:
+                raise result.error
+            for item in result.result.get('resultaten', []):
+                key = (item.get('kvkNummer'), item.get('vestigingsnummer'))
+                if key not in seen:
+                    seen.add(key)
+                    yield item
@@ -0,0 +1,129 @@
+"""Client-side rate limiting for the KVK API."""
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket that can be shared by several sync and async
+    KVK clients in the same process.
+
+    When the API answers with 429 the rate is halved (down to ``min_rate``)
+    and, if a Retry-After header is present, no tokens are handed out until
+    it expires, after which requests queued during the block are spaced at
+    the adapted rate again instead of all firing at once. The rate then
+    recovers linearly to ``rate`` over ``recovery`` seconds.
+
+    Args:
+    -----------
+    rate (float): Sustained number of requests per second.
+
+    burst (int): Maximum number of requests that can be sent at once.
+
+    min_rate (float, optional): Lower bound for the adapted rate. Defaults
+    to a tenth of ``rate``.
+
+    recovery (float): Seconds it takes to recover from a halved rate.
+
+    Example usage:
+    -----------
+        >>> limiter = RateLimiter(rate=10, burst=20)
+        >>> kvk = KVK(test=True, rate_limiter=limiter)
+        >>> other = KVK(test=True, rate_limiter=limiter)
+    """
+
+    def __init__(self, rate: float, burst: int = 1,
+                 min_rate: Optional[float] = None,
+                 recovery: float = 30.0) -> None:
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.recovery = recovery
+
+        self._lock = threading.Lock()
+        self._current_rate = rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    @property
+    def current_rate(self) -> float:
+        """The rate currently in effect after 429 adaptation."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._current_rate
+
+    def _refill(self, now: float) -> None:
+        # No tokens accrue before the end of a Retry-After block.
+        elapsed = max(0.0, now - self._updated)
+        self._updated = max(now, self._updated)
+        if self._current_rate < self.rate and self.recovery > 0:
+            self._current_rate = min(
+                self.rate,
+                self._current_rate + self.rate * elapsed / self.recovery)
+        self._tokens = min(self.burst,
+                           self._tokens + elapsed * self._current_rate)
+
+    def reserve(self) -> float:
+        """
+        Claims a token and returns the number of seconds the caller has to
+        wait before sending its request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self._current_rate if self._tokens < 0 else 0.0
+            return max(0.0, self._blocked_until - now) + wait
+
+    def acquire(self) -> None:
+        """Blocks the calling thread until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Suspends the calling coroutine until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Lowers the rate after a 429 and honours Retry-After if given."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._current_rate = max(self.min_rate, self._current_rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until,
+                                          now + retry_after)
+                self._updated = self._blocked_until
+
+    def feedback(self, status: int, headers: Mapping[str, str]) -> None:
+        """Adapts the limiter to an API response."""
+        if status == 429:
+            self.penalize(parse_retry_after(headers.get('Retry-After')))
@@ -0,0 +1,229 @@
+"""Recording of KVK API traffic and offline replay of the recordings."""
+
+import base64
+import json
+import mmap
+import re
+import threading
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple
+
+from kvk_api_client.cache import ResponseCache
+
+# Response headers kept in recordings, the ones the clients act on.
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Retry-After')
+
+# The replay key that Recorder writes as the first field of every line.
+_KEY_FIELD = re.compile(rb'\{"key":("(?:[^"\\]|\\.)*")')
+
+
+class ReplayMiss(LookupError):
+    """Raised when a replayed request was not recorded."""
+
+    def __init__(self, key: str) -> None:
+        super().__init__(f'no recording of {key}')
+        self.key = key
+
+
+class Recording(NamedTuple):
+    """A recorded response and the seconds it originally took."""
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    latency: float
+
+
+class Recorder:
+    """
+    Appends every response a client receives to a JSONL file, one compact
+    line per request with its replay key first, then the method, path,
+    params, status, headers, body and latency. Bodies are stored as text,
+    or as base64 if they are not UTF-8. Retried attempts are recorded too,
+    so a replay fails and retries where the original run did. Streamed
+    responses are not recorded.
+
+    Args:
+    -----------
+    path (str): File to append the recordings to.
+
+    Attributes:
+    -----------
+    recorded (int): Number of responses written.
+
+    Example usage:
+    -----------
+        >>> with Recorder('traffic.jsonl') as recorder:
+        ...     kvk = KVK(test=True, recorder=recorder)
+        ...     kvk.get_basis_profiel('12345678')
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, method: str, path: str, params: Mapping[str, Any],
+               status: int, headers: Mapping[str, str], body: bytes,
+               latency: float) -> None:
+        """Appends one request and its response."""
+        params = {k: v for k, v in params.items() if v is not None}
+        entry = {'key': ResponseCache.key(method, path, params),
+                 'method': method, 'path': path,
+                 'params': params,
+                 'status': status,
+                 'headers': {h: headers[h] for h in RECORDED_HEADERS
+                             if headers.get(h) is not None},
+                 'latency': round(latency, 6)}
+        try:
+            entry['text'] = bytes(body).decode('utf-8')
+        except UnicodeDecodeError:
+            entry['base64'] = base64.b64encode(body).decode('ascii')
+
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line.encode('utf-8') + b'\n')
+            self._file.flush()
+            self.recorded += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Replay:
+    """
+    Serves the responses of a Recorder file instead of the KVK API. The
+    file is memory-mapped and indexed once on method, path and params, with
+    the same canonical key as ResponseCache. Indexing reads only the key at
+    the start of every line; a response is only decoded when it is served.
+
+    Requests recorded more than once are answered with their recordings in
+    order, after which the last one keeps being served. Passed to a client
+    as ``replay``, it takes the place of the network below the cache, rate
+    limiter, retries and circuit breaker, so those behave as in the
+    recorded run.
+
+    Args:
+    -----------
+    path (str): A file written by Recorder.
+
+    latency (float): Fraction of the recorded latency to wait before
+    serving a response, 0 to serve at full speed and 1 to reproduce the
+    original timing.
+
+    Raises:
+    -----------
+    ValueError: If a line of the file was not written by Recorder.
+
+    ReplayMiss: From any request that was not recorded.
+
+    Attributes:
+    -----------
+    served (int): Number of responses served.
+
+    misses (int): Number of requests that were not recorded.
+
+    Example usage:
+    -----------
+        >>> with Replay('traffic.jsonl', latency=1.0) as replay:
+        ...     kvk = KVK(test=True, replay=replay)
+        ...     kvk.get_basis_profiel('12345678')
+    """
+
+    def __init__(self, path: str, latency: float = 0.0) -> None:
+        if latency < 0:
+            raise ValueError('latency must not be negative')
+
+        self.path = path
+        self.latency = latency
+        self.served = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        self._positions: Dict[str, int] = {}
+
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be mapped.
+                self._map = None
+        if self._map is not None:
+            try:
+                self.__build_index()
+            except ValueError:
+                self.close()
+                raise
+
+    def __build_index(self) -> None:
+        start, size = 0, len(self._map)
+        while start < size:
+            end = self._map.find(b'\n', start)
+            if end == -1:
+                end = size
+            line = self._map[start:end]
+            if line.strip():
+                match = _KEY_FIELD.match(line)
+                if match is None:
+                    raise ValueError(f'{self.path}: not a Recorder file, line '
+                                     f'at byte {start} does not start with its key')
+                self._index.setdefault(json.loads(match.group(1)), []).append(
+                    (start, end))
+            start = end + 1
+
+    def __len__(self) -> int:
+        return sum(len(offsets) for offsets in self._index.values())
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {'recordings': len(self), 'served': self.served,
+                'misses': self.misses}
+
+    def get(self, method: str, path: str,
+            params: Mapping[str, Any]) -> Recording:
+        """Returns the next recorded response of a request."""
+        key = ResponseCache.key(method, path, params)
+        with self._lock:
+            offsets = self._index.get(key)
+            if not offsets:
+                self.misses += 1
+                raise ReplayMiss(key)
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.served += 1
+        start, end = offsets[min(position, len(offsets) - 1)]
+
+        entry = json.loads(self._map[start:end])
+        if 'base64' in entry:
+            body = base64.b64decode(entry['base64'])
+        else:
+            body = entry['text'].encode('utf-8')
+        return Recording(entry['status'], entry['headers'], body,
+                         entry['latency'])
+
+    def delay(self, recording: Recording) -> float:
+        """Seconds to wait before serving ``recording``."""
+        return recording.latency * self.latency
+
+    def rewind(self) -> None:
+        """Starts serving every request from its first recording again."""
+        with self._lock:
+            self._positions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
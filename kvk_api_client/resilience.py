@@ -0,0 +1,237 @@
+"""Retries and circuit breaking shared by the KVK clients."""
+
+import random
+import threading
+import time
+from typing import Collection, Dict, Optional
+
+from kvk_api_client.paths import endpoint_for
+
+# Statuses that mean the API failed to answer, as opposed to rejecting the request.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of sending a request while the circuit of its endpoint
+    is open.
+
+    Attributes:
+    -----------
+    endpoint (str): The APIpaths endpoint of the request.
+
+    retry_in (float): Seconds until the circuit lets a probe request through.
+    """
+
+    def __init__(self, endpoint: str, retry_in: float) -> None:
+        super().__init__(f'Circuit for {endpoint} is open, '
+                         f'retry in {retry_in:.1f}s')
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """
+    Retries idempotent requests that failed with a transport error, a
+    timeout or one of ``statuses``, after an exponential backoff with full
+    jitter.
+
+    Retries are paid from a budget shared by every client using the policy:
+    each request adds ``budget`` tokens, each retry takes one, so retries
+    stay below ``budget`` of the overall traffic once the initial
+    ``min_budget`` tokens are spent. An outage therefore does not multiply
+    the load on the API.
+
+    Args:
+    -----------
+    retries (int): Maximum number of retries per request.
+
+    backoff (float): Backoff ceiling of the first retry, in seconds. It
+    doubles with every further retry.
+
+    max_backoff (float): Upper bound of the backoff ceiling.
+
+    budget (float): Retries allowed per request sent, e.g. 0.1 for 10%.
+
+    min_budget (float): Tokens available at start, and the cap of the budget.
+
+    statuses (collection): Response statuses that are retried.
+
+    methods (collection): HTTP methods that are safe to retry.
+
+    Attributes:
+    -----------
+    retried (int): Retries granted.
+
+    exhausted (int): Retries refused because the budget was spent.
+
+    Example usage:
+    -----------
+        >>> policy = RetryPolicy(retries=3, budget=0.1)
+        >>> kvk = KVK(test=True, retry=policy)
+        >>> other = AsyncKVK(test=True, retry=policy)
+    """
+
+    def __init__(self, retries: int = 3, backoff: float = 0.1,
+                 max_backoff: float = 10.0, budget: float = 0.1,
+                 min_budget: float = 10.0,
+                 statuses: Collection[int] = RETRY_STATUSES,
+                 methods: Collection[str] = ('GET',)) -> None:
+        if retries < 0:
+            raise ValueError('retries must not be negative')
+
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.min_budget = min_budget
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self.retried = 0
+        self.exhausted = 0
+
+        self._lock = threading.Lock()
+        self._tokens = min_budget
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {'retried': self.retried, 'exhausted': self.exhausted,
+                'budget': self._tokens}
+
+    def deposit(self) -> None:
+        """Adds the share of a new request to the retry budget."""
+        with self._lock:
+            self._tokens = min(self.min_budget, self._tokens + self.budget)
+
+    def retry_delay(self, method: str, retries: int,
+                    status: Optional[int] = None) -> Optional[float]:
+        """
+        Returns the seconds to wait before retrying a request that has
+        already been retried ``retries`` times, or None if it must not be
+        retried. ``status`` is None for transport errors and timeouts.
+        """
+        if method not in self.methods or retries >= self.retries:
+            return None
+        if status is not None and status not in self.statuses:
+            return None
+
+        with self._lock:
+            if self._tokens < 1:
+                self.exhausted += 1
+                return None
+            self._tokens -= 1
+            self.retried += 1
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retries))
+
+
+class CircuitBreaker:
+    """
+    A per-endpoint circuit breaker that can be shared by several clients.
+
+    After ``failure_threshold`` consecutive failures of an endpoint (a
+    transport error, a timeout or a 5xx) the circuit opens and requests to
+    that endpoint raise CircuitOpen without being sent. After
+    ``reset_timeout`` seconds the circuit is half-open and lets
+    ``half_open_requests`` probes through: a successful probe closes it, a
+    failed one opens it again.
+
+    Args:
+    -----------
+    failure_threshold (int): Consecutive failures that open the circuit.
+
+    reset_timeout (float): Seconds the circuit stays open before probing.
+
+    half_open_requests (int): Concurrent probes allowed while half-open.
+
+    Example usage:
+    -----------
+        >>> breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        >>> kvk = KVK(test=True, breaker=breaker)
+        >>> breaker.state(APIpaths.zoeken)
+        'closed'
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_requests: int = 1) -> None:
+        if failure_threshold < 1:
+            raise ValueError('failure_threshold must be at least 1')
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened = {}
+        self._probes = {}
+
+    def state(self, path: str) -> str:
+        """Returns the state of the circuit of the endpoint of ``path``."""
+        with self._lock:
+            return self._state(endpoint_for(path), time.monotonic())
+
+    def _state(self, endpoint: str, now: float) -> str:
+        opened = self._opened.get(endpoint)
+        if opened is None:
+            return self.CLOSED
+        if now - opened < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def before(self, path: str) -> None:
+        """
+        Admits a request to ``path``.
+
+        Raises:
+        -----------
+        CircuitOpen: If the circuit of the endpoint is open, or half-open
+        with all probes in flight.
+        """
+        endpoint = endpoint_for(path)
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(endpoint, now)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and \
+                    self._probes.get(endpoint, 0) < self.half_open_requests:
+                self._probes[endpoint] = self._probes.get(endpoint, 0) + 1
+                return
+            retry_in = max(0.0, self._opened[endpoint] + self.reset_timeout - now)
+        raise CircuitOpen(endpoint, retry_in)
+
+    def record(self, path: str, success: bool) -> None:
+        """Records the outcome of a request admitted by ``before``."""
+        endpoint = endpoint_for(path)
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(endpoint, now)
+            if state == self.HALF_OPEN:
+                self._probes[endpoint] = max(0, self._probes.get(endpoint, 0) - 1)
+            if success:
+                self._failures.pop(endpoint, None)
+                if state == self.HALF_OPEN:
+                    self._opened.pop(endpoint, None)
+                    self._probes.pop(endpoint, None)
+                return
+
+            failures = self._failures.get(endpoint, 0) + 1
+            self._failures[endpoint] = failures
+            if state == self.HALF_OPEN or failures >= self.failure_threshold:
+                self._opened[endpoint] = now
+                self._probes.pop(endpoint, None)
+
+    def release(self, path: str) -> None:
+        """
+        Gives back the probe slot of a request admitted by ``before`` that
+        ended without an outcome, e.g. because it was cancelled.
+        """
+        endpoint = endpoint_for(path)
+        with self._lock:
+            if self._state(endpoint, time.monotonic()) == self.HALF_OPEN:
+                self._probes[endpoint] = max(0, self._probes.get(endpoint, 0) - 1)
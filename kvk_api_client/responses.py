@@ -0,0 +1,110 @@
+"""Response objects for bodies that have already been read."""
+
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator, Mapping
+
+if TYPE_CHECKING:
+    import requests
+
+
+class BufferedContent:
+    """The ``content`` stream of a BufferedResponse, for streaming readers."""
+
+    __slots__ = ('_body',)
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._body), n):
+            yield self._body[start:start + n]
+
+
+class BufferedResponse:
+    """
+    A fully read HTTP response with the read/text/json coroutines of
+    aiohttp.ClientResponse, returned by the async client when no connection
+    is involved, e.g. on a cache hit or a replay.
+
+    Attributes:
+    -----------
+    status (int): The HTTP status code.
+
+    headers (dict): The response headers.
+
+    url (str): The requested URL.
+    """
+
+    __slots__ = ('status', 'headers', 'url', '_body')
+
+    def __init__(self, status: int, headers: Mapping[str, str], body: bytes,
+                 url: str = '') -> None:
+        self.status = status
+        self.headers = dict(headers)
+        self.url = url
+        self._body = body
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_length(self) -> int:
+        return len(self._body)
+
+    @property
+    def content(self) -> BufferedContent:
+        return BufferedContent(self._body)
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self._body.decode(encoding)
+
+    async def json(self, **kwargs) -> Any:
+        return json.loads(self._body)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            import aiohttp
+            from multidict import CIMultiDict, CIMultiDictProxy
+            from yarl import URL
+            request_info = aiohttp.RequestInfo(
+                URL(self.url), 'GET', CIMultiDictProxy(CIMultiDict()),
+                URL(self.url))
+            raise aiohttp.ClientResponseError(
+                request_info, (), status=self.status,
+                message=f'HTTP {self.status}', headers=self.headers)
+
+    def release(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return f'<BufferedResponse [{self.status}] {self.url}>'
+
+
+def requests_response(status: int, headers: Mapping[str, str], body: bytes,
+                      url: str = '') -> 'requests.Response':
+    """
+    Builds a requests.Response around a body that has already been read,
+    as returned by the blocking clients on a cache hit, a replay or a
+    request run on the background loop. Its ``iter_content`` and
+    ``iter_lines`` serve the body from memory.
+    """
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response._content_consumed = True
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
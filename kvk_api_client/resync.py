@@ -0,0 +1,287 @@
+"""Change detection for portfolios of companies.
+
+A SnapshotStore keeps the last seen basisprofiel of every company in a
+portfolio. resync() refetches the companies that were checked longest ago,
+with If-None-Match where an ETag is known, and yields only what changed.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from typing import (Any, AsyncIterator, Dict, Iterable, Iterator, NamedTuple,
+                    Optional)
+
+import aiohttp
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.batch import abounded_map
+from kvk_api_client.enrich import QuotaExhausted
+from kvk_api_client.models import dumps, loads
+
+
+class Snapshot(NamedTuple):
+    """The stored state of one company."""
+
+    kvk_nummer: str
+    hash: Optional[str]
+    fetched: float
+    materiele_registratie: Optional[dict]
+    etag: Optional[str]
+    document: Optional[dict]
+
+
+class Change(NamedTuple):
+    """
+    A detected change of a company.
+
+    Attributes:
+    -----------
+    kvk_nummer (str): The KVK number of the company.
+
+    kind (str): 'added' for a company seen for the first time, 'changed',
+    'removed' when the API no longer knows it, or 'failed' when it could
+    not be fetched.
+
+    diff (dict): The 'added', 'changed' and 'removed' fields, keyed by
+    their dotted path. Changed fields hold [old, new]. For a failed fetch
+    it holds the 'error' instead, with its message and HTTP status if any.
+    """
+
+    kvk_nummer: str
+    kind: str
+    diff: Dict[str, Dict[str, Any]]
+
+    def to_json(self) -> dict:
+        return {'kvkNummer': self.kvk_nummer, 'kind': self.kind, **self.diff}
+
+
+def _flatten(document: Any, prefix: str = '') -> Dict[str, Any]:
+    """Flattens nested objects into dotted paths. Lists are kept whole."""
+    if not isinstance(document, dict):
+        return {prefix: document}
+    fields = {}
+    for key, value in document.items():
+        path = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict) and value:
+            fields.update(_flatten(value, path))
+        else:
+            fields[path] = value
+    return fields
+
+
+def diff(old: Optional[dict], new: Optional[dict]) -> Dict[str, Dict[str, Any]]:
+    """Returns the fields added, changed and removed between two documents."""
+    old_fields = _flatten(old) if old else {}
+    new_fields = _flatten(new) if new else {}
+    return {
+        'added': {k: v for k, v in new_fields.items() if k not in old_fields},
+        'changed': {k: [old_fields[k], v] for k, v in new_fields.items()
+                    if k in old_fields and old_fields[k] != v},
+        'removed': {k: v for k, v in old_fields.items() if k not in new_fields},
+    }
+
+
+def content_hash(document: dict) -> str:
+    return hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()
+
+
+class SnapshotStore:
+    """
+    A compact sqlite store of the basisprofielen of a portfolio: per KVK
+    number the content hash, the time it was last checked, its
+    materieleRegistratie, the ETag of the response and the compressed
+    document the next diff is computed against.
+
+    Args:
+    -----------
+    path (str): Location of the sqlite database.
+
+    Example usage:
+    -----------
+        >>> store = SnapshotStore('portfolio.sqlite3')
+        >>> store.add(kvk_numbers)
+        >>> async with KVK(test=False) as kvk:
+        ...     async for change in resync(kvk, store, concurrency=20):
+        ...         print(change.to_json())
+    """
+
+    def __init__(self, path: str = ':memory:') -> None:
+        self._db = sqlite3.connect(path)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS snapshots (
+                kvkNummer TEXT PRIMARY KEY,
+                hash TEXT,
+                fetched REAL NOT NULL DEFAULT 0,
+                materieleRegistratie TEXT,
+                etag TEXT,
+                document BLOB);
+            CREATE INDEX IF NOT EXISTS snapshots_fetched
+                ON snapshots (fetched, kvkNummer);
+        ''')
+
+    def __len__(self) -> int:
+        return self._db.execute('SELECT count(*) FROM snapshots').fetchone()[0]
+
+    def add(self, kvk_numbers: Iterable[str]) -> None:
+        """Adds companies to the portfolio. They are resynced first."""
+        self._db.executemany('INSERT OR IGNORE INTO snapshots (kvkNummer) VALUES (?)',
+                             ((n,) for n in kvk_numbers))
+        self._db.commit()
+
+    def discard(self, kvk_number: str) -> None:
+        """Removes a company from the portfolio."""
+        self._db.execute('DELETE FROM snapshots WHERE kvkNummer = ?', (kvk_number,))
+        self._db.commit()
+
+    def get(self, kvk_number: str) -> Optional[Snapshot]:
+        row = self._db.execute(
+            'SELECT kvkNummer, hash, fetched, materieleRegistratie, etag, document '
+            'FROM snapshots WHERE kvkNummer = ?', (kvk_number,)).fetchone()
+        if row is None:
+            return None
+        return Snapshot(row[0], row[1], row[2],
+                        json.loads(row[3]) if row[3] else None, row[4],
+                        loads(zlib.decompress(row[5])) if row[5] else None)
+
+    def put(self, kvk_number: str, document: Optional[dict],
+            etag: Optional[str] = None) -> None:
+        """
+        Stores the current document of a company, None if the API no longer
+        knows it. Call commit() to make writes durable.
+        """
+        if document is None:
+            values = (None, None, None, None)
+        else:
+            materiele = document.get('materieleRegistratie')
+            values = (content_hash(document),
+                      json.dumps(materiele) if materiele else None, etag,
+                      zlib.compress(dumps(document)))
+        self._db.execute(
+            'INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (kvkNummer) '
+            'DO UPDATE SET hash = excluded.hash, fetched = excluded.fetched, '
+            'materieleRegistratie = excluded.materieleRegistratie, '
+            'etag = excluded.etag, document = excluded.document',
+            (kvk_number, values[0], time.time(), values[1], values[2], values[3]))
+
+    def touch(self, kvk_number: str) -> None:
+        """Marks a company as checked without changes."""
+        self._db.execute('UPDATE snapshots SET fetched = ? WHERE kvkNummer = ?',
+                         (time.time(), kvk_number))
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def due(self, max_age: float = 0, limit: Optional[int] = None,
+            page_size: int = 1000) -> Iterator[str]:
+        """
+        Yields the KVK numbers not checked for ``max_age`` seconds, the
+        longest unchecked (or never fetched) first. Numbers are read in
+        pages, so the portfolio is never loaded into memory at once.
+        """
+        cutoff = time.time() - max_age
+        last = (-1.0, '')
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = self._db.execute(
+                'SELECT fetched, kvkNummer FROM snapshots WHERE fetched <= ? '
+                'AND (fetched, kvkNummer) > (?, ?) ORDER BY fetched, kvkNummer '
+                'LIMIT ?', (cutoff, last[0], last[1], size)).fetchall()
+            if not rows:
+                return
+            for _, kvk_number in rows:
+                yield kvk_number
+            last = rows[-1]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+
+async def resync(kvk: KVK, store: SnapshotStore, max_age: float = 0,
+                 limit: Optional[int] = None, concurrency: int = 10,
+                 commit_every: int = 100) -> AsyncIterator[Change]:
+    """
+    Refetches the basisprofielen of the portfolio in ``store``, the longest
+    unchecked first, and yields a Change for every company that was added,
+    changed or removed. Unchanged companies, including 304 answers to the
+    If-None-Match sent for known ETags, only update the check time.
+    Companies whose request failed are yielded as 'failed' Changes and
+    left due for the next run.
+
+    Args:
+    -----------
+    kvk (KVK): An open async client with the default 'response' result mode.
+
+    store (SnapshotStore): The portfolio and its snapshots.
+
+    max_age (float): Only companies not checked for this many seconds are
+    refetched.
+
+    limit (int, optional): Maximum number of companies to refetch.
+
+    concurrency (int): Maximum number of requests in flight.
+
+    commit_every (int): Companies between commits of the store.
+
+    Raises:
+    -----------
+    QuotaExhausted: If the API answered 429. Checked companies are
+    committed first, so a rerun continues with the rest.
+    """
+    if kvk.result != 'response':
+        raise ValueError('resync needs a client returning responses')
+
+    async def fetch(kvk_number):
+        snapshot = store.get(kvk_number)
+        response = await kvk.get_basis_profiel(
+            kvk_number, etag=snapshot.etag if snapshot else None)
+        body = await response.read()
+        if response.status == 429:
+            raise QuotaExhausted(f'429 for {kvk_number}')
+        if response.status in (304, 404):
+            return snapshot, response.status, None, None
+        response.raise_for_status()
+        return snapshot, response.status, loads(body), response.headers.get('ETag')
+
+    checked = 0
+    try:
+        async for result in abounded_map(fetch, store.due(max_age, limit), concurrency):
+            if not result.ok:
+                if isinstance(result.error, QuotaExhausted):
+                    raise result.error
+                error = {'message': repr(result.error)}
+                if isinstance(result.error, aiohttp.ClientResponseError):
+                    error = {'status': result.error.status,
+                             'message': result.error.message}
+                yield Change(result.item, 'failed', {'error': error})
+                continue
+
+            snapshot, status, document, etag = result.result
+            old = snapshot.document if snapshot else None
+            if status == 304:
+                store.touch(result.item)
+            elif document is not None and snapshot \
+                    and snapshot.hash == content_hash(document):
+                if etag != snapshot.etag:
+                    store.put(result.item, document, etag)
+                else:
+                    store.touch(result.item)
+            elif status == 404:
+                store.put(result.item, None)
+                if old is not None:
+                    yield Change(result.item, 'removed', diff(old, None))
+            else:
+                store.put(result.item, document, etag)
+                yield Change(result.item, 'changed' if old is not None else 'added',
+                             diff(old, document))
+
+            checked += 1
+            if checked % commit_every == 0:
+                store.commit()
+    finally:
+        store.commit()
@@ -0,0 +1,117 @@
+"""Incremental decoding of the item arrays of large KVK responses."""
+
+import re
+from typing import Any, List
+
+from kvk_api_client.models import loads
+
+_STRUCTURAL = re.compile(rb'["\[\]{},:]')
+_STRING_END = re.compile(rb'["\\]')
+
+
+class ArrayItemDecoder:
+    """
+    Decodes the objects of one top-level array, such as ``resultaten`` of a
+    zoeken page or ``vestigingen`` of a company, from a JSON body that
+    arrives in chunks.
+
+    Only the bytes of the item currently being received are buffered, and
+    every item is decoded as soon as its closing brace arrives. The rest of
+    the document is skipped.
+
+    Args:
+    -----------
+    key (str): The top-level key of the array.
+
+    Example usage:
+    -----------
+        >>> decoder = ArrayItemDecoder('resultaten')
+        >>> for chunk in response.iter_content(16384):
+        ...     for item in decoder.feed(chunk):
+        ...         print(item['kvkNummer'])
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key.encode()
+        self.done = False
+
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = None
+        self._last_key = None
+        self._in_value = False
+        self._array_depth = None
+        self._item_start = None
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Consumes the next chunk and returns the items it completed."""
+        if self.done:
+            return []
+
+        buffer = self._buffer
+        buffer += chunk
+        items = []
+        i = self._pos
+        end = len(buffer)
+
+        while i < end:
+            if self._in_string:
+                match = _STRING_END.search(buffer, i)
+                if match is None:
+                    i = end
+                    break
+                i = match.start()
+                if buffer[i] == 0x5c:  # backslash, skip the escaped byte
+                    i += 2
+                    continue
+                self._in_string = False
+                if self._string_start is not None:
+                    self._last_key = bytes(buffer[self._string_start:i])
+                    self._string_start = None
+                i += 1
+                continue
+
+            match = _STRUCTURAL.search(buffer, i)
+            if match is None:
+                i = end
+                break
+            i = match.start()
+            char = buffer[i]
+
+            if char == 0x22:  # "
+                self._in_string = True
+                if self._depth == 1 and not self._in_value:
+                    self._string_start = i + 1
+            elif char in b'{[':
+                if self._depth == self._array_depth and self._item_start is None:
+                    self._item_start = i
+                if (char == 0x5b and self._depth == 1 and self._in_value
+                        and self._last_key == self.key):
+                    self._array_depth = 2
+                self._depth += 1
+            elif char in b'}]':
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if self._depth == self._array_depth and self._item_start is not None:
+                        items.append(loads(bytes(buffer[self._item_start:i + 1])))
+                        self._item_start = None
+                    elif self._depth < self._array_depth:
+                        self.done = True
+                        break
+            elif char == 0x3a and self._depth == 1:  # :
+                self._in_value = True
+            elif char == 0x2c and self._depth == 1:  # ,
+                self._in_value = False
+            i += 1
+
+        keep = min(x for x in (i, end, self._item_start, self._string_start)
+                   if x is not None)
+        if self._item_start is not None:
+            self._item_start -= keep
+        if self._string_start is not None:
+            self._string_start -= keep
+        del buffer[:keep]
+        self._pos = i - keep
+        return items
@@ -0,0 +1,320 @@
+"""A local stand-in for the KVK API, for offline tests and benchmarks.
+
+The server answers every APIpaths endpoint with deterministic canned
+payloads derived from the requested number, with configurable latency,
+error rate and 429 injection. Any API version prefix is accepted, so point
+KVK_HOST at the server and keep KVK_API_VERSION as it is.
+
+    python -m kvk_api_client.stub_server --port 8080 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+from typing import Optional
+
+from aiohttp import web
+
+from kvk_api_client.paths import (APIpaths, BasisProfielPaths, MAX_AANTAL,
+                                  ZOEKEN_TYPES)
+
+
+def _vestigingsnummer(kvk_number: str, index: int) -> str:
+    return f'{int(kvk_number) % 10 ** 8:08d}{index:04d}'
+
+
+def _adres(number: str) -> dict:
+    return {'type': 'bezoekadres', 'indAfgeschermd': 'Nee',
+            'volledigAdres': f'Stubstraat {int(number) % 100 + 1} 1234AB Utrecht',
+            'straatnaam': 'Stubstraat', 'huisnummer': int(number) % 100 + 1,
+            'postcode': '1234AB', 'plaats': 'Utrecht', 'land': 'Nederland'}
+
+
+def _link(rel: str, path: str) -> dict:
+    return {'rel': rel, 'href': f'https://api.kvk.nl/api/v1/{path}'}
+
+
+class StubServer:
+    """
+    An aiohttp server imitating the KVK API.
+
+    Args:
+    -----------
+    latency (float): Seconds every response is delayed by.
+
+    jitter (float): Extra random delay of up to this many seconds.
+
+    error_rate (float): Fraction of requests answered with 500.
+
+    rate_429 (float): Fraction of requests answered with 429.
+
+    retry_after (int): Retry-After seconds sent with injected 429s.
+
+    straggler_rate (float): Fraction of requests delayed by
+    ``straggler_latency`` on top of the normal latency.
+
+    straggler_latency (float): Extra seconds a straggler is delayed by.
+
+    vestigingen (int): Number of vestigingen every company has.
+
+    zoeken_totaal (int): Number of results every search has. The results
+    cycle through ZOEKEN_TYPES, so a type filter returns a third of them.
+
+    seed (int, optional): Seed for the error and 429 injection.
+
+    chunk_delay (float): If set, responses are sent with chunked transfer
+    encoding in four parts, each delayed by this many seconds.
+
+    Attributes:
+    -----------
+    requests (int): Number of requests served.
+
+    revisions (dict): Revision per KVK number. Bump it to change the
+    basisprofiel of a company.
+
+    removed (set): KVK numbers whose basisprofiel answers 404.
+
+    url (str): Base URL of the running server, to be used as KVK_HOST.
+
+    Example usage:
+    -----------
+        >>> with StubServer(latency=0.01).run_in_thread() as server:
+        ...     os.environ['KVK_HOST'] = server.url
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_429: float = 0.0,
+                 retry_after: int = 1, straggler_rate: float = 0.0,
+                 straggler_latency: float = 2.0, vestigingen: int = 3,
+                 zoeken_totaal: int = 25, seed: Optional[int] = None,
+                 chunk_delay: float = 0.0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.straggler_rate = straggler_rate
+        self.straggler_latency = straggler_latency
+        self.vestigingen = vestigingen
+        self.zoeken_totaal = zoeken_totaal
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self.revisions = {}
+        self.removed = set()
+        self.url = None
+
+        self._random = random.Random(seed)
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+        self.app = web.Application(middlewares=[self._inject])
+        self.app.router.add_get(
+            r'/{version:.*}/' + APIpaths.basisprofielen + r'/{kvk}', self.basisprofiel)
+        self.app.router.add_get(
+            r'/{version:.*}/' + APIpaths.basisprofielen + r'/{kvk}/{sub}', self.basisprofiel)
+        self.app.router.add_get(
+            r'/{version:.*}/' + APIpaths.vestigingsprofielen + r'/{nummer}', self.vestigingsprofiel)
+        self.app.router.add_get(
+            r'/{version:.*}/' + APIpaths.naamgevingen + r'/{kvk}', self.naamgeving)
+        self.app.router.add_get(r'/{version:.*}/' + APIpaths.zoeken, self.zoeken)
+
+    @web.middleware
+    async def _inject(self, request: web.Request, handler):
+        self.requests += 1
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if self.straggler_rate and self._random.random() < self.straggler_rate:
+            delay += self.straggler_latency
+        if delay:
+            await asyncio.sleep(delay)
+        if request.headers.get('apikey') is None:
+            return web.json_response({'fout': [{'code': 'IPD0001'}]}, status=401)
+        roll = self._random.random()
+        if roll < self.rate_429:
+            return web.json_response({'fout': [{'code': 'TOO_MANY_REQUESTS'}]}, status=429,
+                                     headers={'Retry-After': str(self.retry_after)})
+        if roll < self.rate_429 + self.error_rate:
+            return web.json_response({'fout': [{'code': 'IPD9999'}]}, status=500)
+        response = await handler(request)
+        if self.chunk_delay and response.body:
+            return await self._chunked(request, response)
+        return response
+
+    async def _chunked(self, request: web.Request,
+                       response: web.Response) -> web.StreamResponse:
+        """Sends the body of ``response`` in delayed chunks."""
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() != 'content-length'}
+        chunked = web.StreamResponse(status=response.status, headers=headers)
+        chunked.enable_chunked_encoding()
+        await chunked.prepare(request)
+        body = response.body
+        size = -(-len(body) // 4)
+        for start in range(0, len(body), size):
+            await asyncio.sleep(self.chunk_delay)
+            await chunked.write(body[start:start + size])
+        await chunked.write_eof()
+        return chunked
+
+    def _vestiging(self, kvk_number: str, index: int) -> dict:
+        nummer = _vestigingsnummer(kvk_number, index)
+        return {'vestigingsnummer': nummer, 'kvkNummer': kvk_number,
+                'eersteHandelsnaam': f'Stub {kvk_number} vestiging {index}',
+                'indHoofdvestiging': 'Ja' if index == 0 else 'Nee',
+                'indCommercieleVestiging': 'Ja',
+                'totaalWerkzamePersonen': 1 + index,
+                'adressen': [_adres(nummer)],
+                'sbiActiviteiten': [{'sbiCode': '6201', 'indHoofdactiviteit': 'Ja',
+                                     'sbiOmschrijving': 'Ontwikkelen van software'}],
+                'links': [_link('self', f'{APIpaths.vestigingsprofielen}/{nummer}')]}
+
+    async def basisprofiel(self, request: web.Request) -> web.Response:
+        kvk_number = request.match_info['kvk']
+        if not kvk_number.isdigit():
+            return web.json_response({'fout': [{'code': 'IPD0004'}]}, status=400)
+
+        sub = request.match_info.get('sub')
+        if sub == BasisProfielPaths.eigenaar:
+            return web.json_response({'rsin': kvk_number.zfill(9), 'rechtsvorm': 'BeslotenVennootschap',
+                                      'adressen': [_adres(kvk_number)]})
+        if sub == BasisProfielPaths.hoodfvestiging:
+            return web.json_response(self._vestiging(kvk_number, 0))
+        if sub == BasisProfielPaths.vestigingen:
+            return web.json_response({
+                'kvkNummer': kvk_number,
+                'totaalAantalVestigingen': self.vestigingen,
+                'vestigingen': [{'vestigingsnummer': _vestigingsnummer(kvk_number, i),
+                                 'eersteHandelsnaam': f'Stub {kvk_number} vestiging {i}',
+                                 'indHoofdvestiging': 'Ja' if i == 0 else 'Nee'}
+                                for i in range(self.vestigingen)]})
+        if sub is not None:
+            raise web.HTTPNotFound()
+        if kvk_number in self.removed:
+            return web.json_response({'fout': [{'code': 'IPD0005'}]}, status=404)
+
+        revision = self.revisions.get(kvk_number, 0)
+        return self._conditional(request, {
+            'kvkNummer': kvk_number, 'naam': f'Stub {kvk_number} B.V.',
+            'formeleRegistratiedatum': '20000101',
+            'materieleRegistratie': {'datumAanvang': '20000101'},
+            'totaalWerkzamePersonen': self.vestigingen + revision,
+            'handelsnamen': [{'naam': f'Stub {kvk_number} B.V.', 'volgorde': 0}],
+            'sbiActiviteiten': [{'sbiCode': '6201', 'indHoofdactiviteit': 'Ja',
+                                 'sbiOmschrijving': 'Ontwikkelen van software'}],
+            'links': [_link('self', f'{APIpaths.basisprofielen}/{kvk_number}')],
+            '_embedded': {'hoofdvestiging': self._vestiging(kvk_number, 0)}})
+
+    @staticmethod
+    def _conditional(request: web.Request, body: dict) -> web.Response:
+        """Answers with an ETag, or 304 if the client sent a matching one."""
+        digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        etag = f'"{digest[:16]}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.json_response(body, headers={'ETag': etag})
+
+    async def vestigingsprofiel(self, request: web.Request) -> web.Response:
+        nummer = request.match_info['nummer']
+        return web.json_response(self._vestiging(nummer[:8], int(nummer[8:] or 0)))
+
+    async def naamgeving(self, request: web.Request) -> web.Response:
+        kvk_number = request.match_info['kvk']
+        return web.json_response({
+            'kvkNummer': kvk_number, 'naam': f'Stub {kvk_number} B.V.',
+            'vestigingen': [{'vestigingsnummer': _vestigingsnummer(kvk_number, i),
+                             'eersteHandelsnaam': f'Stub {kvk_number} vestiging {i}'}
+                            for i in range(self.vestigingen)]})
+
+    async def zoeken(self, request: web.Request) -> web.Response:
+        pagina = int(request.query.get('pagina', 1))
+        aantal = min(int(request.query.get('aantal', 10)), MAX_AANTAL)
+        matches = range(self.zoeken_totaal)
+        if request.query.get('kvkNummer'):
+            matches = range(1)
+        if request.query.get('type') in ZOEKEN_TYPES:
+            matches = matches[ZOEKEN_TYPES.index(request.query['type'])::len(ZOEKEN_TYPES)]
+        first = (pagina - 1) * aantal
+        if first >= len(matches):
+            return web.json_response({'fout': [{'code': 'IPD5200'}]}, status=404)
+
+        resultaten = []
+        for i in matches[first:first + aantal]:
+            kvk_number = request.query.get('kvkNummer') or f'{90000000 + i}'
+            resultaten.append({'kvkNummer': kvk_number,
+                               'vestigingsnummer': _vestigingsnummer(kvk_number, 0),
+                               'naam': request.query.get('handelsnaam', f'Stub {kvk_number} B.V.'),
+                               'adres': {'binnenlandsAdres': _adres(kvk_number)},
+                               'type': ZOEKEN_TYPES[i % len(ZOEKEN_TYPES)]})
+        return web.json_response({'pagina': pagina, 'resultatenPerPagina': aantal,
+                                  'totaal': len(matches), 'resultaten': resultaten})
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Starts serving on the running loop and returns the base URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f'http://{host}:{port}'
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def run_in_thread(self, host: str = '127.0.0.1', port: int = 0) -> 'StubServer':
+        """Serves from a background thread, for use with the sync client."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start(host, port))
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'StubServer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_thread()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m kvk_api_client.stub_server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--straggler-rate', type=float, default=0.0)
+    parser.add_argument('--straggler-latency', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    server = StubServer(latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, rate_429=args.rate_429,
+                        straggler_rate=args.straggler_rate,
+                        straggler_latency=args.straggler_latency)
+    web.run_app(server.app, host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,27 @@
 """A very simple wrapper around KVK api."""
 
-import os
+import time
+import warnings
 import requests
-from typing import Optional
-from kvk_api_client.paths import APIpaths
+from functools import partial
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+from kvk_api_client.batch import BatchResult, thread_map
+from kvk_api_client.cache import ResponseCache
+from kvk_api_client.config import KVKConfig
+from kvk_api_client.index import CompanyIndex
+from kvk_api_client.keys import KeyPool
+from kvk_api_client.models import (BASIS_PROFIEL_MODELS, BasisProfiel,
+                                   Naamgeving, Vestiging, Vestigingsprofiel,
+                                   ZoekResultaat, Zoekresultaten)
+from kvk_api_client.metrics import RequestEvent
+from kvk_api_client.paths import (APIpaths, BasisProfielPaths, MAX_AANTAL,
+                                  MAX_PAGINA, endpoint_for)
+from kvk_api_client.rate_limit import RateLimiter
+from kvk_api_client.replay import Recorder, Replay
+from kvk_api_client.resilience import CircuitBreaker, RetryPolicy
+from kvk_api_client.responses import requests_response
+from kvk_api_client.streaming import ArrayItemDecoder
 
 class KVK:
     """
@@ -13,9 +31,53 @@ class KVK:
     -----------
     test (bool): If True, uses the KVK API test environment.
 
+    config (KVKConfig, optional): Host, API version and keys to use. Read
+    from the environment and a .env file by default.
+
+    pool_connections (int): Number of per-host connection pools to keep.
+
+    pool_maxsize (int): Maximum number of kept-alive connections per host.
+
+    pool_block (bool): If True, block when all connections to a host are
+    in use instead of opening extra, non-pooled connections.
+
+    rate_limiter (RateLimiter, optional): Limits the request rate and adapts
+    it to 429 responses. Can be shared between clients.
+
+    cache (ResponseCache, optional): Serves repeated GET requests from a
+    local cache instead of the API.
+
+    key_pool (KeyPool, optional): Picks the API key of every request from a
+    pool of keys with quotas, instead of using the configured key. Raises
+    KeysExhausted when all quotas are used up.
+
+    retry (RetryPolicy, optional): Retries GET requests that failed with a
+    connection error, a timeout or a 5xx, within a shared retry budget.
+
+    breaker (CircuitBreaker, optional): Fails fast with CircuitOpen while
+    an endpoint keeps failing. Can be shared between clients.
+
+    index (CompanyIndex, optional): Records every zoeken and basisprofiel
+    response and answers get_companies calls it covers while fresh.
+
+    recorder (Recorder, optional): Appends every response received from the
+    API to a file that a Replay can serve later.
+
+    replay (Replay, optional): Serves recorded responses instead of sending
+    requests. Raises ReplayMiss for requests that were not recorded.
+
+    typed (bool): If True, the get_* methods raise requests.HTTPError for
+    error statuses and return compact models from kvk_api_client.models
+    instead of the response.
+
+    on_request (callable, optional): Called with a RequestEvent after every
+    request, e.g. a MetricsAggregator.
+
     Raises:
     -----------
-    ValueError: If the required environment variables are not set.
+    ValueError: If the required settings are not configured.
+
+    CircuitOpen: From any request while the circuit of its endpoint is open.
 
     Attributes:
     -----------
@@ -27,54 +89,251 @@ class KVK:
 
     headers (dict): HTTP headers for API requests.
 
+    session (requests.Session): Connection-pooled session shared by all
+    requests of this client.
+
     Example usage:
     -----------
-        >>> kvk = KVK(test=True)
-        >>> response = kvk.get_basis_profiel('12345678')
+        >>> with KVK(test=True) as kvk:
+        ...     response = kvk.get_basis_profiel('12345678')
     """
 
-    def __init__(self, test: bool) -> None:
-
-        self.host = os.getenv('KVK_HOST')
-        self.api_version = os.getenv('KVK_API_VERSION')
-        self.api_key = os.getenv('KVK_APIKEY_PROD')
-
-        if not self.host:
-            raise ValueError('KVK_HOST is not set')
-
-        if not self.api_version:
-            raise ValueError('KVK_API_VERSION is not set')
-
-        if not self.api_key:
-            raise ValueError('KVK_APIKEY is not set')
-
-        if test:
-            self.api_key = os.getenv('KVK_APIKEY_TEST')
-            self.api_version = 'test/' + self.api_version
-
-        if not self.api_key:
-            raise ValueError('KVK_APIKEY is not set')
-
-        self.headers = {'apikey': self.api_key}
-
-    def __send_request(self, request_type, *res, **params) \
-            -> requests.Response:
+    def __init__(self, test: bool,
+                 config: Optional[KVKConfig] = None,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 pool_block: bool = False,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 key_pool: Optional[KeyPool] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 index: Optional[CompanyIndex] = None,
+                 recorder: Optional[Recorder] = None,
+                 replay: Optional[Replay] = None,
+                 typed: bool = False,
+                 on_request: Optional[Callable[[RequestEvent], None]] = None) -> None:
+
+        config = config or KVKConfig.from_env()
+        self.host, self.api_version, self.api_key = config.resolve(
+            test, require_key=key_pool is None)
+
+        self.headers = {'apikey': self.api_key} if self.api_key else {}
+        self.key_pool = key_pool
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.retry = retry
+        self.breaker = breaker
+        self.index = index
+        self.recorder = recorder
+        self.replay = replay
+        self.typed = typed
+        self.on_request = on_request
+
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.verify = False
+        warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying session and its pooled connections."""
+        self.session.close()
+
+    def __send_request(self, request_type, *res, stream=False, headers=None,
+                       **params) -> requests.Response:
 
         if self.host is None:
             raise ValueError('HOST is not set')
 
-        url = self.host + ''.join(['/' + r for r in (self.api_version, *res)
-                                   if r is not None])
-
-        response = requests.request(
-            request_type, url, headers=self.headers, params=params,
-            verify=False)
+        path = '/'.join(r for r in res if r is not None)
+        url = f"{self.host}/{self.api_version}/{path}"
+        started = time.perf_counter()
+
+        cache_key = None
+        if self.cache and request_type == "GET" and not stream and not headers:
+            cache_key = self.cache.key(request_type, url, params)
+            entry = self.cache.get(cache_key)
+            if entry:
+                self.__emit(request_type, path, entry.status, len(entry.body),
+                            started, cache_hit=True)
+                return requests_response(entry.status, entry.headers,
+                                         entry.body, url)
+
+        if self.index and path == APIpaths.zoeken and not stream and not headers:
+            body = self.index.answer(params)
+            if body is not None:
+                self.__emit(request_type, path, 200, len(body), started,
+                            cache_hit=True)
+                return requests_response(
+                    200, {'Content-Type': 'application/json'}, body, url)
+
+        if self.retry:
+            self.retry.deposit()
+
+        retries = 0
+        while True:
+            if self.breaker:
+                self.breaker.before(path)
+            admitted = bool(self.breaker)
+
+            try:
+                request_headers = dict(headers or {})
+                if self.key_pool and self.replay is None:
+                    request_headers['apikey'] = self.key_pool.acquire()
+
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+
+                started = time.perf_counter()
+                try:
+                    if self.replay is not None:
+                        response = self.__replayed(request_type, path, url, params)
+                    else:
+                        response = self.session.request(request_type, url,
+                                                        params=params,
+                                                        headers=request_headers,
+                                                        stream=stream)
+                except requests.RequestException as exc:
+                    self.__emit(request_type, path, None, 0, started,
+                                retries=retries, error=repr(exc))
+                    if not isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+                        raise
+                    if self.breaker:
+                        admitted = False
+                        self.breaker.record(path, False)
+                    delay = self.retry.retry_delay(request_type, retries) \
+                        if self.retry else None
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    retries += 1
+                    continue
+
+                ttfb = response.elapsed.total_seconds()
+                if stream:
+                    size = int(response.headers.get('Content-Length', 0))
+                    download = None
+                else:
+                    size = len(response.content)
+                    # requests reads the body before returning, after the headers.
+                    download = max(0.0, time.perf_counter() - started - ttfb) \
+                        if self.replay is None else None
+                self.__emit(request_type, path, response.status_code, size, started,
+                            ttfb=ttfb, download=download, retries=retries)
+
+                if self.recorder and not stream:
+                    self.recorder.record(request_type, path, params,
+                                         response.status_code, response.headers,
+                                         response.content,
+                                         time.perf_counter() - started)
+
+                if self.rate_limiter:
+                    self.rate_limiter.feedback(response.status_code, response.headers)
+
+                if self.breaker:
+                    admitted = False
+                    self.breaker.record(path, response.status_code < 500)
+            except BaseException as exc:
+                # Whatever went wrong, free the slot before() handed out.
+                if admitted:
+                    if isinstance(exc, Exception):
+                        self.breaker.record(path, False)
+                    else:
+                        self.breaker.release(path)
+                raise
+
+            delay = self.retry.retry_delay(
+                request_type, retries, response.status_code) if self.retry else None
+            if delay is None:
+                break
+            response.close()
+            time.sleep(delay)
+            retries += 1
+
+        if cache_key and response.status_code == 200:
+            self.cache.set(cache_key, path, response.status_code,
+                           response.headers, response.content)
+
+        if self.index and response.status_code == 200 and not stream:
+            self.index.record(path, params, response.content)
 
         return response
 
+    def __emit(self, method: str, path: str, status: Optional[int], size: int,
+               started: float, **fields) -> None:
+        if self.on_request:
+            self.on_request(RequestEvent(
+                method, endpoint_for(path), path, status, size,
+                time.perf_counter() - started, **fields))
+
+    def __replayed(self, method: str, path: str, url: str,
+                   params: dict) -> requests.Response:
+        recording = self.replay.get(method, path, params)
+        delay = self.replay.delay(recording)
+        if delay:
+            time.sleep(delay)
+        return requests_response(recording.status, recording.headers,
+                                 recording.body, url)
+
+    def __result(self, response: requests.Response, model: type):
+        """Return the response, or its body decoded as ``model`` if typed."""
+        if not self.typed:
+            return response
+        response.raise_for_status()
+        if response.status_code == 304:
+            return None
+        return model.from_json(response.content)
+
+    def __stream(self, send: Callable[[], requests.Response], key: str,
+                 model: type, chunk_size: int,
+                 empty_on_404: bool = False) -> Iterator[Any]:
+        """
+        Send the request on first iteration and decode the items of the
+        ``key`` array while the body downloads. The connection is released
+        when the generator finishes or is closed.
+        """
+        with send() as response:
+            if empty_on_404 and response.status_code == 404:
+                return
+            response.raise_for_status()
+            decoder = ArrayItemDecoder(key)
+            for chunk in response.iter_content(chunk_size):
+                for item in decoder.feed(chunk):
+                    yield model(item) if self.typed else item
+                if decoder.done:
+                    return
+
+    def __search(self, kvk_number: Optional[str] = None,
+                 **params) -> requests.Response:
+        """Validate the search parameters and send a zoeken request."""
+        if (params.get('huisnummer') or params.get('postcode')) and \
+                (not params.get('huisnummer') or not params.get('postcode')):
+            raise ValueError(
+                'Huisnummer and postcode must be set together')
+
+        if params.get('huisnummerToevoeging') and not params.get('huisnummer'):
+            raise ValueError(
+                'HuisnummerToevoeging must be set together with huisnummer')
+
+        return self.__send_request("GET", APIpaths.zoeken,
+                                   kvkNummer=kvk_number, **params)
+
     def get_basis_profiel(self, kvk_number: str,
                           basis_profile_type: Optional[str] = None,
-                          geo_data: str = "False") -> requests.Response:
+                          geo_data: str = "False",
+                          etag: Optional[str] = None) -> requests.Response:
         """
         Sends a GET request to the KVK basisprofiel API and returns the response.
 
@@ -82,6 +341,9 @@ class KVK:
         -----------
         kvk_number (str): The KVK number of the company.
         geo_data (str): If True, returns geo data for the company.
+        etag (str, optional): ETag of a previous response, sent as
+        If-None-Match so the API can answer 304 Not Modified. A typed
+        client returns None for a 304.
         """
         if basis_profile_type:
             basis_profile_type = basis_profile_type
@@ -90,9 +352,11 @@ class KVK:
                                        APIpaths.basisprofielen,
                                        kvk_number,
                                        basis_profile_type,
-                                       geoData=geo_data)
+                                       geoData=geo_data,
+                                       headers={'If-None-Match': etag} if etag else None)
 
-        return response
+        return self.__result(
+            response, BASIS_PROFIEL_MODELS.get(basis_profile_type, BasisProfiel))
 
     def get_vestigingsprofiel(self, vestigingsnummer: str) -> requests.Response:
         """
@@ -107,7 +371,7 @@ class KVK:
                                        APIpaths.vestigingsprofielen,
                                        vestigingsnummer)
 
-        return response
+        return self.__result(response, Vestigingsprofiel)
 
     def get_naamgevingen(self, kvk_number: str) -> requests.Response:
         """
@@ -122,7 +386,7 @@ class KVK:
                                        APIpaths.naamgevingen,
                                        kvk_number)
 
-        return response
+        return self.__result(response, Naamgeving)
 
     def get_companies(self,
                       kvk_number: Optional[str] = None,
@@ -174,27 +438,138 @@ class KVK:
             >>> results = response.json()['data']['items']
         """
 
-        if (huisnummer or postcode) and (not huisnummer or not postcode):
-            raise ValueError(
-                'Huisnummer and postcode must be set together')
+        response = self.__search(kvk_number=kvk_number,
+                                 rsin=rsin,
+                                 vestigingsnummer=vestigingsnummer,
+                                 handelsnaam=handelsnaam,
+                                 straatnaam=straatnaam,
+                                 plaats=plaats,
+                                 postcode=postcode,
+                                 huisnummer=huisnummer,
+                                 huisnummerToevoeging=huisnummerToevoeging,
+                                 type=type,
+                                 InclusiefInactieveRegistraties=InclusiefInactieveRegistraties,
+                                 pagina=pagina,
+                                 aantal=aantal)
+        return self.__result(response, Zoekresultaten)
+
+    def iter_companies(self, aantal: int = MAX_AANTAL, **filters) -> Iterator[dict]:
+        """
+        Yields every search result of the KVK companies search API, fetching
+        the next page only when the current one is exhausted.
 
-        if huisnummerToevoeging and not huisnummer:
-            raise ValueError(
-                'HuisnummerToevoeging must be set together with huisnummer')
+        Accepts the same search arguments as get_companies except pagina.
+        Results are dicts, or ZoekResultaat models if the client is typed.
+        Iteration stops at the last page or at the API limit of MAX_PAGINA
+        pages.
 
-        response = self.__send_request("GET",
-                                       APIpaths.zoeken,
-                                       kvkNummer=kvk_number,
-                                       rsin=rsin,
-                                       vestigingsnummer=vestigingsnummer,
-                                       handelsnaam=handelsnaam,
-                                       straatnaam=straatnaam,
-                                       plaats=plaats,
-                                       postcode=postcode,
-                                       huisnummer=huisnummer,
-                                       huisnummerToevoeging=huisnummerToevoeging,
-                                       type=type,
-                                       InclusiefInactieveRegistraties=InclusiefInactieveRegistraties,
-                                       pagina=pagina,
-                                       antal=aantal)
-        return response
+        Args:
+        -----------
+        aantal (int): Number of results per page, at most MAX_AANTAL.
+
+        Raises:
+        -----------
+        requests.HTTPError: If a page request fails.
+
+        Example usage:
+        -----------
+            >>> for company in kvk.iter_companies(plaats='Amsterdam'):
+            ...     print(company['kvkNummer'])
+        """
+        for pagina in range(1, MAX_PAGINA + 1):
+            response = self.__search(pagina=pagina, aantal=aantal, **filters)
+            if response.status_code == 404:
+                return
+            response.raise_for_status()
+
+            page = response.json()
+            items = page.get('resultaten', [])
+            if self.typed:
+                yield from (ZoekResultaat(item) for item in items)
+            else:
+                yield from items
+
+            if len(items) < aantal or pagina * aantal >= page.get('totaal', float('inf')):
+                return
+
+    def stream_companies(self, chunk_size: int = 16384,
+                         **filters) -> Iterator[Any]:
+        """
+        Yields the results of one page of the KVK companies search API while
+        the response is still downloading.
+
+        Accepts the same search arguments as get_companies. Items are decoded
+        one by one from the body, so only the item being received is held in
+        memory. Results are dicts, or ZoekResultaat models if the client is
+        typed. The request is sent when iteration starts, and a page without
+        results (404) yields nothing, like iter_companies.
+
+        Raises:
+        -----------
+        requests.HTTPError: If the request fails.
+        """
+        return self.__stream(partial(self.__search, stream=True, **filters),
+                             'resultaten', ZoekResultaat, chunk_size,
+                             empty_on_404=True)
+
+    def stream_vestigingen(self, kvk_number: str,
+                           chunk_size: int = 16384) -> Iterator[Any]:
+        """
+        Yields the vestigingen of a company while the response is still
+        downloading. Results are dicts, or Vestiging models if the client
+        is typed. The request is sent when iteration starts.
+
+        Args:
+        -----------
+        kvk_number (str): The KVK number of the company.
+
+        Raises:
+        -----------
+        requests.HTTPError: If the request fails.
+        """
+        return self.__stream(partial(self.__send_request, "GET",
+                                     APIpaths.basisprofielen,
+                                     kvk_number,
+                                     BasisProfielPaths.vestigingen,
+                                     stream=True),
+                             'vestigingen', Vestiging, chunk_size)
+
+    def map(self, method: Union[str, Callable[..., Any]],
+            args_iterable: Iterable[Any],
+            workers: int = 10,
+            ordered: bool = True) -> Iterator[BatchResult]:
+        """
+        Calls a client method for many inputs on a pool of ``workers``
+        threads that share this client's session.
+
+        Every input is either a single argument or a tuple of positional
+        arguments for ``method``. Results are yielded as BatchResults holding
+        the input as ``item`` and either the return value or the raised error.
+        Inputs are consumed lazily with at most ``workers`` calls pending.
+        Use a ``pool_maxsize`` of at least ``workers`` so every thread keeps
+        its connection alive.
+
+        Args:
+        -----------
+        method (str or callable): A method name such as 'get_basis_profiel',
+        or any callable.
+        args_iterable (iterable): The inputs to call ``method`` with.
+        workers (int): Number of threads.
+        ordered (bool): If True, yield results in input order, otherwise as
+        they complete.
+
+        Example usage:
+        -----------
+            >>> with KVK(test=True, pool_maxsize=16) as kvk:
+            ...     for result in kvk.map('get_basis_profiel', numbers, workers=16):
+            ...         if result.ok:
+            ...             print(result.result.json()['naam'])
+        """
+        func = getattr(self, method) if isinstance(method, str) else method
+
+        def call(args):
+            if isinstance(args, tuple):
+                return func(*args)
+            return func(args)
+
+        return thread_map(call, args_iterable, workers, ordered)
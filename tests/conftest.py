@@ -0,0 +1,34 @@
+"""
+Fixtures shared by the offline tests of the clients.
+"""
+import pytest
+
+from kvk_api_client.stub_server import StubServer
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'stub_server(**options): StubServer arguments of the server fixture')
+
+
+@pytest.fixture
+def api_env(monkeypatch):
+    """Returns a function that points the clients at a host, with a test key."""
+    def point_to(host):
+        monkeypatch.setenv('KVK_HOST', host)
+        monkeypatch.setenv('KVK_API_VERSION', 'api/v1')
+        monkeypatch.setenv('KVK_APIKEY_TEST', 'test')
+    return point_to
+
+
+@pytest.fixture
+def server(request, api_env):
+    """
+    A StubServer running on a thread, with the clients pointed at it. Its
+    arguments come from the closest stub_server mark, e.g.
+    ``pytestmark = pytest.mark.stub_server(zoeken_totaal=700)``.
+    """
+    marker = request.node.get_closest_marker('stub_server')
+    with StubServer(**(marker.kwargs if marker else {})).run_in_thread() as server:
+        api_env(server.url)
+        yield server
@@ -0,0 +1,74 @@
+import inspect
+import threading
+
+import pytest
+
+from kvk_api_client.background import BackgroundKVK
+from kvk_api_client.sync_client import KVK
+
+KVK_NUMBER = '68750110'
+
+
+pytestmark = pytest.mark.stub_server(latency=0.02, zoeken_totaal=30)
+
+
+@pytest.fixture
+def kvk(server):
+    with BackgroundKVK(test=True, limit=10) as kvk:
+        yield kvk
+
+
+def test_blocking_methods_return_requests_responses(kvk):
+    response = kvk.get_basis_profiel(KVK_NUMBER)
+
+    assert response.status_code == 200
+    assert response.json()['kvkNummer'] == KVK_NUMBER
+    assert response.headers['content-type'].startswith('application/json')
+    assert len(list(kvk.iter_companies(aantal=7))) == 30
+    assert kvk.get_companies(plaats='Utrecht', pagina=2, aantal=20).json()[
+        'resultaten'][0]['kvkNummer'] == '90000020'
+    assert len(list(kvk.stream_vestigingen(KVK_NUMBER))) == 3
+
+
+def test_responses_iterate_from_memory(kvk):
+    lines = list(kvk.get_basis_profiel(KVK_NUMBER).iter_lines())
+    chunks = list(kvk.get_naamgevingen(KVK_NUMBER).iter_content(7))
+
+    assert KVK_NUMBER.encode() in b''.join(lines)
+    assert len(chunks) > 1 and KVK_NUMBER.encode() in b''.join(chunks)
+
+
+def test_threads_share_one_loop(kvk):
+    results = []
+
+    def worker():
+        futures = [kvk.submit('get_naamgevingen', KVK_NUMBER) for _ in range(5)]
+        results.extend(f.result().status_code for f in futures)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [200] * 20
+    assert kvk.kvk.pool_stats()['in_use'] == 0
+
+
+def test_map(kvk):
+    results = list(kvk.map('get_basis_profiel', ['1', '2', 'x'], workers=3))
+
+    assert [r.item for r in results] == ['1', '2', 'x']
+    assert [r.result.status_code for r in results] == [200, 200, 400]
+
+
+@pytest.mark.parametrize('name', ['get_basis_profiel', 'get_vestigingsprofiel',
+                                  'get_naamgevingen', 'get_companies',
+                                  'iter_companies', 'stream_companies',
+                                  'stream_vestigingen', 'map'])
+def test_signatures_match_sync_client(name):
+    def parameters(cls):
+        return [(p.name, p.kind, p.default)
+                for p in inspect.signature(getattr(cls, name)).parameters.values()]
+
+    assert parameters(BackgroundKVK) == parameters(KVK)
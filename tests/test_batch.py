@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from kvk_api_client.batch import abounded_map, thread_map
+
+
+@pytest.mark.asyncio
+async def test_abounded_map_limits_concurrency():
+    in_flight = 0
+    peak = 0
+
+    async def work(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return item * 2
+
+    results = [r async for r in abounded_map(work, range(50), concurrency=5)]
+
+    assert peak == 5
+    assert sorted(r.result for r in results) == [i * 2 for i in range(50)]
+
+
+@pytest.mark.asyncio
+async def test_abounded_map_reports_errors_per_item():
+    async def work(item):
+        if item == 3:
+            raise ValueError(item)
+        return item
+
+    results = {r.item: r async for r in abounded_map(work, range(6), concurrency=2)}
+
+    assert not results[3].ok
+    assert isinstance(results[3].error, ValueError)
+    assert all(results[i].ok for i in (0, 1, 2, 4, 5))
+
+
+def test_thread_map_keeps_input_order():
+    results = list(thread_map(lambda x: x * 2, range(20), workers=4))
+
+    assert [r.item for r in results] == list(range(20))
+    assert [r.result for r in results] == [i * 2 for i in range(20)]
+
+
+def test_thread_map_pulls_input_lazily():
+    consumed = []
+
+    def items():
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    results = thread_map(lambda x: x * 2, items(), workers=3,
+                         ordered=False)
+    first = next(results)
+    results.close()
+
+    assert len(consumed) <= 6
+    assert first.item in consumed
+
+
+def test_thread_map_reports_errors_per_item():
+    results = list(thread_map(lambda x: 1 / (x - 1), range(3)))
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert isinstance(results[1].error, ZeroDivisionError)
+
+
+@pytest.mark.asyncio
+async def test_abounded_map_close_awaits_cancelled_calls():
+    started = []
+
+    async def work(item):
+        started.append(asyncio.current_task())
+        if item:
+            await asyncio.sleep(10)
+
+    results = abounded_map(work, range(10), concurrency=4)
+    async for _ in results:
+        break
+    await results.aclose()
+
+    assert len(started) == 4
+    assert all(task.done() for task in started)
+
+
+@pytest.mark.asyncio
+async def test_abounded_map_ordered():
+    async def work(item):
+        await asyncio.sleep(0.001 * (10 - item))
+        return item
+
+    results = [r.item async for r in abounded_map(work, range(10), 3, ordered=True)]
+
+    assert results == list(range(10))
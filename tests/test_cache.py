@@ -0,0 +1,58 @@
+from kvk_api_client.cache import ResponseCache
+from kvk_api_client.paths import APIpaths
+
+PATH = f'{APIpaths.basisprofielen}/68750110'
+
+
+def test_key_is_canonical():
+    assert (ResponseCache.key('GET', PATH, {'b': 1, 'a': 'x', 'c': None})
+            == ResponseCache.key('GET', PATH, {'a': 'x', 'b': '1'}))
+
+
+def test_lru_eviction_and_counters():
+    cache = ResponseCache(maxsize=2)
+    for i in range(3):
+        cache.set(str(i), PATH, 200, {}, b'{}')
+
+    assert cache.get('0') is None
+    assert cache.get('2').body == b'{}'
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 1
+    assert cache.stats['evictions'] == 1
+
+
+def test_endpoint_ttl():
+    cache = ResponseCache(ttls={APIpaths.zoeken: 0})
+    cache.set('key', APIpaths.zoeken, 200, {}, b'{}')
+
+    assert cache.get('key') is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path=path)
+    cache.set('key', PATH, 200, {'Content-Type': 'application/json'}, b'{}')
+    cache.close()
+
+    cache = ResponseCache(path=path)
+    entry = cache.get('key')
+
+    assert entry.headers == {'Content-Type': 'application/json'}
+    assert cache.stats['disk_hits'] == 1
+
+
+def test_disk_writes_are_committed_in_batches(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path=path, commit_every=3, commit_interval=60)
+    reader = ResponseCache(path=path)
+    cache.set('a', PATH, 200, {}, b'{}')
+    cache.set('b', PATH, 200, {}, b'{}')
+    assert reader.get('a') is None
+
+    cache.set('c', PATH, 200, {}, b'{}')
+    assert reader.get('a') is not None
+    cache.set('d', PATH, 200, {}, b'{}')
+    cache.flush()
+    assert reader.get('d') is not None
+    cache.close()
+    reader.close()
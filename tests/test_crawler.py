@@ -0,0 +1,70 @@
+import pytest
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.crawler import BudgetExceeded, CompanyCrawler
+
+KVK_NUMBER = '68750110'
+
+pytestmark = pytest.mark.stub_server(vestigingen=3, zoeken_totaal=25)
+
+
+@pytest.mark.asyncio
+async def test_vestigingen_are_fetched_once(server):
+    async with KVK(test=True) as kvk:
+        crawler = CompanyCrawler(kvk)
+        first = await crawler.crawl_company(KVK_NUMBER)
+        second = await crawler.crawl_company(KVK_NUMBER)
+
+    assert len(first['vestigingen']) == 3 and first['duplicates'] == []
+    assert second['vestigingen'] == []
+    assert second['duplicates'] == [v['vestigingsnummer'] for v in first['vestigingen']]
+    assert crawler.deduplicated == 3
+    assert crawler.requests == 2 + 3 + 2
+
+
+@pytest.mark.asyncio
+async def test_failed_vestiging_is_retried(server, monkeypatch):
+    async with KVK(test=True) as kvk:
+        get_vestigingsprofiel = kvk.get_vestigingsprofiel
+        failing = {f'{KVK_NUMBER}0001'}
+
+        async def flaky(nummer):
+            if nummer in failing:
+                failing.discard(nummer)
+                raise ConnectionError(nummer)
+            return await get_vestigingsprofiel(nummer)
+
+        monkeypatch.setattr(kvk, 'get_vestigingsprofiel', flaky)
+        crawler = CompanyCrawler(kvk)
+        first = await crawler.crawl_company(KVK_NUMBER)
+        second = await crawler.crawl_company(KVK_NUMBER)
+
+    assert list(first['errors']) == [f'{KVK_NUMBER}0001']
+    assert len(first['vestigingen']) == 2
+    assert [v['vestigingsnummer'] for v in second['vestigingen']] == [f'{KVK_NUMBER}0001']
+    assert second['errors'] == {} and len(second['duplicates']) == 2
+
+
+@pytest.mark.asyncio
+async def test_crawl_search_pages(server):
+    async with KVK(test=True) as kvk:
+        numbers = [c['kvkNummer'] async for c in kvk.aiter_companies(aantal=10)]
+        crawler = CompanyCrawler(kvk, concurrency=8)
+        trees = [r.result async for r in crawler.crawl(numbers, companies=4)]
+
+    assert len(numbers) == 25
+    assert sorted(t['kvkNummer'] for t in trees) == sorted(numbers)
+    assert all(len(t['vestigingen']) == 3 for t in trees)
+
+
+@pytest.mark.asyncio
+async def test_budget(server):
+    async with KVK(test=True) as kvk:
+        crawler = CompanyCrawler(kvk, max_requests=3)
+        tree = await crawler.crawl_company(KVK_NUMBER)
+
+    assert crawler.requests == 3
+    assert len(tree['vestigingen']) == 1
+    assert all('BudgetExceeded' in error for error in tree['errors'].values())
+    with pytest.raises(BudgetExceeded):
+        await crawler.crawl_company(KVK_NUMBER)
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.enrich import QuotaExhausted, enrich, read_rows
+
+NUMBERS = [f'{68750110 + i}' for i in range(10)]
+
+
+def rows(server, quota=None):
+    """Yields the rows, answering 429 from the ``quota``-th row on."""
+    for i, number in enumerate(NUMBERS):
+        if i == quota:
+            server.rate_429 = 1.0
+        yield number, {'kvkNummer': number}
+
+
+async def run(server, output, checkpoint, quota=None, checkpoint_every=3):
+    async with KVK(test=True) as kvk:
+        return await enrich(kvk, rows(server, quota), str(output),
+                            endpoints=['basisprofiel', 'naamgeving'],
+                            concurrency=1, checkpoint_path=str(checkpoint),
+                            checkpoint_every=checkpoint_every, progress=None)
+
+
+def read_output(output):
+    with open(output, 'rb') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_read_rows(tmp_path):
+    path = tmp_path / 'numbers.csv'
+    path.write_text('naam,kvkNummer\nA, 1 \nB,2\n')
+
+    assert [number for number, _ in read_rows(str(path))] == ['1', '2']
+
+
+@pytest.mark.asyncio
+async def test_enrich_writes_rows_in_order(server, tmp_path):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'out.checkpoint'
+
+    assert await run(server, output, checkpoint) == 10
+
+    records = read_output(output)
+    assert [r['kvkNummer'] for r in records] == NUMBERS
+    assert records[0]['basisprofiel']['kvkNummer'] == NUMBERS[0]
+    assert 'naamgeving' in records[0] and 'errors' not in records[0]
+    assert json.loads(checkpoint.read_text()) == {
+        'rows': 10, 'output_bytes': output.stat().st_size}
+
+
+@pytest.mark.asyncio
+async def test_enrich_resumes_after_quota_exhausted(server, tmp_path):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'out.checkpoint'
+
+    with pytest.raises(QuotaExhausted):
+        await run(server, output, checkpoint, quota=5)
+    assert json.loads(checkpoint.read_text())['rows'] == 5
+
+    # A crash after the checkpoint leaves a partial row behind.
+    with open(output, 'ab') as f:
+        f.write(b'{"kvkNummer": "partial')
+    with pytest.raises(QuotaExhausted):
+        await run(server, output, checkpoint, quota=0)
+    assert json.loads(checkpoint.read_text()) == {
+        'rows': 5, 'output_bytes': output.stat().st_size}
+
+    server.rate_429 = 0.0
+    assert await run(server, output, checkpoint) == 10
+    assert [r['kvkNummer'] for r in read_output(output)] == NUMBERS
+
+
+@pytest.mark.asyncio
+async def test_enrich_appends_to_existing_output(server, tmp_path):
+    output, checkpoint = tmp_path / 'out.jsonl', tmp_path / 'out.checkpoint'
+    output.write_bytes(b'{"kvkNummer": "earlier"}\n')
+
+    await run(server, output, checkpoint)
+
+    records = read_output(output)
+    assert [r['kvkNummer'] for r in records] == ['earlier'] + NUMBERS
+    assert json.loads(checkpoint.read_text())['output_bytes'] == output.stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_enrich_needs_responses(server, tmp_path):
+    async with KVK(test=True, result='json') as kvk:
+        with pytest.raises(ValueError):
+            await enrich(kvk, rows(server), str(tmp_path / 'out.jsonl'))
@@ -0,0 +1,41 @@
+import pytest
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.hedging import HedgePolicy
+
+
+def test_delay_needs_samples_and_follows_quantile():
+    policy = HedgePolicy(quantile=0.9, min_delay=0.0, min_samples=10)
+    assert policy.delay('zoeken') is None
+
+    for i in range(1, 11):
+        policy.observe('zoeken', i / 10)
+
+    assert policy.delay('zoeken') == pytest.approx(0.9)
+    assert policy.delay('basisprofielen') is None
+
+
+def test_hedge_rate_is_capped():
+    policy = HedgePolicy(max_rate=0.1)
+    for _ in range(20):
+        policy.delay('zoeken')
+
+    assert [policy.try_hedge() for _ in range(3)] == [True, True, False]
+    assert policy.stats == {'requests': 20, 'fired': 2, 'won': 0}
+
+
+@pytest.mark.asyncio
+@pytest.mark.stub_server(latency=0.005, straggler_latency=0.3, seed=2)
+async def test_hedges_win_against_stragglers(server):
+    policy = HedgePolicy(quantile=0.75, max_rate=0.5, min_samples=10)
+    async with KVK(test=True, hedge=policy) as kvk:
+        for _ in range(10):
+            assert (await kvk.get_naamgevingen('68750110')).status == 200
+        assert policy.fired == 0
+
+        server.straggler_rate = 0.2
+        for _ in range(20):
+            response = await kvk.get_naamgevingen('68750110')
+            assert (await response.json())['kvkNummer'] == '68750110'
+
+    assert 0 < policy.won <= policy.fired <= 15
@@ -0,0 +1,42 @@
+"""
+Guards against heavy or side-effecting work at package import time.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code, *flags):
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def test_import_loads_no_http_stack():
+    result = run('import sys, warnings, kvk_api_client;'
+                 'print(sorted(m for m in ("requests", "aiohttp", "dotenv") if m in sys.modules));'
+                 'print(len(warnings.filters))')
+    baseline = run('import warnings; print(len(warnings.filters))')
+
+    modules, filters = result.stdout.split('\n')[:2]
+    assert modules == '[]'
+    assert filters == baseline.stdout.strip()
+
+
+def test_sync_client_does_not_import_aiohttp():
+    result = run('import sys; from kvk_api_client import KVK;'
+                 'print("aiohttp" in sys.modules)')
+
+    assert result.stdout.strip() == 'False'
+
+
+def test_import_time_budget():
+    result = run('import kvk_api_client', '-X', 'importtime')
+    cumulative = {line.split('|')[2].strip(): int(line.split('|')[1])
+                  for line in result.stderr.splitlines()
+                  if line.startswith('import time:') and '|' in line
+                  and line.split('|')[1].strip().isdigit()}
+
+    # Microseconds; generous enough for slow CI machines.
+    assert cumulative['kvk_api_client'] < 50000
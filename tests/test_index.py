@@ -0,0 +1,109 @@
+import json
+
+from kvk_api_client.index import CompanyIndex
+from kvk_api_client.paths import APIpaths
+
+
+def page(*names, totaal=None, first=0):
+    resultaten = [{'kvkNummer': f'{90000000 + i}',
+                   'vestigingsnummer': f'{i:012d}',
+                   'naam': naam,
+                   'adres': {'binnenlandsAdres': {'postcode': '1234AB',
+                                                  'huisnummer': i + 1,
+                                                  'plaats': 'Utrecht'}},
+                   'type': 'rechtspersoon' if i % 2 else 'hoofdvestiging',
+                   'links': [{'rel': 'basisprofiel'}]}
+                  for i, naam in enumerate(names, first)]
+    return json.dumps({'pagina': 1, 'resultatenPerPagina': 10,
+                       'totaal': totaal or len(names),
+                       'resultaten': resultaten}).encode()
+
+
+def names(body):
+    return [r['naam'] for r in json.loads(body)['resultaten']]
+
+
+def test_answers_recorded_query():
+    index = CompanyIndex()
+    index.record(APIpaths.zoeken, {'plaats': 'Utrecht', 'kvkNummer': None},
+                 page('Bakkerij de Zon', 'Fietsenmaker Jansen'))
+
+    body = json.loads(index.answer({'plaats': 'Utrecht', 'pagina': 1}))
+
+    assert [r['naam'] for r in body['resultaten']] == ['Bakkerij de Zon',
+                                                       'Fietsenmaker Jansen']
+    assert body['totaal'] == 2
+    assert index.answer({'plaats': 'Utrecht', 'pagina': 2}) is None
+    assert (index.answered, index.fallbacks) == (1, 1)
+
+
+def test_stale_query_falls_back():
+    index = CompanyIndex(max_age=0)
+    index.record(APIpaths.zoeken, {'plaats': 'Utrecht'}, page('Bakkerij de Zon'))
+
+    assert index.answer({'plaats': 'Utrecht'}) is None
+
+
+def test_search_and_lookup():
+    index = CompanyIndex()
+    index.record(APIpaths.zoeken, {}, page('Bakkerij de Zon', 'Zonnepanelen B.V.'))
+
+    assert [r['naam'] for r in index.search('bakk zon')] == ['Bakkerij de Zon']
+    assert len(index.search('zon')) == 2
+    assert index.lookup(postcode='1234AB', huisnummer=2)[0]['naam'] == 'Zonnepanelen B.V.'
+    assert index.lookup(kvk_number='90000000')[0]['naam'] == 'Bakkerij de Zon'
+
+
+def test_updates_replace_names():
+    index = CompanyIndex()
+    index.record(APIpaths.zoeken, {}, page('Oude Naam'))
+    index.record(APIpaths.zoeken, {}, page('Nieuwe Naam'))
+
+    assert index.search('oude') == []
+    assert len(index.search('nieuwe')) == 1
+
+
+def test_answers_covered_queries():
+    index = CompanyIndex()
+    index.record(APIpaths.zoeken, {'plaats': 'Utrecht', 'aantal': 2},
+                 page('Bakkerij de Zon', 'Zonnepanelen B.V.', totaal=3))
+
+    assert index.answer({'plaats': 'Utrecht', 'aantal': 3}) is None
+    assert index.answer({'plaats': 'Utrecht', 'type': 'rechtspersoon'}) is None
+
+    index.record(APIpaths.zoeken, {'plaats': 'Utrecht', 'aantal': 2, 'pagina': 2},
+                 page('Fietsenmaker Jansen', totaal=3, first=2))
+
+    assert names(index.answer({'plaats': 'Utrecht', 'aantal': 3})) == [
+        'Bakkerij de Zon', 'Zonnepanelen B.V.', 'Fietsenmaker Jansen']
+    assert names(index.answer({'plaats': 'Utrecht', 'aantal': 1, 'pagina': 3})) == [
+        'Fietsenmaker Jansen']
+    assert names(index.answer({'plaats': 'Utrecht', 'type': 'rechtspersoon'})) == [
+        'Zonnepanelen B.V.']
+    assert names(index.answer({'plaats': 'Utrecht', 'postcode': '1234 ab',
+                               'huisnummer': 3})) == ['Fietsenmaker Jansen']
+    assert names(index.answer({'plaats': 'Utrecht', 'handelsnaam': 'zon'})) == [
+        'Bakkerij de Zon', 'Zonnepanelen B.V.']
+    body = json.loads(index.answer({'plaats': 'Utrecht', 'handelsnaam': 'bakk'}))
+    assert body['totaal'] == 1
+    assert body['resultaten'][0]['links'] == [{'rel': 'basisprofiel'}]
+
+    # Not covered: a different plaats, or a filter the index cannot apply.
+    assert index.answer({'plaats': 'Amsterdam'}) is None
+    assert index.answer({'plaats': 'Utrecht', 'straatnaam': 'Hoofdstraat'}) is None
+    assert index.answer({'plaats': 'Utrecht', 'rsin': '123456789'}) is None
+
+
+def test_basisprofiel_does_not_alter_zoeken_results():
+    index = CompanyIndex()
+    index.record(APIpaths.zoeken, {}, page('Zoekresultaat', 'Rechtspersoon'))
+    before = index.answer({})
+    index.record(f'{APIpaths.basisprofielen}/90000001',
+                 {}, json.dumps({'kvkNummer': '90000001', 'naam': 'Statutair',
+                                 '_embedded': {'hoofdvestiging': {
+                                     'vestigingsnummer': '000000000001'}}}).encode())
+
+    assert index.answer({}) == before
+    assert index.lookup(kvk_number='90000001')[0]['type'] == 'rechtspersoon'
+    assert index.profiel('90000001')['naam'] == 'Statutair'
+    assert index.profiel('90000000') is None
@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import sqlite3
+import threading
+from collections import Counter
+
+import pytest
+
+from kvk_api_client.async_client import KVK as AsyncKVK
+from kvk_api_client.keys import KeyPool, KeysExhausted
+from kvk_api_client.sync_client import KVK
+
+
+def test_spreads_requests_by_quota_share():
+    pool = KeyPool({'key-aaaa': 4, 'key-bbbb': 2})
+    keys = Counter(pool.acquire() for _ in range(6))
+
+    assert keys == {'key-aaaa': 4, 'key-bbbb': 2}
+    with pytest.raises(KeysExhausted) as excinfo:
+        pool.acquire()
+    assert 0 < excinfo.value.retry_in <= pool.period
+    assert pool.usage()['key-...aaaa'] == {'used': 4, 'remaining': 0}
+
+
+def _claim(path, count):
+    pool = KeyPool({'key-aaaa': 50, 'key-bbbb': 50}, path=path)
+    claimed = 0
+    for _ in range(count):
+        try:
+            pool.acquire()
+            claimed += 1
+        except KeysExhausted:
+            pass
+    return claimed
+
+
+def test_quota_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'keys.sqlite3')
+    with multiprocessing.get_context('spawn').Pool(4) as workers:
+        claimed = workers.starmap(_claim, [(path, 40)] * 4)
+
+    assert sum(claimed) == 100
+    assert all(u['remaining'] == 0 for u in KeyPool(
+        {'key-aaaa': 50, 'key-bbbb': 50}, path=path).usage().values())
+
+
+def test_client_uses_pool_keys(server, monkeypatch):
+    monkeypatch.delenv('KVK_APIKEY_TEST')
+    pool = KeyPool({'key-aaaa': 2, 'key-bbbb': 2})
+    with KVK(test=True, key_pool=pool) as kvk:
+        statuses = [kvk.get_naamgevingen('68750110').status_code for _ in range(4)]
+        with pytest.raises(KeysExhausted):
+            kvk.get_naamgevingen('68750110')
+
+    assert statuses == [200] * 4
+    assert server.requests == 4
+
+
+@pytest.mark.asyncio
+async def test_async_client_waits_for_keys_off_the_loop(server, monkeypatch, tmp_path):
+    monkeypatch.delenv('KVK_APIKEY_TEST')
+    path = str(tmp_path / 'keys.db')
+    pool = KeyPool({'key-aaaa': 10}, path=path)
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    unlock = threading.Timer(0.3, other.execute, ('COMMIT',))
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    async with AsyncKVK(test=True, key_pool=pool) as kvk:
+        ticker = asyncio.ensure_future(tick())
+        unlock.start()
+        response = await kvk.get_naamgevingen('68750110')
+        ticker.cancel()
+
+    other.close()
+    assert response.status == 200
+    assert ticks > 10
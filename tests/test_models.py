@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from kvk_api_client import models
+from kvk_api_client.models import BasisProfiel, SbiActiviteit, ZoekResultaat
+
+PROFIEL = {
+    'kvkNummer': '68750110',
+    'naam': 'Test BV Donald',
+    'sbiActiviteiten': [{'sbiCode': '6420', 'sbiOmschrijving': 'Financiële holdings',
+                         'indHoofdactiviteit': 'Ja'}],
+    '_embedded': {'hoofdvestiging': {'vestigingsnummer': '000037178598',
+                                     'adressen': [{'type': 'bezoekadres',
+                                                   'plaats': 'Lollum'}]}},
+}
+
+
+def test_fields_are_snake_case_slots():
+    profiel = BasisProfiel.from_json(json.dumps(PROFIEL).encode())
+
+    assert profiel.kvk_nummer == '68750110'
+    assert profiel.naam == 'Test BV Donald'
+    assert profiel.statutaire_naam is None
+    assert not hasattr(profiel, '__dict__')
+
+
+def test_sections_are_wrapped_lazily():
+    profiel = BasisProfiel(PROFIEL)
+
+    assert profiel._sbi_activiteiten is PROFIEL['sbiActiviteiten']
+    assert profiel.sbi_activiteiten[0].sbi_code == '6420'
+    assert profiel.sbi_activiteiten is profiel._sbi_activiteiten
+    assert isinstance(profiel._sbi_activiteiten[0], SbiActiviteit)
+    assert profiel.embedded.hoofdvestiging.adressen[0].plaats == 'Lollum'
+    assert profiel.links is None
+
+
+def test_body_is_decoded_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(models, 'loads', lambda body: calls.append(body) or json.loads(body))
+    monkeypatch.setattr(models, 'dumps', lambda value: pytest.fail('re-encoded'))
+
+    profiel = BasisProfiel.from_json(json.dumps(PROFIEL).encode())
+
+    assert profiel.embedded.hoofdvestiging.vestigingsnummer == '000037178598'
+    assert len(calls) == 1
+
+
+def test_zoek_resultaat():
+    resultaat = ZoekResultaat({'kvkNummer': '1', 'type': 'rechtspersoon'})
+
+    assert (resultaat.kvk_nummer, resultaat.type) == ('1', 'rechtspersoon')
@@ -0,0 +1,59 @@
+import pytest
+
+from kvk_api_client.async_client import KVK
+from kvk_api_client.planner import QueryPlanner, SearchTruncated
+
+pytestmark = pytest.mark.stub_server(zoeken_totaal=700)
+
+
+@pytest.mark.asyncio
+async def test_small_search_is_not_split(server):
+    async with KVK(test=True) as kvk:
+        plan = await QueryPlanner(kvk, capacity=1000).plan(plaats='Utrecht')
+
+    assert plan.queries == [({'plaats': 'Utrecht'}, 700)]
+    assert plan.complete
+
+
+@pytest.mark.asyncio
+async def test_split_by_type_is_complete(server):
+    async with KVK(test=True) as kvk:
+        planner = QueryPlanner(kvk, concurrency=4, capacity=300)
+        plan = await planner.plan(plaats='Utrecht')
+        companies = [c async for c in planner.search(plaats='Utrecht')]
+
+    assert [q['type'] for q, _ in plan.queries] == ['hoofdvestiging', 'nevenvestiging',
+                                                    'rechtspersoon']
+    assert sum(n for _, n in plan.queries) == 700
+    assert plan.complete
+    assert sorted(c['kvkNummer'] for c in companies) == [f'{90000000 + i}'
+                                                         for i in range(700)]
+
+
+@pytest.mark.asyncio
+async def test_oversized_partitions_are_reported(server):
+    async with KVK(test=True) as kvk:
+        planner = QueryPlanner(kvk, capacity=200)
+        with pytest.warns(UserWarning, match='truncated'):
+            companies = [c async for c in planner.search(plaats='Utrecht')]
+
+    assert len(planner.last_plan.truncated) == 3
+    assert not planner.last_plan.complete
+    assert len(companies) == 600
+
+
+@pytest.mark.asyncio
+async def test_strict_search_refuses_truncated_plans(server):
+    async with KVK(test=True) as kvk:
+        planner = QueryPlanner(kvk, capacity=200)
+        before = server.requests
+        with pytest.raises(SearchTruncated) as info:
+            [c async for c in planner.search(strict=True, plaats='Utrecht')]
+        assert server.requests - before == 4
+
+        planner.capacity = 300
+        companies = [c async for c in planner.search(strict=True, plaats='Utrecht')]
+
+    assert len(info.value.plan.truncated) == 3
+    assert len(companies) == 700
+    assert planner.last_plan.complete
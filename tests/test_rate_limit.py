@@ -0,0 +1,33 @@
+from kvk_api_client.rate_limit import RateLimiter, parse_retry_after
+
+
+def test_burst_is_free_then_waits():
+    limiter = RateLimiter(rate=10, burst=3)
+
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0.09 < limiter.reserve() <= 0.1
+
+
+def test_429_lowers_rate_and_honours_retry_after():
+    limiter = RateLimiter(rate=10, burst=5)
+
+    limiter.feedback(429, {'Retry-After': '2'})
+
+    assert limiter.current_rate < 10
+    assert limiter.reserve() > 1.5
+
+
+def test_requests_after_retry_after_are_spaced():
+    limiter = RateLimiter(rate=10, burst=5, min_rate=10)
+
+    limiter.feedback(429, {'Retry-After': '1'})
+    waits = [limiter.reserve() for _ in range(5)]
+
+    assert 1.0 < waits[0] <= 1.1
+    assert all(0.09 < b - a <= 0.11 for a, b in zip(waits, waits[1:]))
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+from kvk_api_client.async_client import KVK as AsyncKVK
+from kvk_api_client.replay import Recorder, Replay, ReplayMiss
+from kvk_api_client.resilience import RetryPolicy
+from kvk_api_client.sync_client import KVK
+
+KVK_NUMBER = '68750110'
+
+
+# Nothing listens here, so replayed requests cannot reach a server.
+OFFLINE = 'http://127.0.0.1:9'
+
+pytestmark = pytest.mark.stub_server(latency=0.05)
+
+
+@pytest.fixture
+def env(api_env):
+    api_env(OFFLINE)
+
+
+@pytest.fixture
+def recording(server, api_env, tmp_path):
+    path = str(tmp_path / 'traffic.jsonl')
+    with Recorder(path) as recorder, KVK(test=True, recorder=recorder) as kvk:
+        kvk.get_basis_profiel(KVK_NUMBER)
+        kvk.get_naamgevingen(KVK_NUMBER)
+        kvk.get_companies(plaats='Utrecht', pagina=1, aantal=10)
+        kvk.get_basis_profiel('x')
+    assert recorder.recorded == 4
+    api_env(OFFLINE)
+    return path
+
+
+def test_recorder_round_trips_binary_bodies(tmp_path):
+    path = str(tmp_path / 'traffic.jsonl')
+    with Recorder(path) as recorder:
+        recorder.record('GET', 'a', {'b': 1, 'c': None}, 200,
+                        {'Content-Type': 'application/pdf', 'Server': 'x'},
+                        b'\xff\x00', 0.25)
+        recorder.record('GET', 'a', {'b': '1'}, 500, {}, b'', 0.5)
+
+    with Replay(path, latency=2) as replay:
+        first = replay.get('GET', 'a', {'b': '1'})
+        assert first.body == b'\xff\x00'
+        assert first.headers == {'Content-Type': 'application/pdf'}
+        assert replay.delay(first) == 0.5
+        assert replay.get('GET', 'a', {'b': 1}).status == 500
+        assert replay.get('GET', 'a', {'b': 1}).status == 500
+        replay.rewind()
+        assert replay.get('GET', 'a', {'b': 1}).status == 200
+
+        with pytest.raises(ReplayMiss):
+            replay.get('GET', 'a', {})
+        assert replay.stats == {'recordings': 2, 'served': 4, 'misses': 1}
+
+
+def test_empty_recording(tmp_path):
+    path = tmp_path / 'empty.jsonl'
+    path.write_bytes(b'')
+
+    with Replay(str(path)) as replay:
+        assert len(replay) == 0
+
+
+def test_sync_replay(recording):
+    with Replay(recording) as replay, KVK(test=True, replay=replay) as kvk:
+        assert kvk.get_basis_profiel(KVK_NUMBER).json()['kvkNummer'] == KVK_NUMBER
+        assert kvk.get_basis_profiel('x').status_code == 400
+        assert kvk.get_companies(plaats='Utrecht', pagina=1,
+                                 aantal=10).json()['totaal'] == 25
+        with pytest.raises(ReplayMiss):
+            kvk.get_vestigingsprofiel('000012345678')
+
+
+def test_replay_simulates_latency(recording):
+    with Replay(recording) as replay, KVK(test=True, replay=replay) as kvk:
+        started = time.perf_counter()
+        kvk.get_naamgevingen(KVK_NUMBER)
+        assert time.perf_counter() - started < 0.05
+
+    with Replay(recording, latency=1) as replay, \
+            KVK(test=True, replay=replay) as kvk:
+        started = time.perf_counter()
+        kvk.get_naamgevingen(KVK_NUMBER)
+        assert time.perf_counter() - started >= 0.05
+
+
+def test_replay_drives_retries(env, tmp_path):
+    path = str(tmp_path / 'traffic.jsonl')
+    with Recorder(path) as recorder:
+        recorder.record('GET', f'naamgevingen/kvknummer/{KVK_NUMBER}', {},
+                        503, {}, b'{}', 0.01)
+        recorder.record('GET', f'naamgevingen/kvknummer/{KVK_NUMBER}', {},
+                        200, {'Content-Type': 'application/json'}, b'{}', 0.01)
+
+    retry = RetryPolicy(retries=2, backoff=0, min_budget=10)
+    with Replay(path) as replay, KVK(test=True, replay=replay, retry=retry) as kvk:
+        assert kvk.get_naamgevingen(KVK_NUMBER).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_async_replay(recording):
+    with Replay(recording) as replay:
+        async with AsyncKVK(test=True, replay=replay) as kvk:
+            response = await kvk.get_basis_profiel(KVK_NUMBER)
+            assert (await response.json())['kvkNummer'] == KVK_NUMBER
+            assert [r['kvkNummer'] async for r in
+                    kvk.stream_companies(plaats='Utrecht', pagina=1, aantal=10)]
+
+        async with AsyncKVK(test=True, replay=replay, result='json') as kvk:
+            assert (await kvk.get_naamgevingen(KVK_NUMBER))['kvkNummer'] == KVK_NUMBER
+        assert replay.misses == 0
+
+
+def test_index_reads_the_leading_key(tmp_path):
+    path = tmp_path / 'traffic.jsonl'
+    with Recorder(str(path)) as recorder:
+        recorder.record('GET', 'a', {'b': 'say "hi"'}, 200, {}, b'new', 0.0)
+    assert path.read_bytes().startswith(b'{"key":"GET a?b=say+%22hi%22",')
+
+    with Replay(str(path)) as replay:
+        assert replay.get('GET', 'a', {'b': 'say "hi"'}).body == b'new'
+
+    with path.open('ab') as f:
+        f.write(b'{"method":"GET","path":"a","params":{}}\n')
+    with pytest.raises(ValueError):
+        Replay(str(path))
+
+
+def test_empty_replay_does_not_reach_the_network(env, tmp_path):
+    path = tmp_path / 'empty.jsonl'
+    path.write_bytes(b'')
+    with Replay(str(path)) as replay, KVK(test=True, replay=replay) as kvk:
+        with pytest.raises(ReplayMiss):
+            kvk.get_naamgevingen(KVK_NUMBER)
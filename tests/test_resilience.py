@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+from kvk_api_client.async_client import KVK as AsyncKVK
+from kvk_api_client.paths import APIpaths
+from kvk_api_client.replay import Recorder, Replay, ReplayMiss
+from kvk_api_client.resilience import CircuitBreaker, CircuitOpen, RetryPolicy
+from kvk_api_client.sync_client import KVK
+
+PATH = f'{APIpaths.basisprofielen}/68750110'
+
+pytestmark = pytest.mark.stub_server(error_rate=0.5, seed=1)
+
+
+def test_retry_delay_uses_full_jitter_and_filters():
+    policy = RetryPolicy(retries=3, backoff=1.0, max_backoff=3.0)
+
+    assert 0 <= policy.retry_delay('GET', 0) <= 1.0
+    assert 0 <= policy.retry_delay('GET', 2, 503) <= 3.0
+    assert policy.retry_delay('GET', 3) is None
+    assert policy.retry_delay('GET', 0, 404) is None
+    assert policy.retry_delay('POST', 0) is None
+
+
+def test_retry_budget():
+    policy = RetryPolicy(budget=0.5, min_budget=2)
+    assert policy.retry_delay('GET', 0) is not None
+    assert policy.retry_delay('GET', 0) is not None
+    assert policy.retry_delay('GET', 0) is None
+
+    policy.deposit()
+    policy.deposit()
+    assert policy.retry_delay('GET', 0) is not None
+    assert policy.stats['retried'] == 3
+    assert policy.stats['exhausted'] == 1
+
+
+def test_circuit_opens_and_probes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.before(PATH)
+        breaker.record(PATH, False)
+
+    with pytest.raises(CircuitOpen):
+        breaker.before(PATH)
+    breaker.before(APIpaths.zoeken)
+
+    time.sleep(0.06)
+    assert breaker.state(PATH) == CircuitBreaker.HALF_OPEN
+    breaker.before(PATH)
+    with pytest.raises(CircuitOpen):
+        breaker.before(PATH)
+    breaker.record(PATH, True)
+    assert breaker.state(PATH) == CircuitBreaker.CLOSED
+
+
+def test_sync_retries_5xx(server):
+    events = []
+    policy = RetryPolicy(retries=5, backoff=0.001)
+    with KVK(test=True, retry=policy, on_request=events.append) as kvk:
+        for _ in range(5):
+            assert kvk.get_naamgevingen('68750110').status_code == 200
+
+    assert policy.retried == len(events) - 5 > 0
+    assert max(e.retries for e in events) > 0
+
+
+@pytest.mark.asyncio
+async def test_async_breaker_fails_fast(server):
+    server.error_rate = 1.0
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    async with AsyncKVK(test=True, breaker=breaker,
+                        retry=RetryPolicy(retries=5, backoff=0.001)) as kvk:
+        with pytest.raises(CircuitOpen):
+            await kvk.get_naamgevingen('68750110')
+        before = server.requests
+        with pytest.raises(CircuitOpen):
+            await kvk.get_naamgevingen('68750110')
+
+    assert server.requests == before
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.before(PATH)
+    breaker.record(PATH, False)
+    time.sleep(0.06)
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_async_cancelled_probe_is_released(server):
+    server.error_rate = 0.0
+    server.latency = 0.5
+    breaker = half_open_breaker()
+    async with AsyncKVK(test=True, breaker=breaker) as kvk:
+        probe = asyncio.ensure_future(kvk.get_basis_profiel('68750110'))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert breaker.state(PATH) == CircuitBreaker.HALF_OPEN
+        server.latency = 0.0
+        assert (await kvk.get_basis_profiel('68750110')).status == 200
+    assert breaker.state(PATH) == CircuitBreaker.CLOSED
+
+
+def test_sync_probe_failing_without_response_is_recorded(server, tmp_path):
+    server.error_rate = 0.0
+    path = str(tmp_path / 'traffic.jsonl')
+    with Recorder(path) as recorder:
+        recorder.record('GET', APIpaths.zoeken, {}, 200, {}, b'{}', 0.0)
+    breaker = half_open_breaker()
+    with Replay(path) as replay, KVK(test=True, breaker=breaker,
+                                     replay=replay) as kvk:
+        with pytest.raises(ReplayMiss):
+            kvk.get_basis_profiel('68750110')
+    assert breaker.state(PATH) == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    with KVK(test=True, breaker=breaker) as kvk:
+        assert kvk.get_basis_profiel('68750110').status_code == 200
+    assert breaker.state(PATH) == CircuitBreaker.CLOSED
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from kvk_api_client.__main__ import main
+from kvk_api_client.async_client import KVK
+from kvk_api_client.resync import SnapshotStore, diff, resync
+
+NUMBERS = [f'{68750110 + i}' for i in range(5)]
+
+
+def test_diff():
+    old = {'naam': 'A', 'adres': {'plaats': 'Utrecht', 'postcode': '1234AB'}, 'x': 1}
+    new = {'naam': 'A', 'adres': {'plaats': 'Amsterdam', 'postcode': '1234AB'}, 'y': [2]}
+
+    assert diff(old, new) == {'added': {'y': [2]},
+                              'changed': {'adres.plaats': ['Utrecht', 'Amsterdam']},
+                              'removed': {'x': 1}}
+
+
+def test_due_orders_never_fetched_first():
+    store = SnapshotStore()
+    store.add(['2', '1'])
+    store.put('3', {'kvkNummer': '3'})
+    store.add(['3', '4'])
+
+    assert list(store.due(page_size=1)) == ['1', '2', '4', '3']
+    assert list(store.due(limit=3, page_size=2)) == ['1', '2', '4']
+    assert list(store.due(max_age=60)) == ['1', '2', '4']
+
+
+@pytest.mark.asyncio
+async def test_resync_emits_only_changes(server):
+    store = SnapshotStore()
+    store.add(NUMBERS)
+
+    events = []
+    async with KVK(test=True, on_request=events.append) as kvk:
+        changes = [c async for c in resync(kvk, store)]
+        assert {(c.kvk_nummer, c.kind) for c in changes} == {(n, 'added') for n in NUMBERS}
+        assert store.get(NUMBERS[0]).materiele_registratie == {'datumAanvang': '20000101'}
+
+        del events[:]
+        assert [c async for c in resync(kvk, store)] == []
+        assert [e.status for e in events] == [304] * len(NUMBERS)
+
+        server.revisions[NUMBERS[1]] = 1
+        server.removed.add(NUMBERS[2])
+        changes = {c.kvk_nummer: c async for c in resync(kvk, store)}
+
+    assert changes[NUMBERS[1]].kind == 'changed'
+    assert changes[NUMBERS[1]].diff['changed'] == {'totaalWerkzamePersonen': [3, 4]}
+    assert changes[NUMBERS[2]].kind == 'removed'
+    assert len(changes) == 2
+
+
+def test_resync_cli(server, tmp_path):
+    numbers = tmp_path / 'numbers.txt'
+    numbers.write_text('\n'.join(NUMBERS))
+    store, output = str(tmp_path / 'store.sqlite3'), str(tmp_path / 'changes.jsonl')
+
+    assert main(['--test', 'resync', store, output, '--add', str(numbers)]) == 0
+    assert main(['--test', 'resync', store, output]) == 0
+
+    with open(output) as f:
+        changes = [json.loads(line) for line in f]
+    assert sorted(c['kvkNummer'] for c in changes) == NUMBERS
+    assert {c['kind'] for c in changes} == {'added'}
+
+
+def test_resync_reports_failures(server, tmp_path, capsys):
+    numbers = tmp_path / 'numbers.txt'
+    numbers.write_text('\n'.join(NUMBERS))
+    store, output = str(tmp_path / 'store.sqlite3'), str(tmp_path / 'changes.jsonl')
+    server.error_rate = 1.0
+
+    assert main(['--test', 'resync', store, output, '--add', str(numbers)]) == 1
+
+    err = capsys.readouterr().err
+    failures = [json.loads(line) for line in err.splitlines() if line.startswith('{')]
+    assert sorted(f['kvkNummer'] for f in failures) == NUMBERS
+    assert {f['kind'] for f in failures} == {'failed'}
+    assert failures[0]['error']['status'] == 500
+    assert '0 changes written' in err and '5 companies failed' in err
+    with open(output) as f:
+        assert f.read() == ''
+
+    server.error_rate = 0.0
+    assert main(['--test', 'resync', store, output]) == 0
+    with open(output) as f:
+        assert len(f.readlines()) == len(NUMBERS)
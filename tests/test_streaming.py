@@ -0,0 +1,42 @@
+import json
+import random
+
+from kvk_api_client.streaming import ArrayItemDecoder
+
+ITEMS = [{'kvkNummer': str(i), 'naam': f'Naam "{i}" \\ [x] {{y}}, z: é',
+          'links': [{'rel': 'self'}]} for i in range(50)]
+DOCUMENT = json.dumps({'pagina': 1, 'naam': 'resultaten', 'links': [],
+                       'resultaten': ITEMS, 'totaal': 50}).encode()
+
+
+def decode(chunk_sizes):
+    decoder = ArrayItemDecoder('resultaten')
+    items = []
+    position = 0
+    for size in chunk_sizes:
+        items += decoder.feed(DOCUMENT[position:position + size])
+        position += size
+    return decoder, items
+
+
+def test_decodes_items_from_any_chunking():
+    rng = random.Random(1)
+    for _ in range(50):
+        sizes = [rng.randint(1, 64) for _ in range(len(DOCUMENT))]
+        decoder, items = decode(sizes)
+
+        assert items == ITEMS
+        assert decoder.done
+
+
+def test_buffers_only_the_current_item():
+    decoder = ArrayItemDecoder('resultaten')
+    for i in range(0, len(DOCUMENT), 7):
+        decoder.feed(DOCUMENT[i:i + 7])
+        assert len(decoder._buffer) < 200
+
+
+def test_ignores_nested_arrays_with_the_same_key():
+    document = b'{"a": {"resultaten": [1]}, "resultaten": [{"x": 1}]}'
+
+    assert ArrayItemDecoder('resultaten').feed(document) == [{'x': 1}]
@@ -0,0 +1,293 @@
+"""
+Offline tests of both clients against the bundled StubServer.
+"""
+import asyncio
+import threading
+
+import pytest
+from kvk_api_client.async_client import KVK as AsyncKVK
+from kvk_api_client.cache import ResponseCache
+from kvk_api_client.index import CompanyIndex
+from kvk_api_client.metrics import MetricsAggregator
+from kvk_api_client.paths import APIpaths, BasisProfielPaths
+from kvk_api_client.rate_limit import RateLimiter
+from kvk_api_client.stub_server import StubServer
+from kvk_api_client.sync_client import KVK
+
+KVK_NUMBER = '68750110'
+
+
+@pytest.fixture(scope='module')
+def server():
+    with StubServer(zoeken_totaal=250).run_in_thread() as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def env(server, monkeypatch):
+    monkeypatch.setenv('KVK_HOST', server.url)
+    monkeypatch.setenv('KVK_API_VERSION', 'api/v1')
+    monkeypatch.setenv('KVK_APIKEY_PROD', 'prod')
+    monkeypatch.setenv('KVK_APIKEY_TEST', 'test')
+    server.rate_429 = 0.0
+
+
+def test_sync_endpoints():
+    with KVK(test=True) as kvk:
+        assert kvk.get_basis_profiel(KVK_NUMBER).json()['kvkNummer'] == KVK_NUMBER
+        response = kvk.get_basis_profiel(KVK_NUMBER, BasisProfielPaths.vestigingen)
+        assert len(response.json()['vestigingen']) == 3
+        assert kvk.get_naamgevingen(KVK_NUMBER).status_code == 200
+
+
+def test_sync_iter_companies():
+    with KVK(test=True, typed=True) as kvk:
+        companies = list(kvk.iter_companies(plaats='Utrecht', aantal=100))
+
+    assert len(companies) == 250
+    assert len({c.kvk_nummer for c in companies}) == 250
+
+
+@pytest.mark.asyncio
+async def test_async_iter_companies():
+    async with AsyncKVK(test=True) as kvk:
+        companies = [c async for c in kvk.aiter_companies(plaats='Utrecht', aantal=20)]
+
+    assert [c['kvkNummer'] for c in companies] == [f'{90000000 + i}' for i in range(250)]
+
+
+@pytest.mark.asyncio
+async def test_async_coalesce(server):
+    before = server.requests
+    async with AsyncKVK(test=True, coalesce=True) as kvk:
+        responses = await asyncio.gather(
+            *(kvk.get_basis_profiel(KVK_NUMBER) for _ in range(10)))
+
+        assert kvk.deduplicated == 9
+    assert server.requests - before == 1
+    assert len({id(r) for r in responses}) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_coalesce_survives_cancelled_caller(server):
+    server.latency = 0.05
+    try:
+        async with AsyncKVK(test=True, coalesce=True) as kvk:
+            leader = asyncio.ensure_future(kvk.get_naamgevingen(KVK_NUMBER))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(kvk.get_naamgevingen(KVK_NUMBER))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+
+            assert (await follower).status == 200
+            assert leader.cancelled()
+            assert kvk.deduplicated == 1
+    finally:
+        server.latency = 0.0
+
+
+@pytest.mark.asyncio
+async def test_async_coalesce_cancels_call_without_callers(server):
+    server.latency = 0.05
+    try:
+        async with AsyncKVK(test=True, coalesce=True) as kvk:
+            callers = [asyncio.ensure_future(kvk.get_naamgevingen(KVK_NUMBER))
+                       for _ in range(2)]
+            await asyncio.sleep(0.01)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0)
+
+            assert kvk.pool_stats()['in_use'] == 0
+            assert (await kvk.get_naamgevingen(KVK_NUMBER)).status == 200
+            assert kvk.deduplicated == 1
+    finally:
+        server.latency = 0.0
+
+
+def test_429_lowers_rate(server):
+    server.rate_429 = 1.0
+    limiter = RateLimiter(rate=100, burst=10)
+    with KVK(test=True, rate_limiter=limiter) as kvk:
+        assert kvk.get_vestigingsprofiel('000038509504').status_code == 429
+
+    assert limiter.current_rate < 100
+
+
+@pytest.mark.asyncio
+async def test_request_events_and_prometheus_export():
+    metrics = MetricsAggregator()
+    events = []
+    metrics.forward = events.append
+
+    with KVK(test=True, on_request=metrics) as kvk:
+        kvk.get_basis_profiel(KVK_NUMBER)
+    async with AsyncKVK(test=True, on_request=metrics) as kvk:
+        response = await kvk.get_naamgevingen(KVK_NUMBER)
+        await response.read()
+
+    assert [e.endpoint for e in events] == [APIpaths.basisprofielen, APIpaths.naamgevingen]
+    assert events[0].bytes > 0 and events[0].ttfb is not None
+    assert events[1].connect is not None and events[1].ttfb is not None
+    text = metrics.export_prometheus()
+    assert 'kvk_client_requests_total{endpoint="basisprofielen",status="200"} 1' in text
+    assert ('kvk_client_request_duration_seconds_count'
+            f'{{endpoint="{APIpaths.naamgevingen}"}} 1') in text
+
+
+@pytest.mark.asyncio
+async def test_request_events_cover_chunked_downloads(server):
+    server.chunk_delay = 0.03
+    events = []
+    try:
+        with KVK(test=True, on_request=events.append) as kvk:
+            response = kvk.get_basis_profiel(KVK_NUMBER)
+            assert response.headers['Transfer-Encoding'] == 'chunked'
+        async with AsyncKVK(test=True, on_request=events.append) as kvk:
+            response = await kvk.get_basis_profiel(KVK_NUMBER)
+            assert events[-1].bytes == len(await response.read())
+    finally:
+        server.chunk_delay = 0.0
+
+    assert len(events) == 2
+    for event in events:
+        assert event.bytes > 0
+        assert event.download >= 0.08
+        assert event.duration >= event.ttfb + event.download
+
+
+def test_shared_cache_separates_environments():
+    cache = ResponseCache()
+    for test in (True, False, True):
+        with KVK(test=test, cache=cache) as kvk:
+            assert kvk.get_basis_profiel(KVK_NUMBER).status_code == 200
+
+    assert cache.stats['misses'] == 2
+    assert cache.stats['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_disk_cache_runs_off_the_loop(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / 'cache.sqlite3'))
+    threads = []
+    for name in ('get', 'set'):
+        def call(*args, method=getattr(cache, name)):
+            threads.append(threading.current_thread())
+            return method(*args)
+        setattr(cache, name, call)
+
+    async with AsyncKVK(test=True, cache=cache) as kvk:
+        for _ in range(2):
+            assert (await kvk.get_naamgevingen(KVK_NUMBER)).status == 200
+    cache.close()
+
+    assert len(threads) == 3
+    assert threading.main_thread() not in threads
+    assert cache.stats['hits'] == 1
+
+
+def test_sync_streaming(server):
+    server.vestigingen = 40
+    try:
+        with KVK(test=True) as kvk:
+            vestigingen = list(kvk.stream_vestigingen(KVK_NUMBER, chunk_size=64))
+            companies = list(kvk.stream_companies(plaats='Utrecht', aantal=100))
+    finally:
+        server.vestigingen = 3
+
+    assert len(vestigingen) == 40
+    assert vestigingen[0]['indHoofdvestiging'] == 'Ja'
+    assert len(companies) == 100
+
+
+@pytest.mark.asyncio
+async def test_async_streaming():
+    async with AsyncKVK(test=True, typed=True) as kvk:
+        companies = [c async for c in kvk.stream_companies(plaats='Utrecht', chunk_size=50)]
+        vestigingen = [v async for v in kvk.stream_vestigingen(KVK_NUMBER)]
+
+    assert len(companies) == 10
+    assert companies[0].kvk_nummer == '90000000'
+    assert len(vestigingen) == 3
+
+
+def test_sync_streams_are_lazy(server):
+    with KVK(test=True, pool_maxsize=1, pool_block=True) as kvk:
+        before = server.requests
+        kvk.stream_vestigingen(KVK_NUMBER)
+        assert server.requests == before
+
+        assert list(kvk.stream_companies(plaats='Utrecht', pagina=100)) == []
+        stream = kvk.stream_vestigingen(KVK_NUMBER, chunk_size=16)
+        next(stream)
+        stream.close()
+        # With one blocking pooled connection, this hangs if it leaked.
+        assert kvk.get_naamgevingen(KVK_NUMBER).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_async_streams_are_lazy(server):
+    async with AsyncKVK(test=True) as kvk:
+        before = server.requests
+        kvk.stream_vestigingen(KVK_NUMBER)
+        assert server.requests == before
+
+        assert [c async for c in kvk.stream_companies(plaats='Utrecht',
+                                                       pagina=100)] == []
+        stream = kvk.stream_vestigingen(KVK_NUMBER, chunk_size=16)
+        await stream.__anext__()
+        await stream.aclose()
+        assert kvk.pool_stats()['in_use'] == 0
+
+
+@pytest.mark.asyncio
+async def test_index_answers_repeated_searches(server):
+    index = CompanyIndex()
+    with KVK(test=True, index=index) as kvk:
+        first = kvk.get_companies(plaats='Utrecht', aantal=5).json()
+        kvk.get_basis_profiel(KVK_NUMBER)
+        before = server.requests
+        assert kvk.get_companies(plaats='Utrecht', aantal=5).json() == first
+        assert server.requests == before
+
+    async with AsyncKVK(test=True, index=index) as kvk:
+        response = await kvk.get_companies(plaats='Utrecht', aantal=5)
+        assert await response.json() == first
+    assert server.requests == before
+    assert index.profiel(KVK_NUMBER)['kvkNummer'] == KVK_NUMBER
+
+
+@pytest.mark.asyncio
+async def test_async_result_modes_release_connections():
+    kvk = AsyncKVK(test=True, result='json', limit=4, timeout=5)
+    assert kvk.pool_stats()['in_use'] == 0
+
+    async with kvk:
+        profielen = await asyncio.gather(
+            *(kvk.get_basis_profiel(KVK_NUMBER) for _ in range(8)))
+        assert {p['kvkNummer'] for p in profielen} == {KVK_NUMBER}
+        assert isinstance(await kvk.get_naamgevingen(KVK_NUMBER), dict)
+        stats = kvk.pool_stats()
+        assert stats['in_use'] == 0
+        assert 0 < stats['idle'] <= stats['limit'] == 4
+
+    async with AsyncKVK(test=True, result='bytes') as kvk:
+        assert KVK_NUMBER.encode() in await kvk.get_naamgevingen(KVK_NUMBER)
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_without_connector_internals(monkeypatch):
+    async with AsyncKVK(test=True, limit=4) as kvk:
+        for name in ('_acquired', '_conns', '_waiters'):
+            monkeypatch.delattr(kvk.session.connector, name)
+        assert kvk.pool_stats() == {'limit': 4, 'limit_per_host': 0,
+                                    'in_use': 0, 'idle': 0, 'waiting': 0}
+        monkeypatch.undo()
+
+
+def test_async_result_mode_is_validated():
+    with pytest.raises(ValueError):
+        AsyncKVK(test=True, result='text')
+    with pytest.raises(ValueError):
+        AsyncKVK(test=True, result='json', typed=True)